@@ -0,0 +1,125 @@
+# bench/adaptive_batching.py
+# Fixed --batch_size slicing vs score-cutoff + token-budget packing of the
+# retrieved schema, on a dev split. For each setting: extraction calls per
+# record, SCHEMA tokens sent per record and schema recall (share of gold
+# concept ids that reach at least one prompt of their record, an upper
+# bound on extraction recall).
+#
+# With --extract the records are also run through extraction + validation
+# (needs --host, or uses the mock server) and gold-id recall of the
+# validated observations is reported.
+#
+#   python -m bench.adaptive_batching --split dev --schema_path data/synur_schema.json --retriever bm25
+#   python -m bench.adaptive_batching --split dev --schema_path data/synur_schema.json --retriever embed --host http://localhost:11434 --extract --model llama3.3
+import argparse
+import json
+import tempfile
+from pathlib import Path
+
+from bench.mock_ollama import MockOllamaServer
+from bench.retriever_recall import load_records
+from src.agents.lexical_retriever import HybridRetriever, LexicalRetriever
+from src.agents.schema_retriever import SchemaRetriever
+from src.instrument import Instrumentation, set_instrumentation
+from src.llm_client import configure_client
+from src.run import chunk_schema_ids, cut_by_score, extract_record, pack_schema_ids, split_transcript, validate_record
+from src.schema import SynurSchema
+
+
+def plan(retriever, schema: SynurSchema, transcript: str, batch_size: int, cutoff: float, budget: int, segment: bool):
+    batches = []
+    for chunk in split_transcript(transcript) if segment else [transcript]:
+        ids = cut_by_score(retriever.retrieve_scored(chunk), cutoff) if cutoff > 0 else retriever.retrieve(chunk)
+        batches.extend(pack_schema_ids(ids, schema.concepts, budget) if budget > 0 else chunk_schema_ids(ids, batch_size))
+    return batches
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--retriever", choices=["embed", "bm25", "hybrid"], default="bm25")
+    ap.add_argument("--top_k_schema", type=int, default=40)
+    ap.add_argument("--batch_size", type=int, default=25)
+    ap.add_argument("--cutoffs", default="0,0.2,0.35,0.5")
+    ap.add_argument("--budgets", default="0,1200,2400")
+    ap.add_argument("--segment", action="store_true")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--embed_model", default="nomic-embed-text")
+    ap.add_argument("--extract", action="store_true")
+    ap.add_argument("--model", default="llama3.3")
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    records = load_records(Path(args.data_dir) / f"{args.split}.jsonl", args.limit)
+
+    server = None
+    if args.host is None and (args.extract or args.retriever != "bm25"):
+        server = MockOllamaServer().start()
+    configure_client(host=args.host or (server.url if server else None))
+    set_instrumentation(Instrumentation())
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            lexical = LexicalRetriever(schema.by_id, top_k=args.top_k_schema, concepts=schema.concepts)
+            retriever = lexical
+            if args.retriever != "bm25":
+                retriever = SchemaRetriever(
+                    schema.by_id,
+                    embed_model=args.embed_model,
+                    top_k=args.top_k_schema,
+                    index_dir=tmp,
+                    concepts=schema.concepts,
+                )
+                if args.retriever == "hybrid":
+                    retriever = HybridRetriever(lexical, retriever, top_k=args.top_k_schema)
+
+            for cutoff in [float(x) for x in args.cutoffs.split(",")]:
+                for budget in [int(x) for x in args.budgets.split(",")]:
+                    calls = tokens = hits = total = 0
+                    for transcript, gold in records:
+                        batches = plan(retriever, schema, transcript, args.batch_size, cutoff, budget, args.segment)
+                        calls += len(batches)
+                        tokens += sum(len(schema.concepts[c].prompt_json) // 4 + 1 for b in batches for c in b)
+                        seen = {c for b in batches for c in b}
+                        hits += len(gold & seen)
+                        total += len(gold)
+
+                    row = {
+                        "cutoff": cutoff,
+                        "token_budget": budget or None,
+                        "batch_size": None if budget else args.batch_size,
+                        "calls_per_record": round(calls / max(1, len(records)), 2),
+                        "schema_tokens_per_record": round(tokens / max(1, len(records))),
+                        "schema_recall": round(hits / max(1, total), 4),
+                    }
+
+                    if args.extract:
+                        hits = 0
+                        for i, (transcript, gold) in enumerate(records):
+                            item = extract_record(
+                                {"id": str(i), "transcript": transcript},
+                                model=args.model,
+                                schema=schema,
+                                batch_size=args.batch_size,
+                                segment=args.segment,
+                                use_schema_retrieval=True,
+                                top_k_schema=args.top_k_schema,
+                                retriever=retriever,
+                                schema_token_budget=budget,
+                                schema_score_cutoff=cutoff,
+                            )
+                            item = validate_record(item, schema, use_suppress_table=False)
+                            hits += len(gold & {o["id"] for o in item["observations"]})
+                        row["extraction_recall"] = round(hits / max(1, total), 4)
+
+                    print(json.dumps(row))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# bench/baseline.py
+# Loads a source file as it was at an earlier git revision as a module, so a
+# bench can compare the current implementation with the one it replaced
+# without keeping a copy of it. The default revision is the parent of the
+# commit that introduced `marker` (a name only the new implementation has)
+# into the file; --baseline_rev overrides it. With `names`, only those
+# top-level definitions are loaded (with the file's constants and non-repo
+# imports), so the old code does not need its old src.* neighbours.
+import ast
+import subprocess
+import types
+from pathlib import Path
+from typing import Optional, Sequence
+
+SYS_DIR = Path(__file__).resolve().parent.parent
+
+
+def _git(*args: str) -> str:
+    return subprocess.run(["git", *args], cwd=SYS_DIR, check=True, capture_output=True, text=True).stdout
+
+
+def revision_before(path: str, marker: str) -> str:
+    commits = _git("log", "--format=%H", "--reverse", f"-S{marker}", "--", path).split()
+    if not commits:
+        raise SystemExit(f"no commit adds {marker!r} to {path}; pass --baseline_rev")
+    return f"{commits[0]}^"
+
+
+def _select(source: str, names: Sequence[str]) -> ast.Module:
+    tree = ast.parse(source)
+    missing = set(names)
+    body = []
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom):
+            if (node.module or "").split(".")[0] != "src":
+                body.append(node)
+        elif isinstance(node, ast.Import):
+            if all(a.name.split(".")[0] != "src" for a in node.names):
+                body.append(node)
+        elif isinstance(node, (ast.FunctionDef, ast.ClassDef)):
+            if node.name in missing:
+                missing.discard(node.name)
+                body.append(node)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            body.append(node)
+    if missing:
+        raise SystemExit(f"baseline has no {', '.join(sorted(missing))}")
+    tree.body = body
+    return tree
+
+
+# path is relative to sys/, e.g. "src/agents/validate.py"
+def load_module(
+    path: str,
+    rev: Optional[str] = None,
+    marker: Optional[str] = None,
+    names: Optional[Sequence[str]] = None,
+) -> types.ModuleType:
+    if rev is None:
+        if marker is None:
+            raise ValueError("load_module needs rev or marker")
+        rev = revision_before(path, marker)
+    try:
+        source = _git("show", f"{rev}:./{path}")
+    except subprocess.CalledProcessError as e:
+        raise SystemExit(f"cannot load baseline {path} at {rev}: {e.stderr.strip()}")
+    module = types.ModuleType(f"baseline_{Path(path).stem}")
+    module.__file__ = f"{rev}:{path}"
+    code = _select(source, names) if names else source
+    exec(compile(code, module.__file__, "exec"), module.__dict__)
+    return module
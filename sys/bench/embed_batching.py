@@ -0,0 +1,96 @@
+# bench/embed_batching.py
+# Embedding round-trips and wall time of SchemaRetriever: batched /api/embed
+# requests + retrieve_many (one matmul, argpartition top-k per chunk) vs the
+# previous one-request-per-text / one-chunk-at-a-time retriever, loaded from
+# git (--baseline_rev, default the parent of the commit that introduced
+# scores_many). Measures the cold schema index build and the per-record
+# retrieval of segmented transcripts.
+#
+#   python -m bench.embed_batching --split dev --schema_path data/synur_schema.json --latency_ms 5
+#   python -m bench.embed_batching --split dev --schema_path data/synur_schema.json --host http://localhost:11434
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from bench.baseline import load_module
+from bench.mock_ollama import MockOllamaServer
+from src.agents.schema_retriever import SchemaRetriever
+from src.llm_client import configure_client
+from src.run import split_transcript
+from src.schema import SynurSchema
+
+
+def load_chunks(path: Path, limit: int) -> List[List[str]]:
+    out = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            out.append(split_transcript(rec.get("transcript", "")))
+            if limit and len(out) >= limit:
+                break
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--embed_model", default="nomic-embed-text")
+    ap.add_argument("--latency_ms", type=float, default=5.0, help="mock only")
+    ap.add_argument("--baseline_rev", default=None)
+    args = ap.parse_args()
+    legacy = load_module("src/agents/schema_retriever.py", args.baseline_rev, marker="scores_many")
+
+    schema = SynurSchema(args.schema_path)
+    records = load_chunks(Path(args.data_dir) / f"{args.split}.jsonl", args.limit)
+    n_chunks = sum(len(c) for c in records)
+
+    server = None
+    if args.host is None:
+        server = MockOllamaServer(latency_ms=args.latency_ms).start()
+    configure_client(host=args.host or server.url)
+
+    def requests() -> int:
+        return sum(server.stats()["calls"].get(p, 0) for p in ("/api/embed", "/api/embeddings")) if server else 0
+
+    try:
+        for name, cls in [("legacy", legacy.SchemaRetriever), ("batched", SchemaRetriever)]:
+            with tempfile.TemporaryDirectory() as tmp:
+                r = cls(schema.by_id, embed_model=args.embed_model, index_dir=tmp, concepts=schema.concepts)
+
+                r0, t0 = requests(), time.perf_counter()
+                r.schema_embeddings
+                build_s, build_req = time.perf_counter() - t0, requests() - r0
+
+                r0, t0 = requests(), time.perf_counter()
+                for chunks in records:
+                    if name == "legacy":
+                        [r.retrieve(c) for c in chunks]
+                    else:
+                        r.retrieve_many(chunks)
+                retr_s, retr_req = time.perf_counter() - t0, requests() - r0
+
+            print(json.dumps({
+                "retriever": name,
+                "index_build_s": round(build_s, 3),
+                "index_build_requests": build_req if server else None,
+                "records": len(records),
+                "chunks": n_chunks,
+                "requests_per_record": round(retr_req / max(1, len(records)), 2) if server else None,
+                "ms_per_record": round(retr_s / max(1, len(records)) * 1000, 2),
+            }))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
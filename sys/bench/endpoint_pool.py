@@ -0,0 +1,134 @@
+# bench/endpoint_pool.py
+# One Ollama endpoint vs an LLMPool over several (least-outstanding-requests
+# routing with failover). Extraction calls run from --concurrency threads
+# against mock servers that each serve --parallel requests at a time; the
+# last server is --slow_factor times slower, which round-robin would feed
+# as much as the others. In the failover run, one server is stopped once a
+# third of the calls are done: every call must still complete.
+#
+#   python -m bench.endpoint_pool --split dev --schema_path data/synur_schema.json --servers 3 --concurrency 12
+#   python -m bench.endpoint_pool --split dev --schema_path data/synur_schema.json --hosts http://gpu1:11434,http://gpu2:11434 --model llama3.3
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench.mock_ollama import MockOllamaServer
+from src.agents.extract import ExtractorAgent
+from src.llm_client import LLMPool, configure_client, get_client
+from src.run import chunk_schema_ids, split_transcript
+from src.schema import SynurSchema
+
+
+def load_tasks(path: Path, schema: SynurSchema, batch_size: int, limit: int) -> List[Tuple[str, List[str]]]:
+    tasks = []
+    ids = list(schema.by_id.keys())
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            for chunk in split_transcript(rec.get("transcript", "")):
+                for sb in chunk_schema_ids(ids, batch_size):
+                    tasks.append((chunk, sb))
+            if limit and len(tasks) >= limit:
+                break
+    return tasks[:limit] if limit else tasks
+
+
+def run_calls(extractor: ExtractorAgent, tasks, concurrency: int, on_done: Optional[Callable[[int], None]] = None) -> Dict[str, Any]:
+    done, errors, n_obs = [0], [], [0]
+    lock = threading.Lock()
+
+    def call(task):
+        try:
+            obs = extractor.run(*task)
+        except Exception as e:
+            with lock:
+                errors.append(repr(e))
+            return
+        with lock:
+            done[0] += 1
+            n_obs[0] += len(obs)
+            n = done[0]
+        if on_done is not None:
+            on_done(n)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        list(ex.map(call, tasks))
+    wall = time.perf_counter() - t0
+    return {
+        "calls": len(tasks),
+        "completed": done[0],
+        "errors": len(errors),
+        "observations": n_obs[0],
+        "wall_s": round(wall, 3),
+        "calls_per_s": round(len(tasks) / wall, 2) if wall else 0.0,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--model", default="llama3.3")
+    ap.add_argument("--batch_size", type=int, default=25)
+    ap.add_argument("--limit", type=int, default=120)
+    ap.add_argument("--concurrency", type=int, default=12)
+    ap.add_argument("--hosts", default=None)
+    ap.add_argument("--servers", type=int, default=3, help="mock only")
+    ap.add_argument("--parallel", type=int, default=2, help="mock only")
+    ap.add_argument("--latency_ms", type=float, default=5.0, help="mock only")
+    ap.add_argument("--per_token_ms", type=float, default=1.0, help="mock only")
+    ap.add_argument("--slow_factor", type=float, default=3.0, help="mock only")
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    tasks = load_tasks(Path(args.data_dir) / f"{args.split}.jsonl", schema, args.batch_size, args.limit)
+    extractor = ExtractorAgent(args.model, schema.by_id, concepts=schema.concepts)
+
+    servers: List[MockOllamaServer] = []
+    if args.hosts:
+        hosts = [h.strip() for h in args.hosts.split(",") if h.strip()]
+    else:
+        for i in range(args.servers):
+            slow = args.slow_factor if i == args.servers - 1 and args.servers > 1 else 1.0
+            servers.append(MockOllamaServer(
+                latency_ms=args.latency_ms * slow,
+                per_token_ms=args.per_token_ms * slow,
+                parallel=args.parallel,
+            ).start())
+        hosts = [s.url for s in servers]
+
+    try:
+        runs = [("single", hosts[:1]), ("pool", hosts)]
+        if servers and len(servers) > 1:
+            runs.append(("pool_failover", hosts))
+        for name, run_hosts in runs:
+            configure_client(host=",".join(run_hosts), max_retries=3)
+            client = get_client()
+            if isinstance(client, LLMPool):
+                client.check_health()
+            victim, stop_at = (servers[0] if servers else None), len(tasks) // 3
+
+            def stop_victim(n):
+                if n == stop_at:
+                    victim.stop()
+
+            row = run_calls(extractor, tasks, args.concurrency, stop_victim if name == "pool_failover" else None)
+            if isinstance(client, LLMPool):
+                row["endpoints"] = [{"requests": ep["requests"], "failures": ep["failures"]} for ep in client.stats()]
+            print(json.dumps({"mode": name, "endpoints_n": len(run_hosts), **row}))
+    finally:
+        for s in servers:
+            if not s._stopped:
+                s.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+# bench/extract_prompt.py
+# Extraction prompt construction and prompt-cache reuse. Compares building
+# every prompt from scratch (f-string + json.dumps of the schema batch, as
+# ExtractorAgent used to) with the cached HEADER + SCHEMA prefix, then sends
+# the prompts with streaming chat and reports prompt tokens actually
+# evaluated and time-to-first-token, in chunk-major and batch-major (the order
+# extract_record issues a record's calls in) order.
+#
+# Runs against the mock server (simulated prompt cache) unless --host is given.
+#
+#   python -m bench.extract_prompt --split dev --schema_path data/synur_schema.json --limit 10 --segment
+#   python -m bench.extract_prompt --split dev --schema_path data/synur_schema.json --host http://localhost:11434 --model qwen2.5:7b
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import ollama
+
+from bench.mock_ollama import MockOllamaServer, approx_tokens
+from src.agents.extract import EXTRACTION_HEADER, ExtractorAgent
+from src.run import batch_major, chunk_schema_ids, split_transcript
+from src.schema import SynurSchema
+
+
+def legacy_prompt(extractor: ExtractorAgent, transcript: str, concept_ids: List[str]) -> str:
+    schema_block = [dict(c.prompt_entry) for c in extractor._batch_concepts(concept_ids)]
+    return f"""
+{EXTRACTION_HEADER}SCHEMA:
+{json.dumps(schema_block, indent=2)}
+
+TRANSCRIPT:
+{transcript}
+""".strip()
+
+
+def cached_prompt(extractor: ExtractorAgent, transcript: str, concept_ids: List[str]) -> str:
+    return extractor._prompt_prefix(concept_ids) + transcript.rstrip()
+
+
+def load_tasks(path: Path, schema: SynurSchema, batch_size: int, segment: bool, limit: int) -> List[List[Tuple[str, List[str]]]]:
+    # per record, its (chunk, schema batch) tasks in chunk-major order
+    records = []
+    schema_ids = list(schema.by_id.keys())
+    with path.open("r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if limit and i >= limit:
+                break
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            text = rec.get("transcript") or rec.get("text") or ""
+            tasks = []
+            for chunk in split_transcript(text) if segment else [text]:
+                for sb in chunk_schema_ids(schema_ids, batch_size):
+                    tasks.append((chunk, sb))
+            records.append(tasks)
+    return records
+
+
+# =========================
+# PROMPT BUILD
+# =========================
+def time_build(fn, extractor: ExtractorAgent, tasks, rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for chunk, sb in tasks:
+            fn(extractor, chunk, sb)
+    return time.perf_counter() - t0
+
+
+# =========================
+# SERVER SIDE
+# =========================
+def stream_prompts(client: ollama.Client, model: str, prompts: List[str]) -> Dict[str, Any]:
+    ttft, evaluated, total = [], 0, 0
+    for p in prompts:
+        t0 = time.perf_counter()
+        first = None
+        last = None
+        for part in client.chat(
+            model=model,
+            messages=[{"role": "user", "content": p}],
+            options={"temperature": 0.0, "num_predict": 700},
+            stream=True,
+        ):
+            if first is None:
+                first = time.perf_counter() - t0
+            last = part
+        ttft.append(first or 0.0)
+        evaluated += getattr(last, "prompt_eval_count", None) or 0
+        total += approx_tokens(p)
+    return {
+        "calls": len(prompts),
+        "prompt_tokens": total,
+        "prompt_tokens_evaluated": evaluated,
+        "ttft_p50_ms": round(statistics.median(ttft) * 1000, 2) if ttft else None,
+        "ttft_mean_ms": round(statistics.mean(ttft) * 1000, 2) if ttft else None,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--batch_size", type=int, default=25)
+    ap.add_argument("--segment", action="store_true")
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--host", default=None, help="live Ollama host; default starts the mock server")
+    ap.add_argument("--model", default="mock")
+    ap.add_argument("--kv_slots", type=int, default=1, help="mock only")
+    ap.add_argument("--prefill_per_token_ms", type=float, default=0.05, help="mock only")
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    extractor = ExtractorAgent(args.model, schema.by_id, concepts=schema.concepts)
+    records = load_tasks(Path(args.data_dir) / f"{args.split}.jsonl", schema, args.batch_size, args.segment, args.limit)
+    tasks = [t for rec in records for t in rec]
+
+    # prompts must be byte-identical before anything is timed
+    for chunk, sb in tasks:
+        assert legacy_prompt(extractor, chunk, sb) == cached_prompt(extractor, chunk, sb)
+
+    n = len(tasks) * args.rounds
+    t_old = time_build(legacy_prompt, extractor, tasks, args.rounds)
+    t_new = time_build(cached_prompt, extractor, tasks, args.rounds)
+    prompts = [cached_prompt(extractor, c, sb) for c, sb in tasks]
+    print(json.dumps({
+        "prompts": len(tasks),
+        "avg_prompt_tokens": round(sum(approx_tokens(p) for p in prompts) / max(1, len(prompts)), 1),
+        "shared_prefix_tokens": approx_tokens(EXTRACTION_HEADER),
+        "legacy_build_us": round(t_old / n * 1e6, 2),
+        "cached_build_us": round(t_new / n * 1e6, 2),
+        "speedup": round(t_old / t_new, 2) if t_new else None,
+    }))
+
+    server = None
+    host = args.host
+    if host is None:
+        server = MockOllamaServer(kv_slots=args.kv_slots, prefill_per_token_ms=args.prefill_per_token_ms).start()
+        host = server.url
+
+    by_batch = [cached_prompt(extractor, *rec[i]) for rec in records for i in batch_major(rec)]
+    try:
+        client = ollama.Client(host=host)
+        for order, ps in [("chunk_major", prompts), ("batch_major", by_batch)]:
+            print(json.dumps({"order": order, **stream_prompts(client, args.model, ps)}))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# bench/filter_batch.py
+# Compare per-item vs batched precision filtering: LLM calls, prompt tokens
+# and wall time over the gold observations of a split.
+#
+#   python -m bench.filter_batch --split dev --schema_path data/synur_schema.json --batch_sizes 1,5,10
+#   (add --dry_run to count calls/tokens without an Ollama server,
+#    --prefilter_threshold 0.9 to settle obvious cases by rule first)
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+import src.agents.precision_filter as pf_module
+from src.agents.precision_filter import PrecisionFilterAgent
+from src.agents.prefilter import RulePreFilter
+from src.schema import SynurSchema
+
+
+# =========================
+# HELPERS
+# =========================
+def approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def attach_evidence(transcript: str, obs):
+    # Gold observations carry no evidence; use the first sentence that
+    # mentions the value (else the concept name, else the first sentence)
+    sentences = [x for x in re.split(r"(?<=[.!?])\s+", transcript) if x.strip()] or [""]
+    out = []
+    for o in obs:
+        vals = o.get("value") if isinstance(o.get("value"), list) else [o.get("value")]
+        keys = [str(v).lower() for v in vals] + [str(o.get("name", "")).lower()]
+        ev = next((x for k in keys for x in sentences if k and k in x.lower()), sentences[0])
+        out.append({**o, "evidence": ev})
+    return out
+
+
+def load_records(path: Path, limit: int):
+    recs = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            obs = rec.get("observations", [])
+            if isinstance(obs, str):
+                obs = json.loads(obs)
+            recs.append((rec.get("transcript", ""), attach_evidence(rec.get("transcript", ""), obs)))
+            if limit and len(recs) >= limit:
+                break
+    return recs
+
+
+class Recorder:
+    def __init__(self, real_fn, dry_run: bool):
+        self.real_fn = real_fn
+        self.dry_run = dry_run
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def __call__(self, model, prompt, temperature=0.0, max_tokens=512, client=None, keep_alive=None):
+        self.calls += 1
+        self.prompt_tokens += approx_tokens(prompt)
+
+        if self.dry_run:
+            n = len(re.findall(r"^\[\d+\]$", prompt, re.MULTILINE))
+            if n:
+                raw = json.dumps({"decisions": [{"index": i, "decision": "KEEP", "reason": "ok"} for i in range(n)]})
+            else:
+                raw = json.dumps({"decision": "KEEP", "reason": "ok"})
+        else:
+            raw = self.real_fn(model, prompt, temperature=temperature, max_tokens=max_tokens, client=client, keep_alive=keep_alive)
+
+        self.completion_tokens += approx_tokens(raw)
+        return raw
+
+
+# =========================
+# MAIN
+# =========================
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--model", default="llama3.3")
+    ap.add_argument("--batch_sizes", default="1,5,10")
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--dry_run", action="store_true")
+    ap.add_argument("--prefilter_threshold", type=float, default=None)
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    records = load_records(Path(args.data_dir) / f"{args.split}.jsonl", args.limit)
+    n_obs = sum(len(o) for _, o in records)
+
+    real_fn = pf_module.generate_response
+    rows = []
+    for bs in [int(x) for x in args.batch_sizes.split(",")]:
+        rec = Recorder(real_fn, args.dry_run)
+        pf_module.generate_response = rec
+        prefilter = RulePreFilter(schema.concepts, args.prefilter_threshold) if args.prefilter_threshold else None
+        agent = PrecisionFilterAgent(args.model, schema.by_id, batch_size=bs, prefilter=prefilter)
+
+        t0 = time.perf_counter()
+        kept = 0
+        for transcript, obs in records:
+            kept += len(agent.filter_observations(obs, transcript))
+        elapsed = time.perf_counter() - t0
+
+        rows.append({
+            "batch_size": bs,
+            "records": len(records),
+            "observations": n_obs,
+            "kept": kept,
+            "llm_calls": rec.calls,
+            "prompt_tokens~": rec.prompt_tokens,
+            "completion_tokens~": rec.completion_tokens,
+            "seconds": round(elapsed, 3),
+        })
+
+    pf_module.generate_response = real_fn
+
+    for r in rows:
+        print(json.dumps(r))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# bench/filter_prefix.py
+# Per-observation latency of precision filtering with the legacy layout
+# (observation first, transcript last) vs --filter_prefix (instructions +
+# transcript first, observation last), over the gold observations of a
+# split. Reports prompt tokens the server actually evaluated (prompt cache
+# hits are excluded by Ollama's prompt_eval_count) and wall time per check.
+#
+# Runs against the mock server (simulated prompt cache) unless --host is given.
+#
+#   python -m bench.filter_prefix --split dev --schema_path data/synur_schema.json --limit 10
+#   python -m bench.filter_prefix --split dev --schema_path data/synur_schema.json --host http://localhost:11434 --model llama3.3 --keep_alive 30m
+import argparse
+import json
+import time
+from pathlib import Path
+
+from bench.filter_batch import load_records
+from bench.mock_ollama import MockOllamaServer
+from src import instrument
+from src.agents.precision_filter import PrecisionFilterAgent
+from src.instrument import Instrumentation
+from src.llm_client import LLMClient
+from src.schema import SynurSchema
+
+
+def run_mode(agent: PrecisionFilterAgent, records) -> dict:
+    instr = Instrumentation()
+    instrument.set_instrumentation(instr)
+
+    per_obs = []
+    for transcript, obs in records:
+        for o in obs:
+            t0 = time.perf_counter()
+            agent.filter_observations([o], transcript)
+            per_obs.append(time.perf_counter() - t0)
+    instrument.set_instrumentation(None)
+
+    llm = instr.summary()["run"]["llm_total"]
+    return {
+        "checks": len(per_obs),
+        "prompt_tokens_evaluated": llm["prompt_tokens"],
+        "ms_per_obs_mean": round(sum(per_obs) / max(1, len(per_obs)) * 1000, 2),
+        "ms_per_obs_p50": round(instrument.percentile(per_obs, 0.50) * 1000, 2),
+        "ms_per_obs_p95": round(instrument.percentile(per_obs, 0.95) * 1000, 2),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--limit", type=int, default=10)
+    ap.add_argument("--host", default=None, help="live Ollama host; default starts the mock server")
+    ap.add_argument("--model", default="mock")
+    ap.add_argument("--keep_alive", default=None)
+    ap.add_argument("--kv_slots", type=int, default=1, help="mock only")
+    ap.add_argument("--prefill_per_token_ms", type=float, default=0.05, help="mock only")
+    ap.add_argument("--per_token_ms", type=float, default=0.5, help="mock only")
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    records = load_records(Path(args.data_dir) / f"{args.split}.jsonl", args.limit)
+
+    server = None
+    host = args.host
+    if host is None:
+        server = MockOllamaServer(
+            kv_slots=args.kv_slots,
+            prefill_per_token_ms=args.prefill_per_token_ms,
+            per_token_ms=args.per_token_ms,
+        ).start()
+        host = server.url
+
+    rows = []
+    try:
+        client = LLMClient(host=host)
+        for prefix_mode in (False, True):
+            agent = PrecisionFilterAgent(
+                args.model,
+                schema.by_id,
+                client=client,
+                concepts=schema.concepts,
+                prefix_mode=prefix_mode,
+                keep_alive=args.keep_alive,
+            )
+            rows.append({"mode": "transcript_first" if prefix_mode else "legacy", **run_mode(agent, records)})
+            print(json.dumps(rows[-1]))
+    finally:
+        if server is not None:
+            server.stop()
+
+    legacy, prefix = rows
+    if prefix["ms_per_obs_mean"]:
+        print(json.dumps({
+            "latency_speedup": round(legacy["ms_per_obs_mean"] / prefix["ms_per_obs_mean"], 2),
+            "prompt_tokens_saved": legacy["prompt_tokens_evaluated"] - prefix["prompt_tokens_evaluated"],
+        }))
+
+
+if __name__ == "__main__":
+    main()
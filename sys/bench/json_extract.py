@@ -0,0 +1,178 @@
+# bench/json_extract.py
+# Fuzz + benchmark of extract_json_from_response: the bracket-balancing
+# JsonScanner vs the previous regex implementation, loaded from git
+# (--baseline_rev, default the parent of the commit that introduced the
+# scanner). Synthetic model outputs cover code fences, prose around the
+# JSON, braces/quotes/escapes inside strings, trailing commas, several
+# candidates, truncated tails and long malformed
+# text; real outputs can be added from a response cache (--cache_dir, see
+# --cache_dir in run.py).
+#
+# Checks, for every case:
+#   - feeding the text in random pieces gives the same result as one piece
+#   - well-formed cases yield exactly the generated observations
+#   - wherever the legacy parser found observations, the scanner finds the
+#     same ones (counts where the scanner recovers more, e.g. truncation)
+# then times both parsers per kind of output.
+#
+#   python -m bench.json_extract --cases 2000
+#   python -m bench.json_extract --cache_dir outputs/llm_cache
+import argparse
+import json
+import random
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+from bench.baseline import load_module
+from src.json_scanner import JsonScanner
+from src.lm_utils import extract_json_from_response
+
+
+def observations_of(parsed: Any) -> Optional[List[Any]]:
+    # What ExtractorAgent would read out of a parsed response
+    if isinstance(parsed, dict):
+        obs = parsed.get("observations")
+        return obs if isinstance(obs, list) else None
+    if isinstance(parsed, list):
+        return parsed
+    return None
+
+
+# =========================
+# SYNTHETIC OUTPUTS
+# =========================
+EVIDENCE_BITS = ["BP 120/80", "she said \"no pain\"", "O2 {sat} 95%", "denies [vomiting]", "path C:\\temp", "ok, fine", "}{][", "tab\tnewline\n"]
+
+
+def synth_observations(rng: random.Random, n: int) -> List[dict]:
+    out = []
+    for i in range(n):
+        value = rng.choice([rng.randint(1, 200), "Yes", ["nausea", "vomiting"], 98.6, "3 out of 10"])
+        out.append({"id": str(rng.randint(0, 192)), "value": value, "evidence": rng.choice(EVIDENCE_BITS) + f" #{i}"})
+    return out
+
+
+def synth_case(rng: random.Random, n_obs: int):
+    # (text, expected observations or None when the case is damaged)
+    obs = synth_observations(rng, n_obs)
+    body = json.dumps({"observations": obs}, indent=rng.choice([None, 2]))
+    expected = obs
+
+    if rng.random() < 0.3:
+        body = re.sub(r"(\}|\])(\s*)(\]|\})", r"\1,\2\3", body, count=1)
+    kind = rng.choice(["plain", "fenced", "prose", "two_candidates", "truncated", "junk_braces", "list_only"])
+    if kind == "fenced":
+        text = f"```json\n{body}\n```"
+    elif kind == "prose":
+        text = f"Here are the observations I found {{as requested}}:\n{body}\nLet me know [if] you need more."
+    elif kind == "two_candidates":
+        text = f'Schema example: {{"id": "<id>"}}\n{body}'
+    elif kind == "truncated":
+        text = body[: rng.randint(1, max(1, len(body) - 1))]
+        expected = None
+    elif kind == "junk_braces":
+        text = "{" * rng.randint(1, 5) + " thinking... " + body
+    elif kind == "list_only":
+        text = json.dumps(obs)
+    else:
+        text = body
+    return kind, text, expected
+
+
+def pathological(size: int) -> str:
+    # long output that never closes: many openers, brackets inside strings
+    return "{\"observations\": [" + ", ".join('{"id": "1", "evidence": "[{(" ' for _ in range(size)) + "..."
+
+
+# =========================
+# CHECKS
+# =========================
+def feed_in_pieces(text: str, rng: random.Random) -> Any:
+    scanner = JsonScanner(stop_key="observations")
+    pos = 0
+    while pos < len(text):
+        step = rng.randint(1, 40)
+        scanner.feed(text[pos:pos + step])
+        pos += step
+    return scanner.result()
+
+
+def time_fn(fn, texts: List[str], rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for t in texts:
+            fn(t)
+    return time.perf_counter() - t0
+
+
+def load_cached_responses(cache_dir: str, limit: int) -> List[str]:
+    path = Path(cache_dir) / "responses.sqlite"
+    conn = sqlite3.connect(str(path))
+    try:
+        rows = conn.execute("SELECT response FROM responses LIMIT ?", (limit,)).fetchall()
+    finally:
+        conn.close()
+    return [r[0] for r in rows]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--cases", type=int, default=2000)
+    ap.add_argument("--cache_dir", default=None)
+    ap.add_argument("--cache_limit", type=int, default=5000)
+    ap.add_argument("--rounds", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--baseline_rev", default=None)
+    args = ap.parse_args()
+    legacy_extract_json = load_module(
+        "src/lm_utils.py", args.baseline_rev, marker="JsonScanner", names=["extract_json_from_response"]
+    ).extract_json_from_response
+
+    rng = random.Random(args.seed)
+    cases = [synth_case(rng, rng.choice([0, 1, 5, 20, 80])) for _ in range(args.cases)]
+    if args.cache_dir:
+        cases += [("real", t, None) for t in load_cached_responses(args.cache_dir, args.cache_limit)]
+
+    stats = {"cases": len(cases), "piecewise_mismatch": 0, "expected_mismatch": 0,
+             "legacy_disagree": 0, "scanner_recovers_more": 0, "legacy_recovers_more": 0}
+    for kind, text, expected in cases:
+        new = extract_json_from_response(text)
+        if feed_in_pieces(text, rng) != new:
+            stats["piecewise_mismatch"] += 1
+
+        new_obs, old_obs = observations_of(new), observations_of(legacy_extract_json(text))
+        if expected is not None and new_obs != expected:
+            stats["expected_mismatch"] += 1
+            print("expected mismatch:", kind, text[:200])
+        if old_obs and new_obs and old_obs != new_obs:
+            stats["legacy_disagree"] += 1
+        if new_obs and not old_obs:
+            stats["scanner_recovers_more"] += 1
+        if old_obs and not new_obs:
+            stats["legacy_recovers_more"] += 1
+    print(json.dumps(stats))
+
+    by_kind = {}
+    for kind, text, _ in cases:
+        by_kind.setdefault(kind, []).append(text)
+    by_kind["pathological"] = [pathological(n) for n in (200, 1000, 4000)]
+
+    for kind, texts in by_kind.items():
+        t_old = time_fn(legacy_extract_json, texts, args.rounds)
+        t_new = time_fn(extract_json_from_response, texts, args.rounds)
+        n = len(texts) * args.rounds
+        print(json.dumps({
+            "kind": kind,
+            "responses": len(texts),
+            "avg_chars": sum(len(t) for t in texts) // max(1, len(texts)),
+            "legacy_us": round(t_old / n * 1e6, 1),
+            "scanner_us": round(t_new / n * 1e6, 1),
+            "speedup": round(t_old / t_new, 2) if t_new else None,
+        }))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+# bench/mock_ollama.py
+# Deterministic stand-in for the Ollama HTTP API (/api/chat, /api/embed,
+# /api/embeddings, /api/tags) so the pipeline can be benchmarked without a
+# GPU. Answers are generated from the prompt itself: extraction prompts get
+# observations for schema concepts whose name appears in the transcript,
+# precision-filter prompts get KEEP/DROP decisions, embeddings are hashed
+# bag-of-words vectors.
+#
+# Timing model: latency_ms per request, prefill_per_token_ms per prompt token
+# that is not covered by the simulated prompt cache (kv_slots most recent
+# prompts per model; shared prefixes are free), per_token_ms per generated
+# token. Streaming responses are paced token by token. commentary_tokens
+# appends that much prose after every JSON answer, as chatty models do, and
+# malformed_rate breaks that share of extraction answers (an unquoted
+# string). Requests with a JSON-schema `format` get neither: the answer is
+# coerced to the schema, as constrained decoding would produce. parallel
+# caps concurrently served requests (OLLAMA_NUM_PARALLEL); the rest queue.
+#
+#   python -m bench.mock_ollama --port 11435 --latency_ms 40 --prefill_per_token_ms 0.05 --per_token_ms 1 --kv_slots 4
+#   python -m bench.mock_ollama --port 11435 --per_token_ms 10 --commentary_tokens 150
+#   python -m bench.mock_ollama --port 11436 --per_token_ms 2 --parallel 2
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+EMBED_DIM = 64
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+# =========================
+# CANNED ANSWERS
+# =========================
+def approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def embed_text(text: str) -> List[float]:
+    vec = [0.0] * EMBED_DIM
+    for w in WORD_RE.findall(text.lower()):
+        h = int(hashlib.md5(w.encode("utf-8")).hexdigest(), 16)
+        vec[h % EMBED_DIM] += 1.0 if (h >> 8) & 1 else -1.0
+    if not any(vec):
+        vec[0] = 1.0
+    return vec
+
+
+def _stable_unit(text: str) -> float:
+    return int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16) / 0xFFFFFFFF
+
+
+def _schema_items(prompt: str) -> List[Dict[str, Any]]:
+    # Any JSON object in the prompt that looks like a schema entry
+    items = []
+    for m in re.finditer(r"\{[^{}]*\"id\"\s*:\s*\"[^\"]+\"[^{}]*\}", prompt):
+        try:
+            obj = json.loads(m.group(0))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(obj, dict) and "name" in obj:
+            items.append(obj)
+    return items
+
+
+def _transcript(prompt: str) -> str:
+    idx = prompt.rfind("TRANSCRIPT:")
+    if idx < 0:
+        return prompt
+    tail = prompt[idx + len("TRANSCRIPT:"):]
+    # Layouts that append more sections after the transcript
+    for marker in ("\nOBSERVATION", "\nSCHEMA:"):
+        cut = tail.find(marker)
+        if cut >= 0:
+            tail = tail[:cut]
+    return tail.strip()
+
+
+def extraction_answer(prompt: str) -> Dict[str, Any]:
+    transcript = _transcript(prompt)
+    sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", transcript) if s.strip()]
+
+    obs = []
+    for item in _schema_items(prompt):
+        key = str(item.get("name", "")).split(" ")[0].lower()
+        if len(key) < 3:
+            continue
+        sent = next((s for s in sentences if key in s.lower()), None)
+        if sent is None:
+            continue
+
+        vtype = item.get("value_type")
+        enum = item.get("value_enum") or []
+        if vtype == "NUMERIC":
+            m = re.search(r"\d+(?:\.\d+)?", sent)
+            if not m:
+                continue
+            value: Any = m.group(0)
+        elif vtype == "MULTI_SELECT" and enum:
+            value = [enum[0]]
+        elif enum:
+            value = enum[0]
+        else:
+            value = sent[:40]
+        obs.append({"id": str(item["id"]), "value": value, "evidence": sent})
+
+    return {"observations": obs}
+
+
+def filter_answer(prompt: str) -> Dict[str, Any]:
+    numbered = re.findall(r"^\[(\d+)\]", prompt, re.MULTILINE)
+    if numbered:
+        return {"decisions": [
+            {"index": int(i), "decision": "DROP" if _stable_unit(prompt + i) < 0.2 else "KEEP", "reason": "mock"}
+            for i in numbered
+        ]}
+    return {"decision": "DROP" if _stable_unit(prompt) < 0.2 else "KEEP", "reason": "mock"}
+
+
+def chat_answer(prompt: str) -> str:
+    if "KEEP" in prompt and "DROP" in prompt:
+        return json.dumps(filter_answer(prompt))
+    return json.dumps(extraction_answer(prompt), indent=2)
+
+
+def _conforms(value: Any, schema: Dict[str, Any]) -> Any:
+    # value coerced to a (flat) JSON schema, or None if it cannot be
+    if "enum" in schema:
+        return value if value in schema["enum"] else None
+    t = schema.get("type")
+    if t == "number":
+        try:
+            return float(value) if "." in str(value) else int(value)
+        except (TypeError, ValueError):
+            return None
+    if t == "array":
+        items = [v for v in (value if isinstance(value, list) else [value]) if _conforms(v, schema.get("items", {})) is not None]
+        return items or None
+    if t == "string":
+        return value if isinstance(value, str) and value else None
+    return value
+
+
+def constrained_answer(prompt: str, fmt: Any) -> str:
+    # Extraction answer restricted to the observation schema of `format`
+    if not isinstance(fmt, dict) or "observations" not in fmt.get("properties", {}):
+        return chat_answer(prompt)
+    alternatives = {}
+    for alt in fmt["properties"]["observations"].get("items", {}).get("anyOf", []):
+        props = alt.get("properties", {})
+        for cid in props.get("id", {}).get("enum", []):
+            alternatives[cid] = props.get("value", {})
+    obs = []
+    for o in extraction_answer(prompt)["observations"]:
+        if o["id"] not in alternatives:
+            continue
+        value = _conforms(o["value"], alternatives[o["id"]])
+        if value is not None:
+            obs.append({"id": o["id"], "value": value, "evidence": o["evidence"]})
+    return json.dumps({"observations": obs}, indent=2)
+
+
+def malformed(content: str) -> str:
+    return content.replace('"evidence": "', '"evidence": ', 1)
+
+
+def commentary(n_tokens: int) -> str:
+    words = ("Note that these observations were taken directly from the transcript "
+             "and any value not stated {explicitly} was left out.").split()
+    return "\n\n" + " ".join(words[i % len(words)] for i in range(n_tokens))
+
+
+# =========================
+# SERVER
+# =========================
+class MockOllamaServer:
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_ms: float = 0.0,
+        per_token_ms: float = 0.0,
+        jitter: float = 0.0,
+        fail_rate: float = 0.0,
+        seed: int = 0,
+        prefill_per_token_ms: float = 0.0,
+        kv_slots: int = 0,
+        commentary_tokens: int = 0,
+        malformed_rate: float = 0.0,
+        parallel: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self._parallel = threading.Semaphore(parallel) if parallel > 0 else None
+        self._stopped = False
+        self.commentary_tokens = commentary_tokens
+        self.malformed_rate = malformed_rate
+        self.per_token_ms = per_token_ms
+        self.prefill_per_token_ms = prefill_per_token_ms
+        self.kv_slots = kv_slots
+        self._kv: Dict[str, List[str]] = {}
+        self.jitter = jitter
+        self.fail_rate = fail_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # headers and body go out as separate writes; without this
+                # Nagle + delayed ACK adds ~40ms to every keep-alive request
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+            def handle(self):
+                # a client that closed a stream early resets the connection
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code: int, body: bytes, ctype: str = "application/json"):
+                self.send_response(code)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if server._stopped:
+                    self.close_connection = True
+                    return
+                if self.path == "/api/tags":
+                    self._send(200, json.dumps({"models": []}).encode())
+                elif self.path == "/mock/stats":
+                    self._send(200, json.dumps(server.stats()).encode())
+                else:
+                    self._send(200, b"Ollama is running", "text/plain")
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                # a stopped server drops keep-alive connections unanswered
+                if server._stopped:
+                    self.close_connection = True
+                    return
+                server.handle(self, body)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls: Dict[str, int] = {}
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+            self.failures = 0
+            self.cancelled = 0
+            self.prompt_tokens_cached = 0
+            self.inflight = 0
+            self.max_inflight = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": dict(self.calls),
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens,
+                "failures": self.failures,
+                "cancelled": self.cancelled,
+                "prompt_tokens_cached": self.prompt_tokens_cached,
+                "max_inflight": self.max_inflight,
+            }
+
+    def _delay(self, prompt_tokens: int = 0, completion_tokens: int = 0, fixed: bool = True) -> float:
+        with self._lock:
+            j = 1.0 + self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 1.0
+        ms = (self.latency_ms if fixed else 0.0) + self.prefill_per_token_ms * prompt_tokens + self.per_token_ms * completion_tokens
+        return max(0.0, ms * j / 1000.0)
+
+    def _prompt_eval_tokens(self, model: str, prompt: str) -> int:
+        # Prompt-cache simulation: the longest prefix shared with one of the
+        # kv_slots most recent prompts of this model costs nothing
+        total = approx_tokens(prompt)
+        if self.kv_slots <= 0:
+            return total
+        with self._lock:
+            slots = self._kv.setdefault(model, [])
+            shared = max((len(os.path.commonprefix([prompt, p])) for p in slots), default=0)
+            slots.append(prompt)
+            del slots[:-self.kv_slots]
+            cached = min(total - 1, shared // 4)
+            self.prompt_tokens_cached += cached
+        return total - cached
+
+    def handle(self, req: BaseHTTPRequestHandler, body: Dict[str, Any]):
+        if self._parallel is None:
+            self._handle(req, body)
+            return
+        with self._parallel:
+            self._handle(req, body)
+
+    def _handle(self, req: BaseHTTPRequestHandler, body: Dict[str, Any]):
+        path = req.path
+        with self._lock:
+            self.calls[path] = self.calls.get(path, 0) + 1
+            self.inflight += 1
+            self.max_inflight = max(self.max_inflight, self.inflight)
+            fail = self.fail_rate and self._rng.random() < self.fail_rate
+            if fail:
+                self.failures += 1
+        try:
+            if fail:
+                time.sleep(self._delay())
+                req._send(503, json.dumps({"error": "mock overloaded"}).encode())
+            elif path == "/api/chat":
+                self._chat(req, body)
+            elif path == "/api/embed":
+                inputs = body.get("input", "")
+                inputs = inputs if isinstance(inputs, list) else [inputs]
+                time.sleep(self._delay(sum(approx_tokens(t) for t in inputs)))
+                req._send(200, json.dumps({"model": body.get("model", ""), "embeddings": [embed_text(t) for t in inputs]}).encode())
+            elif path == "/api/embeddings":
+                prompt = body.get("prompt", "")
+                time.sleep(self._delay(approx_tokens(prompt)))
+                req._send(200, json.dumps({"embedding": embed_text(prompt)}).encode())
+            else:
+                req._send(404, json.dumps({"error": f"unknown endpoint {path}"}).encode())
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def _chat(self, req: BaseHTTPRequestHandler, body: Dict[str, Any]):
+        model = body.get("model", "")
+        messages = body.get("messages") or []
+        prompt = "\n".join(str(m.get("content", "")) for m in messages)
+        if body.get("format"):
+            content = constrained_answer(prompt, body["format"])
+        else:
+            content = chat_answer(prompt)
+            if self.malformed_rate and '"observations"' in content and _stable_unit(prompt + "#malformed") < self.malformed_rate:
+                content = malformed(content)
+            if self.commentary_tokens:
+                content += commentary(self.commentary_tokens)
+
+        p_tok, c_tok = approx_tokens(prompt), approx_tokens(content)
+        p_eval = self._prompt_eval_tokens(model, prompt)
+        with self._lock:
+            self.prompt_tokens += p_tok
+            self.completion_tokens += c_tok
+
+        prefill = self._delay(p_eval)
+        final = {
+            "model": model,
+            "created_at": "1970-01-01T00:00:00Z",
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": p_eval,
+            "prompt_eval_duration": int(prefill * 1e9),
+            "eval_count": c_tok,
+        }
+
+        if not body.get("stream"):
+            decode = self._delay(completion_tokens=c_tok, fixed=False)
+            time.sleep(prefill + decode)
+            final["message"] = {"role": "assistant", "content": content}
+            final["eval_duration"] = int(decode * 1e9)
+            final["total_duration"] = int((prefill + decode) * 1e9)
+            req._send(200, json.dumps(final).encode())
+            return
+
+        # NDJSON stream over chunked transfer encoding: first piece after
+        # the prefill delay, then ~4 tokens (16 chars) per piece
+        time.sleep(prefill)
+        t0 = time.perf_counter()
+        try:
+            req.send_response(200)
+            req.send_header("Content-Type", "application/x-ndjson")
+            req.send_header("Transfer-Encoding", "chunked")
+            req.end_headers()
+            for i in range(0, len(content), 16):
+                piece = content[i:i + 16]
+                if i:
+                    time.sleep(self._delay(completion_tokens=approx_tokens(piece), fixed=False))
+                self._write_chunk(req, {"model": model, "message": {"role": "assistant", "content": piece}, "done": False})
+            final["message"] = {"role": "assistant", "content": ""}
+            final["eval_duration"] = int((time.perf_counter() - t0) * 1e9)
+            final["total_duration"] = int((prefill + time.perf_counter() - t0) * 1e9)
+            self._write_chunk(req, final)
+            req.wfile.write(b"0\r\n\r\n")
+            req.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # client stopped reading (early termination)
+            with self._lock:
+                self.cancelled += 1
+            req.close_connection = True
+
+    def _write_chunk(self, req: BaseHTTPRequestHandler, obj: Dict[str, Any]):
+        data = (json.dumps(obj) + "\n").encode()
+        req.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        req.wfile.flush()
+
+    def start(self) -> "MockOllamaServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--latency_ms", type=float, default=0.0)
+    ap.add_argument("--per_token_ms", type=float, default=0.0)
+    ap.add_argument("--prefill_per_token_ms", type=float, default=0.0)
+    ap.add_argument("--kv_slots", type=int, default=0)
+    ap.add_argument("--jitter", type=float, default=0.0)
+    ap.add_argument("--fail_rate", type=float, default=0.0)
+    ap.add_argument("--commentary_tokens", type=int, default=0)
+    ap.add_argument("--malformed_rate", type=float, default=0.0)
+    ap.add_argument("--parallel", type=int, default=0)
+    args = ap.parse_args()
+
+    srv = MockOllamaServer(
+        host=args.host,
+        port=args.port,
+        latency_ms=args.latency_ms,
+        per_token_ms=args.per_token_ms,
+        prefill_per_token_ms=args.prefill_per_token_ms,
+        kv_slots=args.kv_slots,
+        jitter=args.jitter,
+        fail_rate=args.fail_rate,
+        commentary_tokens=args.commentary_tokens,
+        malformed_rate=args.malformed_rate,
+        parallel=args.parallel,
+    )
+    print(f"Mock Ollama listening on {srv.url}")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        srv.stop()
+
+
+if __name__ == "__main__":
+    main()
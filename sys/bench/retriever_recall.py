@@ -0,0 +1,110 @@
+# bench/retriever_recall.py
+# Schema retrieval quality and cost per --retriever mode: recall of the gold
+# concept ids of each record (union over its chunks), concepts retrieved per
+# chunk and retrieval latency per chunk.
+#
+# bm25 runs fully offline. embed / hybrid need an embedding server: pass
+# --host for real numbers; without it they run against the mock server,
+# whose hashed bag-of-words embeddings only exercise the code path.
+#
+#   python -m bench.retriever_recall --split dev --schema_path data/synur_schema.json --modes bm25
+#   python -m bench.retriever_recall --split dev --schema_path data/synur_schema.json --host http://localhost:11434
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from bench.mock_ollama import MockOllamaServer
+from src.agents.lexical_retriever import HybridRetriever, LexicalRetriever
+from src.agents.schema_retriever import SchemaRetriever
+from src.llm_client import configure_client
+from src.run import split_transcript
+from src.schema import SynurSchema
+
+
+def load_records(path: Path, limit: int):
+    recs = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            obs = rec.get("observations", [])
+            if isinstance(obs, str):
+                obs = json.loads(obs)
+            recs.append((rec.get("transcript", ""), {str(o.get("id")) for o in obs}))
+            if limit and len(recs) >= limit:
+                break
+    return recs
+
+
+def evaluate(retriever, records, segment: bool):
+    hits = total = chunks = retrieved = 0
+    seconds = 0.0
+    for transcript, gold in records:
+        found = set()
+        for chunk in split_transcript(transcript) if segment else [transcript]:
+            t0 = time.perf_counter()
+            ids = retriever.retrieve(chunk)
+            seconds += time.perf_counter() - t0
+            chunks += 1
+            retrieved += len(ids)
+            found.update(ids)
+        hits += len(gold & found)
+        total += len(gold)
+    return {
+        "recall": round(hits / max(1, total), 4),
+        "concepts_per_chunk": round(retrieved / max(1, chunks), 1),
+        "ms_per_chunk": round(seconds / max(1, chunks) * 1000, 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--modes", default="bm25,embed,hybrid")
+    ap.add_argument("--top_k", default="20,40,80")
+    ap.add_argument("--segment", action="store_true")
+    ap.add_argument("--limit", type=int, default=0)
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--embed_model", default="nomic-embed-text")
+    ap.add_argument("--alpha", type=float, default=0.5)
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    records = load_records(Path(args.data_dir) / f"{args.split}.jsonl", args.limit)
+    modes = args.modes.split(",")
+
+    server = None
+    if ("embed" in modes or "hybrid" in modes) and args.host is None:
+        server = MockOllamaServer().start()
+    configure_client(host=args.host or (server.url if server else None))
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            embed = None
+            if "embed" in modes or "hybrid" in modes:
+                embed = SchemaRetriever(schema.by_id, embed_model=args.embed_model, index_dir=tmp, concepts=schema.concepts)
+            lexical = LexicalRetriever(schema.by_id, concepts=schema.concepts)
+
+            for k in [int(x) for x in args.top_k.split(",")]:
+                for mode in modes:
+                    if mode == "bm25":
+                        lexical.top_k = k
+                        retriever = lexical
+                    elif mode == "embed":
+                        embed.top_k = k
+                        retriever = embed
+                    else:
+                        retriever = HybridRetriever(lexical, embed, top_k=k, alpha=args.alpha)
+                    print(json.dumps({"mode": mode, "top_k": k, **evaluate(retriever, records, args.segment)}))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# bench/run_bench.py
+# End-to-end throughput benchmark of src/run.py against the mock Ollama
+# server, over synthetic transcripts of varying length and every
+# combination of --segment / --schema_retrieval / --precision_filter.
+#
+#   python -m bench.run_bench --schema_path data/synur_schema.json --records 30 --latency_ms 20
+#   python -m bench.run_bench --schema_path data/synur_schema.json --extra "--workers 4 --record_parallelism 4"
+import argparse
+import itertools
+import json
+import random
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bench.mock_ollama import MockOllamaServer
+
+SYS_DIR = Path(__file__).resolve().parent.parent
+FLAGS = ["--segment", "--schema_retrieval", "--precision_filter"]
+
+
+# =========================
+# SYNTHETIC DATA
+# =========================
+def synth_sentence(item: Dict[str, Any], rng: random.Random) -> str:
+    name = item.get("name", "")
+    vtype = item.get("value_type")
+    enum = item.get("value_enum") or []
+    if vtype == "NUMERIC":
+        value = str(rng.randint(1, 180))
+    elif enum:
+        value = rng.choice(enum)
+    else:
+        value = "within normal limits"
+    filler = rng.choice(["", "um, ", "uh, ", "I'd say "])
+    return f"{name} is {filler}{value}."
+
+
+def synth_transcript(schema: List[Dict[str, Any]], n_sentences: int, rng: random.Random) -> str:
+    paras, cur = [], []
+    for _ in range(n_sentences):
+        cur.append(synth_sentence(rng.choice(schema), rng))
+        if len(cur) == 4:
+            paras.append("[Clinician] " + " ".join(cur))
+            cur = []
+    if cur:
+        paras.append("[Clinician] " + " ".join(cur))
+    return "\n\n".join(paras)
+
+
+def write_split(path: Path, schema: List[Dict[str, Any]], n_records: int, lengths: List[int], seed: int):
+    rng = random.Random(seed)
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(n_records):
+            n = lengths[i % len(lengths)]
+            rec = {"id": f"bench-{i}", "transcript": synth_transcript(schema, n, rng)}
+            f.write(json.dumps(rec) + "\n")
+
+
+# =========================
+# RUN
+# =========================
+def run_combo(
+    flags: List[str],
+    data_dir: Path,
+    schema_path: str,
+    server: MockOllamaServer,
+    extra: List[str],
+    work: Path,
+) -> Dict[str, Any]:
+    tag = "+".join(f.lstrip("-") for f in flags) or "baseline"
+    out = work / f"out_{tag}.jsonl"
+    cmd = [
+        sys.executable, "-m", "src.run",
+        "--split", "bench",
+        "--data_dir", str(data_dir),
+        "--schema_path", schema_path,
+        "--out", str(out),
+        "--ollama_host", server.url,
+        "--index_dir", str(work / "schema_index"),
+        *flags,
+        *extra,
+    ]
+
+    server.reset_stats()
+    t0 = time.perf_counter()
+    subprocess.run(cmd, cwd=SYS_DIR, check=True, stdout=subprocess.DEVNULL)
+    wall = time.perf_counter() - t0
+
+    with out.with_name(out.name + ".metrics.json").open("r", encoding="utf-8") as f:
+        run = json.load(f)["run"]
+    mock = server.stats()
+
+    return {
+        "flags": tag,
+        "records": run["records"],
+        "records_per_s": run["records_per_s"],
+        "llm_calls_per_record": run["llm_calls_per_record"],
+        "embed_calls": mock["calls"].get("/api/embeddings", 0) + mock["calls"].get("/api/embed", 0),
+        "p50_s": run["record_latency_p50_s"],
+        "p95_s": run["record_latency_p95_s"],
+        "prompt_tokens": run["llm_total"]["prompt_tokens"],
+        "completion_tokens": run["llm_total"]["completion_tokens"],
+        "max_server_inflight": mock["max_inflight"],
+        "process_wall_s": round(wall, 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--records", type=int, default=20)
+    ap.add_argument("--lengths", default="6,24,60")
+    ap.add_argument("--latency_ms", type=float, default=20.0)
+    ap.add_argument("--per_token_ms", type=float, default=0.0)
+    ap.add_argument("--prefill_per_token_ms", type=float, default=0.0)
+    ap.add_argument("--kv_slots", type=int, default=0)
+    ap.add_argument("--jitter", type=float, default=0.1)
+    ap.add_argument("--extra", default="")
+    ap.add_argument("--combos", default="all", help="'all' or ';'-separated flag sets, e.g. '--segment;--segment --precision_filter'")
+    ap.add_argument("--report", default=None)
+    ap.add_argument("--seed", type=int, default=13)
+    args = ap.parse_args()
+
+    schema_path = str(Path(args.schema_path).resolve())
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+
+    if args.combos == "all":
+        combos = [[f for f, on in zip(FLAGS, bits) if on] for bits in itertools.product([0, 1], repeat=len(FLAGS))]
+    else:
+        combos = [shlex.split(c) for c in args.combos.split(";")]
+
+    server = MockOllamaServer(
+        latency_ms=args.latency_ms,
+        per_token_ms=args.per_token_ms,
+        prefill_per_token_ms=args.prefill_per_token_ms,
+        kv_slots=args.kv_slots,
+        jitter=args.jitter,
+        seed=args.seed,
+    ).start()
+
+    rows = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            work = Path(tmp)
+            write_split(work / "bench.jsonl", schema, args.records, [int(x) for x in args.lengths.split(",")], args.seed)
+            for flags in combos:
+                row = run_combo(flags, work, schema_path, server, shlex.split(args.extra), work)
+                rows.append(row)
+                print(json.dumps(row))
+    finally:
+        server.stop()
+
+    print()
+    print(f"{'flags':45s} {'rec/s':>8s} {'calls/rec':>10s} {'p50 s':>8s} {'p95 s':>8s}")
+    for r in rows:
+        print(f"{r['flags']:45s} {r['records_per_s']:8.3f} {r['llm_calls_per_record']:10.2f} {r['p50_s']:8.3f} {r['p95_s']:8.3f}")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench/segmenter.py
+# Chunk-size control and boundary loss of the transcript splitters: the
+# blank-line / character split_transcript vs the token-budgeted Segmenter
+# with and without overlap. Reports chunks per record, chunk token size
+# (p50 / p95 / max against the budget) and the share of transcript
+# sentences that no single chunk contains whole (what an extraction call
+# can never see as one piece of evidence).
+#
+# Transcripts are repeated --repeat times with paragraph breaks removed to
+# emulate long single-paragraph dictations.
+#
+#   python -m bench.segmenter --split dev --max_tokens 350 --overlap 0,60 --repeat 1,4
+#   python -m bench.segmenter --split dev --tokenizer tiktoken:cl100k_base
+import argparse
+import json
+import re
+from pathlib import Path
+
+from src.instrument import percentile
+from src.run import split_transcript
+from src.segmenter import Segmenter, load_token_counter
+
+
+def sentences(text: str):
+    return [s for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+
+
+def measure(split_fn, transcripts, count_tokens):
+    sizes, n_chunks, lost, total = [], 0, 0, 0
+    for t in transcripts:
+        chunks = split_fn(t)
+        n_chunks += len(chunks)
+        sizes.extend(count_tokens(c) for c in chunks)
+        for s in sentences(t):
+            total += 1
+            if not any(s in c for c in chunks):
+                lost += 1
+    return {
+        "chunks_per_record": round(n_chunks / max(1, len(transcripts)), 2),
+        "tokens_p50": round(percentile(sizes, 0.5)),
+        "tokens_p95": round(percentile(sizes, 0.95)),
+        "tokens_max": max(sizes) if sizes else 0,
+        "sentences_split": round(lost / max(1, total), 4),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--max_tokens", type=int, default=350)
+    ap.add_argument("--overlap", default="0,60")
+    ap.add_argument("--repeat", default="1,4")
+    ap.add_argument("--tokenizer", default="approx")
+    ap.add_argument("--limit", type=int, default=0)
+    args = ap.parse_args()
+
+    count_tokens = load_token_counter(args.tokenizer)
+    base = []
+    with (Path(args.data_dir) / f"{args.split}.jsonl").open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                base.append(json.loads(line).get("transcript", ""))
+            if args.limit and len(base) >= args.limit:
+                break
+
+    for rep in [int(x) for x in args.repeat.split(",")]:
+        transcripts = base if rep == 1 else [" ".join([t.replace("\n\n", " ")] * rep) for t in base]
+        rows = [("split_transcript", split_transcript)]
+        for ov in [int(x) for x in args.overlap.split(",")]:
+            seg = Segmenter(args.max_tokens, ov, count_tokens)
+            rows.append((f"segmenter(overlap={ov})", seg.split))
+        for name, fn in rows:
+            print(json.dumps({"repeat": rep, "splitter": name, "budget": args.max_tokens, **measure(fn, transcripts, count_tokens)}))
+
+
+if __name__ == "__main__":
+    main()
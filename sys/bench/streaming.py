@@ -0,0 +1,112 @@
+# bench/streaming.py
+# Extraction calls answered in one blocking response vs streamed with early
+# termination (ExtractorAgent(stream=True)). Per call: wall time, time to
+# the first parsed observation (what streaming validation can start on) and,
+# on the mock, how many streams were closed before the model finished. The
+# mock appends --commentary_tokens of prose after each JSON answer, as chatty
+# models do; that tail is what early termination saves.
+#
+#   python -m bench.streaming --split dev --schema_path data/synur_schema.json --per_token_ms 5 --commentary_tokens 150
+#   python -m bench.streaming --split dev --schema_path data/synur_schema.json --host http://localhost:11434 --model llama3.3
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from bench.mock_ollama import MockOllamaServer
+from src.agents.extract import ExtractorAgent
+from src.instrument import percentile
+from src.llm_client import configure_client
+from src.run import chunk_schema_ids, split_transcript
+from src.schema import SynurSchema
+
+
+def load_tasks(path: Path, schema: SynurSchema, batch_size: int, limit: int) -> List[Tuple[str, List[str]]]:
+    tasks = []
+    ids = list(schema.by_id.keys())
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            for chunk in split_transcript(rec.get("transcript", "")):
+                for sb in chunk_schema_ids(ids, batch_size):
+                    tasks.append((chunk, sb))
+            if limit and len(tasks) >= limit:
+                break
+    return tasks[:limit] if limit else tasks
+
+
+def run_calls(extractor: ExtractorAgent, tasks) -> Dict[str, Any]:
+    walls, firsts, n_obs = [], [], 0
+    for chunk, sb in tasks:
+        first = []
+        t0 = time.perf_counter()
+
+        def on_observation(o, t0=t0, first=first):
+            if not first:
+                first.append(time.perf_counter() - t0)
+
+        obs = extractor.run(chunk, sb, on_observation)
+        walls.append(time.perf_counter() - t0)
+        if first:
+            firsts.append(first[0])
+        n_obs += len(obs)
+    return {
+        "calls": len(tasks),
+        "observations": n_obs,
+        "wall_p50_ms": round(percentile(walls, 0.5) * 1000, 1),
+        "wall_p95_ms": round(percentile(walls, 0.95) * 1000, 1),
+        "first_obs_p50_ms": round(percentile(firsts, 0.5) * 1000, 1),
+        "total_s": round(sum(walls), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--model", default="llama3.3")
+    ap.add_argument("--batch_size", type=int, default=25)
+    ap.add_argument("--limit", type=int, default=40)
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--latency_ms", type=float, default=5.0, help="mock only")
+    ap.add_argument("--per_token_ms", type=float, default=5.0, help="mock only")
+    ap.add_argument("--commentary_tokens", type=int, default=150, help="mock only")
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    tasks = load_tasks(Path(args.data_dir) / f"{args.split}.jsonl", schema, args.batch_size, args.limit)
+
+    server = None
+    if args.host is None:
+        server = MockOllamaServer(
+            latency_ms=args.latency_ms,
+            per_token_ms=args.per_token_ms,
+            commentary_tokens=args.commentary_tokens,
+        ).start()
+    configure_client(host=args.host or server.url)
+
+    results = {}
+    try:
+        for name, stream in [("blocking", False), ("streaming", True)]:
+            extractor = ExtractorAgent(args.model, schema.by_id, concepts=schema.concepts, stream=stream)
+            if server is not None:
+                server.reset_stats()
+            row = run_calls(extractor, tasks)
+            if server is not None:
+                row["streams_cancelled"] = server.stats()["cancelled"]
+            results[name] = row
+            print(json.dumps({"mode": name, **row}))
+
+        if results["blocking"]["observations"] != results["streaming"]["observations"]:
+            print("⚠️ observation counts differ between modes")
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench/structured_output.py
+# Free-form extraction vs schema-constrained decoding
+# (ExtractorAgent(structured=True), a per-batch JSON schema passed as Ollama's
+# `format`). Per mode: calls whose answer held no parseable observations
+# (the whole call lost), completion tokens, observations extracted and
+# surviving validation, and wall time. On the mock, --malformed_rate breaks
+# that share of free-form answers and --commentary_tokens adds trailing prose;
+# constrained answers get neither.
+#
+#   python -m bench.structured_output --split dev --schema_path data/synur_schema.json --malformed_rate 0.1 --commentary_tokens 40
+#   python -m bench.structured_output --split dev --schema_path data/synur_schema.json --host http://localhost:11434 --model llama3.3
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+from bench.mock_ollama import MockOllamaServer
+from src.agents.extract import ExtractorAgent
+from src.agents.validate import ValidatorAgent
+from src.instrument import Instrumentation, set_instrumentation
+from src.llm_client import configure_client
+from src.run import chunk_schema_ids, split_transcript
+from src.schema import SynurSchema
+
+
+def load_tasks(path: Path, schema: SynurSchema, batch_size: int, limit: int) -> List[Tuple[str, str, List[str]]]:
+    # (transcript, chunk, schema batch)
+    tasks = []
+    ids = list(schema.by_id.keys())
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            text = json.loads(line).get("transcript", "")
+            for chunk in split_transcript(text):
+                for sb in chunk_schema_ids(ids, batch_size):
+                    tasks.append((text, chunk, sb))
+            if limit and len(tasks) >= limit:
+                break
+    return tasks[:limit] if limit else tasks
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--model", default="llama3.3")
+    ap.add_argument("--batch_size", type=int, default=25)
+    ap.add_argument("--limit", type=int, default=100)
+    ap.add_argument("--host", default=None)
+    ap.add_argument("--latency_ms", type=float, default=2.0, help="mock only")
+    ap.add_argument("--per_token_ms", type=float, default=0.0, help="mock only")
+    ap.add_argument("--malformed_rate", type=float, default=0.1, help="mock only")
+    ap.add_argument("--commentary_tokens", type=int, default=40, help="mock only")
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    tasks = load_tasks(Path(args.data_dir) / f"{args.split}.jsonl", schema, args.batch_size, args.limit)
+    validator = ValidatorAgent(schema.by_id, concepts=schema.concepts)
+
+    server = None
+    if args.host is None:
+        server = MockOllamaServer(
+            latency_ms=args.latency_ms,
+            per_token_ms=args.per_token_ms,
+            malformed_rate=args.malformed_rate,
+            commentary_tokens=args.commentary_tokens,
+        ).start()
+    configure_client(host=args.host or server.url)
+
+    try:
+        for name, structured in [("free_form", False), ("structured", True)]:
+            instr = Instrumentation()
+            set_instrumentation(instr)
+            extractor = ExtractorAgent(args.model, schema.by_id, concepts=schema.concepts, structured=structured)
+
+            n_obs = n_valid = 0
+            t0 = time.perf_counter()
+            for text, chunk, sb in tasks:
+                obs = extractor.run(chunk, sb)
+                n_obs += len(obs)
+                n_valid += len(validator.run(obs, text))
+            wall = time.perf_counter() - t0
+
+            run = instr.summary()["run"]
+            print(json.dumps({
+                "mode": name,
+                "calls": run["llm_total"]["calls"],
+                "lost_calls": run["counters"].get("extract_parse_failures", 0),
+                "completion_tokens": run["llm_total"]["completion_tokens"],
+                "observations": n_obs,
+                "validated": n_valid,
+                "wall_s": round(wall, 3),
+            }))
+    finally:
+        set_instrumentation(None)
+        if server is not None:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# bench/validator_regex.py
+# Per-observation cost of ValidatorAgent.run on long transcripts: the
+# precompiled single-pass validator vs the previous per-pattern re.search
+# implementation, loaded from git (--baseline_rev, default the parent of the
+# commit that introduced it).
+#
+#   python -m bench.validator_regex --split dev --schema_path data/synur_schema.json --repeat 1,8,32
+import argparse
+import json
+import re
+import time
+from pathlib import Path
+
+from bench.baseline import load_module
+from src.agents.validate import ValidatorAgent
+from src.schema import SynurSchema
+
+
+# =========================
+# DATA
+# =========================
+def load_cases(path: Path, repeat: int, limit: int):
+    cases = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            rec = json.loads(line)
+            transcript = "\n\n".join([rec["transcript"]] * repeat)
+            gold = rec.get("observations", [])
+            if isinstance(gold, str):
+                gold = json.loads(gold)
+
+            # gold observations with evidence drawn from the transcript, so
+            # they reach every check (anchors, hedges, negation)
+            sentences = [s for s in re.split(r"(?<=[.!?])\s+", rec["transcript"]) if s.strip()]
+            obs = []
+            for i, o in enumerate(gold):
+                obs.append({**o, "evidence": sentences[i % len(sentences)] if sentences else ""})
+            cases.append((transcript, obs))
+            if limit and len(cases) >= limit:
+                break
+    return cases
+
+
+def time_validator(agent, cases, rounds: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for transcript, obs in cases:
+            agent.run(obs, transcript)
+    return time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--split", default="dev")
+    ap.add_argument("--data_dir", default="data")
+    ap.add_argument("--schema_path", required=True)
+    ap.add_argument("--repeat", default="1,8,32", help="transcript length multipliers")
+    ap.add_argument("--limit", type=int, default=50)
+    ap.add_argument("--rounds", type=int, default=5)
+    ap.add_argument("--baseline_rev", default=None)
+    args = ap.parse_args()
+
+    schema = SynurSchema(args.schema_path)
+    legacy = load_module("src/agents/validate.py", args.baseline_rev, marker="_TranscriptScan")
+    new, old = ValidatorAgent(schema.by_id), legacy.ValidatorAgent(schema.by_id)
+
+    for rep in [int(x) for x in args.repeat.split(",")]:
+        cases = load_cases(Path(args.data_dir) / f"{args.split}.jsonl", rep, args.limit)
+        n_obs = sum(len(o) for _, o in cases) * args.rounds
+        avg_chars = sum(len(t) for t, _ in cases) // max(1, len(cases))
+
+        # identical decisions before timing anything
+        for transcript, obs in cases:
+            assert new.run(obs, transcript) == old.run(obs, transcript)
+
+        t_old = time_validator(old, cases, args.rounds)
+        t_new = time_validator(new, cases, args.rounds)
+        print(json.dumps({
+            "repeat": rep,
+            "avg_transcript_chars": avg_chars,
+            "observations": n_obs,
+            "legacy_us_per_obs": round(t_old / n_obs * 1e6, 2),
+            "compiled_us_per_obs": round(t_new / n_obs * 1e6, 2),
+            "speedup": round(t_old / t_new, 2) if t_new else None,
+        }))
+
+
+if __name__ == "__main__":
+    main()
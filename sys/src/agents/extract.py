@@ -1,46 +1,14 @@
 # src/agents/extract.py
-import json
-from typing import List, Dict, Any
-from src.lm_utils import generate_response, extract_json_from_response
+from functools import lru_cache
+from typing import List, Dict, Any, Callable, Optional, Tuple
+from src import instrument
+from src.lm_utils import generate_response, extract_json_from_response, stream_json_response
+from src.schema import SchemaConcept, build_concepts, observation_format, schema_block_json
 
-
-class ExtractorAgent:
-    def __init__(self, model: str, schema_by_id: Dict[str, Dict[str, Any]]):
-        self.model = model
-        self.schema_by_id = schema_by_id
-
-    def _build_schema_block(self, concept_ids: List[str]) -> List[Dict[str, Any]]:
-        block = []
-        for cid in concept_ids:
-            if cid in self.schema_by_id:
-                s = self.schema_by_id[cid]
-                block.append({
-                    "id": cid,
-                    "name": s.get("name", ""),
-                    "value_type": s.get("value_type", ""),
-                    "value_enum": s.get("value_enum", []) or [],
-                })
-        return block
-
-    def _parse_observations(self, raw: str) -> List[Dict[str, Any]]:
-        parsed = extract_json_from_response(raw)
-        if isinstance(parsed, dict):
-            obs = parsed.get("observations", [])
-            return obs if isinstance(obs, list) else []
-        if isinstance(parsed, list):
-            return parsed
-        return []
-
-    def run(self, transcript: str, concept_ids: List[str]) -> List[Dict[str, Any]]:
-        if not isinstance(transcript, str) or not transcript.strip() or not concept_ids:
-            return []
-
-        schema_block = self._build_schema_block(concept_ids)
-        if not schema_block:
-            return []
-
-        prompt = f"""
-You are a clinical information extraction system.
+# Static part of the extraction prompt. Prompts are laid out as
+# HEADER + SCHEMA(batch) + TRANSCRIPT so consecutive calls share the longest
+# possible prefix and the server can reuse its prompt (KV) cache.
+EXTRACTION_HEADER = """You are a clinical information extraction system.
 
 TASK:
 Extract ONLY observations that are explicitly stated in the transcript.
@@ -61,48 +29,136 @@ NEGATION RULE:
   using words like: "no", "denies", "without", "absent", "none".
 
 OUTPUT FORMAT (JSON ONLY):
-{{
+{
   "observations": [
-    {{
+    {
       "id": "<id>",
       "value": <value>,
       "evidence": "<EXACT copied substring from transcript>"
-    }}
+    }
   ]
-}}
+}
 
-SCHEMA:
-{json.dumps(schema_block, indent=2)}
+"""
 
-TRANSCRIPT:
-{transcript}
-""".strip()
 
+# Per-batch prompt prefixes and output schemas kept per agent. Fixed
+# --batch_size batches repeat across chunks and records; retrieval makes most
+# batches one-off, so the caches are bounded LRUs rather than growing with
+# the split.
+BATCH_CACHE_SIZE = 256
 
-        raw = generate_response(self.model, prompt, temperature=0.0, max_tokens=700)
-        obs = self._parse_observations(raw)
 
-        clean: List[Dict[str, Any]] = []
-        for o in obs:
-            if not isinstance(o, dict):
-                continue
+class ExtractorAgent:
+    def __init__(
+        self,
+        model: str,
+        schema_by_id: Dict[str, Dict[str, Any]],
+        concepts: Dict[str, SchemaConcept] = None,
+        stream: bool = False,
+        structured: bool = False,
+    ):
+        self.model = model
+        self.schema_by_id = schema_by_id
+        self.concepts = concepts if concepts is not None else build_concepts(schema_by_id)
 
-            cid = str(o.get("id", "")).strip()
-            if cid not in self.schema_by_id:
-                continue
+        # stream the completion and stop it once the JSON is complete
+        self.stream = stream
 
-            if "value" not in o:
-                continue
+        # constrain decoding to a per-batch JSON schema (Ollama `format`);
+        # schemas are cached per batch like the prompt prefixes
+        self.structured = structured
+        self._format_cache = lru_cache(maxsize=BATCH_CACHE_SIZE)(self._build_format)
 
-            evidence = o.get("evidence", "")
-            if not isinstance(evidence, str) or not evidence.strip():
-                continue
+        # schema batch (tuple of ids) -> HEADER + serialized SCHEMA block
+        self._prefix_cache = lru_cache(maxsize=BATCH_CACHE_SIZE)(self._build_prefix)
+
+    def _build_prefix(self, key: Tuple[str, ...]) -> str:
+        batch = self._batch_concepts(list(key))
+        return f"{EXTRACTION_HEADER}SCHEMA:\n{schema_block_json(batch)}\n\nTRANSCRIPT:\n"
+
+    def _prompt_prefix(self, concept_ids: List[str]) -> str:
+        return self._prefix_cache(tuple(concept_ids))
+
+    def _build_format(self, key: Tuple[str, ...]) -> Dict[str, Any]:
+        return observation_format(self._batch_concepts(list(key)))
+
+    def _format(self, concept_ids: List[str]) -> Dict[str, Any]:
+        return self._format_cache(tuple(concept_ids))
+
+    def _batch_concepts(self, concept_ids: List[str]) -> List[SchemaConcept]:
+        return [self.concepts[cid] for cid in concept_ids if cid in self.concepts]
+
+    def _parse_observations(self, raw: str) -> List[Dict[str, Any]]:
+        parsed = extract_json_from_response(raw)
+        if isinstance(parsed, dict):
+            obs = parsed.get("observations")
+            if isinstance(obs, list):
+                return obs
+        elif isinstance(parsed, list):
+            return parsed
+        # the whole call is lost
+        instrument.count("extract_parse_failures")
+        return []
+
+    def _clean(self, o: Any) -> Optional[Dict[str, Any]]:
+        if not isinstance(o, dict):
+            return None
+
+        cid = str(o.get("id", "")).strip()
+        if cid not in self.concepts:
+            return None
+
+        if "value" not in o:
+            return None
+
+        evidence = o.get("evidence", "")
+        if not isinstance(evidence, str) or not evidence.strip():
+            return None
+
+        return {
+            "id": cid,
+            "name": self.concepts[cid].name,
+            "value": o.get("value"),
+            "evidence": evidence.strip(),
+        }
+
+    def run(
+        self,
+        transcript: str,
+        concept_ids: List[str],
+        on_observation: Callable[[Dict[str, Any]], None] = None,
+    ) -> List[Dict[str, Any]]:
+        # on_observation sees each clean observation as soon as it is parsed
+        # (while the model is still generating when streaming); the returned
+        # list is the authoritative result
+        if not isinstance(transcript, str) or not transcript.strip() or not concept_ids:
+            return []
 
-            clean.append({
-                "id": cid,
-                "name": self.schema_by_id[cid].get("name", ""),
-                "value": o.get("value"),
-                "evidence": evidence.strip(),
-            })
+        batch = self._batch_concepts(concept_ids)
+        if not batch:
+            return []
+
+        prompt = self._prompt_prefix(concept_ids) + transcript.rstrip()
+        fmt = self._format(concept_ids) if self.structured else None
+
+        if self.stream:
+            def emit(o):
+                c = self._clean(o)
+                if c is not None:
+                    on_observation(c)
+            on_item = emit if on_observation is not None else None
+            raw = stream_json_response(self.model, prompt, temperature=0.0, max_tokens=700, format=fmt, on_item=on_item)
+        else:
+            raw = generate_response(self.model, prompt, temperature=0.0, max_tokens=700, format=fmt)
+
+        clean: List[Dict[str, Any]] = []
+        for o in self._parse_observations(raw):
+            c = self._clean(o)
+            if c is None:
+                continue
+            clean.append(c)
+            if on_observation is not None and not self.stream:
+                on_observation(c)
 
         return clean
\ No newline at end of file
@@ -0,0 +1,204 @@
+# src/agents/lexical_retriever.py
+import math
+import re
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+
+from src import instrument
+from src.agents.validate import ID_ANCHOR_REQUIRED
+from src.schema import SchemaConcept, build_concepts
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "he",
+    "her", "his", "i", "in", "is", "it", "its", "of", "on", "or", "she", "so", "that", "the",
+    "their", "there", "they", "this", "to", "was", "we", "were", "with", "you", "um", "uh",
+}
+
+# Bedside shorthand -> schema vocabulary (query side only)
+SYNONYMS = {
+    "bp": ["blood", "pressure"],
+    "hr": ["heart", "rate"],
+    "bpm": ["heart", "rate"],
+    "rr": ["respirations"],
+    "breaths": ["respirations"],
+    "breathing": ["respirations"],
+    "sat": ["oxygen", "saturation"],
+    "sats": ["oxygen", "saturation"],
+    "spo2": ["oxygen", "saturation", "pulse", "oximetry"],
+    "o2": ["oxygen"],
+    "temp": ["temperature"],
+    "fever": ["temperature"],
+    "febrile": ["temperature"],
+    "afebrile": ["temperature"],
+    "map": ["mean", "arterial", "pressure"],
+    "mmhg": ["blood", "pressure"],
+    "kg": ["weight"],
+    "lbs": ["weight"],
+    "weighs": ["weight"],
+    "cm": ["height"],
+    "tall": ["height"],
+    "vomit": ["vomiting", "emesis"],
+    "threw": ["vomiting", "emesis"],
+    "sob": ["dyspnea"],
+    "gcs": ["glasgow", "coma"],
+    "iv": ["intravenous"],
+    "ng": ["nasogastric"],
+    "peg": ["feeding", "tube"],
+    "voided": ["voiding", "urine"],
+    "pee": ["urine", "voiding"],
+    "bm": ["bowel", "movement"],
+    "stool": ["bowel", "stool"],
+    "jvd": ["jugular", "venous", "distention"],
+    "fio2": ["fraction", "inspired", "oxygen"],
+    "cap": ["capillary"],
+    "rom": ["range", "motion"],
+    "wob": ["work", "breathing"],
+}
+
+
+def stem(tok: str) -> str:
+    # Crude suffix stripping, enough to match "vomiting"/"vomited"/"vomit"
+    for suf in ("ing", "ed", "s"):
+        if tok.endswith(suf) and len(tok) - len(suf) >= 3 and not tok.endswith("ss"):
+            return tok[: -len(suf)]
+    return tok
+
+
+def tokenize(text: str) -> List[str]:
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def expand_query(text: str) -> List[str]:
+    out = []
+    for t in TOKEN_RE.findall(text.lower()):
+        if t in STOPWORDS:
+            continue
+        out.append(stem(t))
+        for syn in SYNONYMS.get(t, ()):
+            out.append(stem(syn))
+    return out
+
+
+# BM25 over one short document per concept (name twice, value_enum strings)
+# with an inverted index of precomputed per-posting weights, so a query is a
+# handful of numpy scatter-adds. Concepts whose anchor cue (seeded from the
+# validator's id_anchor_required) occurs in the chunk get anchor_weight on
+# top, which ranks them ahead of plain lexical matches.
+class LexicalRetriever:
+    def __init__(
+        self,
+        schema_by_id: Dict[str, Dict[str, Any]],
+        top_k: int = 40,
+        concepts: Dict[str, SchemaConcept] = None,
+        anchors: Optional[Dict[str, List[str]]] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        anchor_weight: float = 10.0,
+    ):
+        self.schema_by_id = schema_by_id
+        self.concepts = concepts if concepts is not None else build_concepts(schema_by_id)
+        self.top_k = top_k
+        self.anchor_weight = anchor_weight
+
+        self.schema_ids: List[str] = list(self.concepts.keys())
+        docs = [
+            tokenize(f"{c.name} {c.name} {' '.join(c.value_enum)}")
+            for c in self.concepts.values()
+        ]
+
+        avgdl = sum(len(d) for d in docs) / max(1, len(docs))
+        tfs: Dict[str, Dict[int, int]] = {}
+        for i, d in enumerate(docs):
+            for t in d:
+                tfs.setdefault(t, {}).setdefault(i, 0)
+                tfs[t][i] += 1
+
+        n = len(docs)
+        self.postings: Dict[str, tuple] = {}
+        for t, per_doc in tfs.items():
+            idf = math.log(1.0 + (n - len(per_doc) + 0.5) / (len(per_doc) + 0.5))
+            idx = np.fromiter(per_doc.keys(), dtype=np.int64, count=len(per_doc))
+            w = np.array([
+                idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(docs[i]) / avgdl))
+                for i, tf in per_doc.items()
+            ])
+            self.postings[t] = (idx, w)
+
+        anchors = ID_ANCHOR_REQUIRED if anchors is None else anchors
+        pos = {cid: i for i, cid in enumerate(self.schema_ids)}
+        self.anchor_re = [
+            (pos[cid], re.compile("|".join(f"(?:{p})" for p in patterns)))
+            for cid, patterns in anchors.items()
+            if cid in pos and patterns
+        ]
+
+    def scores(self, transcript_chunk: str) -> np.ndarray:
+        scores = np.zeros(len(self.schema_ids))
+        for t in set(expand_query(transcript_chunk)):
+            hit = self.postings.get(t)
+            if hit is not None:
+                scores[hit[0]] += hit[1]
+
+        if self.anchor_re:
+            low = transcript_chunk.lower()
+            for i, rx in self.anchor_re:
+                if rx.search(low):
+                    scores[i] += self.anchor_weight
+        return scores
+
+    def retrieve_scored(self, transcript_chunk: str) -> List[Tuple[str, float]]:
+        scores = self.scores(transcript_chunk)
+        instrument.count("lexical_retrievals")
+
+        # Only concepts with some lexical/anchor support are kept
+        top_idx = np.argsort(-scores, kind="stable")[: self.top_k]
+        return [(self.schema_ids[i], float(scores[i])) for i in top_idx if scores[i] > 0]
+
+    def retrieve(self, transcript_chunk: str) -> List[str]:
+        return [cid for cid, _ in self.retrieve_scored(transcript_chunk)]
+
+    def retrieve_scored_many(self, transcript_chunks: List[str]) -> List[List[Tuple[str, float]]]:
+        return [self.retrieve_scored(c) for c in transcript_chunks]
+
+    def retrieve_many(self, transcript_chunks: List[str]) -> List[List[str]]:
+        return [self.retrieve(c) for c in transcript_chunks]
+
+
+# Score fusion of the lexical and embedding retrievers: both score vectors
+# are min-max normalised per chunk and mixed with weight alpha on BM25.
+class HybridRetriever:
+    def __init__(self, lexical: LexicalRetriever, embed, top_k: int = 40, alpha: float = 0.5):
+        if not 0.0 <= alpha <= 1.0:
+            raise ValueError(f"alpha must be in [0, 1], got {alpha}")
+        self.lexical = lexical
+        self.embed = embed
+        self.top_k = top_k
+        self.alpha = alpha
+        self.schema_ids = lexical.schema_ids
+
+    def _minmax(self, x: np.ndarray) -> np.ndarray:
+        lo, hi = float(x.min()), float(x.max())
+        return (x - lo) / (hi - lo) if hi > lo else np.zeros_like(x)
+
+    def retrieve_scored_many(self, transcript_chunks: List[str]) -> List[List[Tuple[str, float]]]:
+        # one embedding round-trip for all chunks
+        out = []
+        for chunk, emb in zip(transcript_chunks, self.embed.scores_many(transcript_chunks)):
+            lex = self._minmax(self.lexical.scores(chunk))
+            fused = self.alpha * lex + (1.0 - self.alpha) * self._minmax(emb)
+
+            top_idx = np.argsort(-fused, kind="stable")[: self.top_k]
+            out.append([(self.schema_ids[i], float(fused[i])) for i in top_idx])
+        return out
+
+    def retrieve_scored(self, transcript_chunk: str) -> List[Tuple[str, float]]:
+        return self.retrieve_scored_many([transcript_chunk])[0]
+
+    def retrieve_many(self, transcript_chunks: List[str]) -> List[List[str]]:
+        return [[cid for cid, _ in scored] for scored in self.retrieve_scored_many(transcript_chunks)]
+
+    def retrieve(self, transcript_chunk: str) -> List[str]:
+        return [cid for cid, _ in self.retrieve_scored(transcript_chunk)]
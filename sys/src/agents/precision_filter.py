@@ -1,8 +1,27 @@
 # src/agents/precision_filter.py
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
-from src.lm_utils import generate_response, extract_json_from_response
+from src.agents.prefilter import RulePreFilter
+from src.lm_utils import generate_response, extract_json_from_response, stream_json_response
+from src.schema import SchemaConcept, build_concepts
+
+# Transcript-first layout (prefix_mode): instructions and transcript form a
+# prefix that is identical for every check of a record, single or batched,
+# so the server only evaluates the observation tail after the first call.
+PREFIX_HEADER = """You are validating extracted clinical observations for a benchmark evaluation.
+
+TASK:
+After the transcript you will be given one or more extracted observations.
+Decide, independently for each one, whether it should be KEPT or DROPPED.
+
+VERY IMPORTANT:
+- You must be STRICT.
+- Do NOT keep interpretations or abstractions.
+- Do NOT keep negatives unless explicitly negated.
+
+TRANSCRIPT:
+"""
 
 
 class PrecisionFilterAgent:
@@ -12,11 +31,28 @@ class PrecisionFilterAgent:
         schema_by_id: Dict[str, Dict[str, Any]],
         max_tokens: int = 450,
         temperature: float = 0.0,
+        batch_size: int = 1,
+        client=None,
+        concepts: Dict[str, SchemaConcept] = None,
+        prefix_mode: bool = False,
+        keep_alive: Optional[str] = None,
+        prefilter: RulePreFilter = None,
+        stream: bool = False,
     ):
         self.model = model
         self.schema_by_id = schema_by_id
         self.max_tokens = max_tokens
         self.temperature = temperature
+        self.batch_size = batch_size
+        self.client = client
+        self.concepts = concepts if concepts is not None else build_concepts(schema_by_id)
+        self.prefix_mode = prefix_mode
+        self.keep_alive = keep_alive
+        self.prefilter = prefilter
+        self.stream = stream
+
+        # (transcript, prefix) of the record being filtered
+        self._prefix = ("", "")
 
     def _safe_str(self, x: Any) -> str:
         try:
@@ -24,15 +60,68 @@ class PrecisionFilterAgent:
         except Exception:
             return ""
 
-    def decide_keep_drop(self, obs: Dict[str, Any], transcript: str) -> str:
+    def _obs_fields(self, obs: Dict[str, Any]):
         cid = self._safe_str(obs.get("id", "")).strip()
-        schema_item = self.schema_by_id.get(cid, {})
-        name = schema_item.get("name", obs.get("name", "")) or ""
-        vtype = schema_item.get("value_type", obs.get("value_type", "")) or ""
-        enum_list = schema_item.get("value_enum", []) or []
+        c = self.concepts.get(cid)
+        if c is not None:
+            name, vtype, enum_json = c.name, c.value_type, c.enum_json
+        else:
+            name = obs.get("name", "") or ""
+            vtype = obs.get("value_type", "") or ""
+            enum_json = "[]"
+        return cid, name, vtype, enum_json, obs.get("value", None), obs.get("evidence", "")
+
+    def _obs_block(self, obs: Dict[str, Any]) -> str:
+        cid, name, vtype, enum_json, value, evidence = self._obs_fields(obs)
+        return f"""id: {cid}
+name: {name}
+value_type: {vtype}
+value_enum: {enum_json}
+value: {json.dumps(value, ensure_ascii=False)}
+evidence: {json.dumps(evidence, ensure_ascii=False)}"""
+
+    def _transcript_prefix(self, transcript: str) -> str:
+        cached = self._prefix
+        if cached[0] == transcript:
+            return cached[1]
+        prefix = f"{PREFIX_HEADER}{transcript.strip()}\n\n"
+        self._prefix = (transcript, prefix)
+        return prefix
+
+    def _generate(self, prompt: str, max_tokens: int, stop_key: Optional[str] = None) -> str:
+        # streaming stops at the "decisions" list of a batch, or for a single
+        # decision at the first object holding "decision" (not at any JSON
+        # value: "[120]" quoted from the note is not the answer)
+        if self.stream:
+            return stream_json_response(
+                self.model,
+                prompt,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                client=self.client,
+                keep_alive=self.keep_alive,
+                stop_key=stop_key,
+                stop_on=None if stop_key else "decision",
+            )
+        return generate_response(
+            self.model,
+            prompt,
+            temperature=self.temperature,
+            max_tokens=max_tokens,
+            client=self.client,
+            keep_alive=self.keep_alive,
+        )
+
+    def decide_keep_drop(self, obs: Dict[str, Any], transcript: str) -> str:
+        if self.prefix_mode:
+            prompt = f"""{self._transcript_prefix(transcript)}OBSERVATION:
+{self._obs_block(obs)}
+
+OUTPUT (JSON ONLY):
+{{ "decision": "KEEP" or "DROP", "reason": "<short reason>" }}"""
+            return self._parse_decision(self._generate(prompt, self.max_tokens))
 
-        value = obs.get("value", None)
-        evidence = obs.get("evidence", "")
+        cid, name, vtype, enum_json, value, evidence = self._obs_fields(obs)
 
         prompt = f"""
 You are validating extracted clinical observations for a benchmark evaluation.
@@ -52,7 +141,7 @@ OBSERVATION:
 id: {cid}
 name: {name}
 value_type: {vtype}
-value_enum: {json.dumps(enum_list, ensure_ascii=False)}
+value_enum: {enum_json}
 value: {json.dumps(value, ensure_ascii=False)}
 evidence: {json.dumps(evidence, ensure_ascii=False)}
 
@@ -60,12 +149,9 @@ TRANSCRIPT:
 {transcript}
 """.strip()
 
-        raw = generate_response(
-            self.model,
-            prompt,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-        )
+        return self._parse_decision(self._generate(prompt, self.max_tokens))
+
+    def _parse_decision(self, raw: str) -> str:
         parsed = extract_json_from_response(raw)
 
         if isinstance(parsed, dict):
@@ -75,12 +161,89 @@ TRANSCRIPT:
 
         return "DROP"
 
+    def decide_keep_drop_batch(self, batch: List[Dict[str, Any]], transcript: str) -> Optional[List[str]]:
+        observations_block = "\n\n".join(f"[{i}]\n{self._obs_block(o)}" for i, o in enumerate(batch))
+
+        if self.prefix_mode:
+            prompt = f"""{self._transcript_prefix(transcript)}OBSERVATIONS:
+{observations_block}
+
+Return exactly one decision per observation, in the same order.
+
+OUTPUT (JSON ONLY):
+{{ "decisions": [ {{ "index": 0, "decision": "KEEP" or "DROP", "reason": "<short reason>" }}, ... ] }}"""
+        else:
+            prompt = f"""
+You are validating extracted clinical observations for a benchmark evaluation.
+
+TASK:
+Decide, independently for EACH numbered observation below, whether it should be KEPT or DROPPED.
+
+VERY IMPORTANT:
+- You must be STRICT.
+- Do NOT keep interpretations or abstractions.
+- Do NOT keep negatives unless explicitly negated.
+- Return exactly one decision per observation, in the same order.
+
+OUTPUT (JSON ONLY):
+{{ "decisions": [ {{ "index": 0, "decision": "KEEP" or "DROP", "reason": "<short reason>" }}, ... ] }}
+
+OBSERVATIONS:
+{observations_block}
+
+TRANSCRIPT:
+{transcript}
+""".strip()
+
+        raw = self._generate(prompt, max(self.max_tokens, 80 * len(batch)), stop_key="decisions")
+        parsed = extract_json_from_response(raw)
+
+        if isinstance(parsed, dict):
+            parsed = parsed.get("decisions")
+        if not isinstance(parsed, list) or len(parsed) != len(batch):
+            return None
+
+        decisions: List[Optional[str]] = [None] * len(batch)
+        for pos, item in enumerate(parsed):
+            idx = pos
+            if isinstance(item, dict):
+                if isinstance(item.get("index"), int):
+                    idx = item["index"]
+                item = item.get("decision", "")
+            decision = self._safe_str(item).strip().upper()
+            if decision not in {"KEEP", "DROP"} or not 0 <= idx < len(batch) or decisions[idx] is not None:
+                return None
+            decisions[idx] = decision
+
+        return decisions
+
     def filter_observations(self, observations: List[Dict[str, Any]], transcript: str) -> List[Dict[str, Any]]:
+        observations = [o for o in observations if isinstance(o, dict)]
+
+        # Confident rule decisions skip the LLM; the rest keep their order
+        if self.prefilter is not None:
+            decisions, ambiguous = self.prefilter.split(observations)
+            checked = self._llm_filter([observations[i] for i in ambiguous], transcript)
+            kept_ids = {id(o) for o in checked}
+            return [
+                o for o, d in zip(observations, decisions)
+                if d == "KEEP" or (d is None and id(o) in kept_ids)
+            ]
+
+        return self._llm_filter(observations, transcript)
+
+    def _llm_filter(self, observations: List[Dict[str, Any]], transcript: str) -> List[Dict[str, Any]]:
+        if self.batch_size <= 1:
+            return [o for o in observations if self.decide_keep_drop(o, transcript) == "KEEP"]
+
         kept = []
-        for o in observations:
-            if not isinstance(o, dict):
-                continue
-            decision = self.decide_keep_drop(o, transcript)
-            if decision == "KEEP":
-                kept.append(o)
+        for i in range(0, len(observations), self.batch_size):
+            batch = observations[i:i + self.batch_size]
+            decisions = self.decide_keep_drop_batch(batch, transcript) if len(batch) > 1 else None
+
+            # Unparseable or misaligned batch answer: judge each item on its own
+            if decisions is None:
+                decisions = [self.decide_keep_drop(o, transcript) for o in batch]
+
+            kept.extend(o for o, d in zip(batch, decisions) if d == "KEEP")
         return kept
\ No newline at end of file
@@ -0,0 +1,114 @@
+# src/agents/prefilter.py
+import math
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from src import instrument
+from src.evidence_index import normalize
+from src.schema import MULTI_SELECT, NUMERIC, SINGLE_SELECT, STRING, SchemaConcept
+
+# Enum values too generic to count as support just because they appear in
+# the evidence ("yes" shows up in half of all utterances)
+WEAK_VALUES = {"yes", "no", "none", "absent", "present", "normal", "abnormal", "other", "n/a"}
+
+NUMBER_WORDS_RE = re.compile(
+    r"\b(zero|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|"
+    r"fifteen|sixteen|seventeen|eighteen|nineteen|twenty|thirty|forty|fifty|sixty|seventy|eighty|"
+    r"ninety|hundred|thousand|half|dozen)\b"
+)
+DIGIT_RE = re.compile(r"\d")
+NUMBER_RE = re.compile(r"(?<![\d.])-?\d+(?:\.\d+)?")
+THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}\b)")
+
+
+# Rule-based confidence that an observation would be KEPT by the precision
+# filter. Scores near 1 are literal matches (a NUMERIC value printed in its
+# evidence, a specific enum value copied verbatim), scores near 0 are values
+# the evidence cannot support (a number from a sentence without numbers).
+# Only observations in between are sent to the LLM.
+class RulePreFilter:
+    def __init__(self, concepts: Dict[str, SchemaConcept], threshold: float = 0.9):
+        self.concepts = concepts
+        self.threshold = threshold
+
+    def _numeric_value(self, value: Any) -> Optional[float]:
+        if isinstance(value, bool):
+            return None
+        if isinstance(value, str):
+            try:
+                value = float(value)
+            except ValueError:
+                return None
+        if isinstance(value, (int, float)) and math.isfinite(value):
+            return float(value)
+        return None
+
+    def _contains_number(self, evidence: str, value: float) -> bool:
+        # compared as numbers, so 37, "37" and 37.0 all match "37.0 C"
+        ev = THOUSANDS_RE.sub("", evidence)
+        return any(math.isclose(float(m), value) for m in NUMBER_RE.findall(ev))
+
+    def _contains_phrase(self, ev_norm: str, value: Any) -> Optional[bool]:
+        # None: value too generic / not a string to judge
+        if not isinstance(value, str):
+            return None
+        v = normalize(value)
+        if len(v) < 3 or v in WEAK_VALUES:
+            return None
+        return re.search(rf"(?<!\w){re.escape(v)}(?!\w)", ev_norm) is not None
+
+    def score(self, obs: Dict[str, Any]) -> float:
+        c = self.concepts.get(str(obs.get("id", "")).strip())
+        evidence = obs.get("evidence", "")
+        if c is None or not isinstance(evidence, str) or not evidence.strip():
+            return 0.5
+
+        value = obs.get("value")
+        code = c.type_code
+
+        if code == NUMERIC:
+            number = self._numeric_value(value)
+            if number is None:
+                return 0.5
+            if self._contains_number(evidence, number):
+                return 0.95
+            if NUMBER_WORDS_RE.search(evidence.lower()):
+                return 0.5
+            if DIGIT_RE.search(evidence):
+                return 0.05
+            return 0.02
+
+        ev_norm = normalize(evidence)
+
+        if code in (SINGLE_SELECT, MULTI_SELECT):
+            values = value if isinstance(value, list) else [value]
+            hits = [self._contains_phrase(ev_norm, v) for v in values]
+            if hits and all(h is True for h in hits):
+                return 0.95
+            return 0.5
+
+        if code == STRING:
+            return 0.8 if self._contains_phrase(ev_norm, value) else 0.5
+
+        return 0.5
+
+    def decide(self, obs: Dict[str, Any]) -> Optional[str]:
+        s = self.score(obs)
+        if s >= self.threshold:
+            return "KEEP"
+        if s <= 1.0 - self.threshold:
+            return "DROP"
+        return None
+
+    def split(self, observations: List[Dict[str, Any]]) -> Tuple[List[Optional[str]], List[int]]:
+        # Per-observation decision (None = ask the LLM) and the positions of
+        # the ambiguous ones
+        decisions = [self.decide(o) for o in observations]
+        ambiguous = [i for i, d in enumerate(decisions) if d is None]
+
+        kept = sum(1 for d in decisions if d == "KEEP")
+        dropped = sum(1 for d in decisions if d == "DROP")
+        instrument.count("prefilter_keep", kept)
+        instrument.count("prefilter_drop", dropped)
+        instrument.count("prefilter_to_llm", len(ambiguous))
+        return decisions, ambiguous
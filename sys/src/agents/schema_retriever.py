@@ -1,7 +1,12 @@
 # src/agents/schema_retriever.py
 import numpy as np
-from typing import Dict, List, Any
 import ollama
+from typing import Dict, List, Any, Optional, Tuple
+
+from src import instrument
+from src.embedding_index import EmbeddingIndex
+from src.schema import SchemaConcept, build_concepts
+from src.llm_client import get_client
 
 
 class SchemaRetriever:
@@ -10,46 +15,105 @@ class SchemaRetriever:
         schema_by_id: Dict[str, Dict[str, Any]],
         embed_model: str = "nomic-embed-text",
         top_k: int = 40,
+        index_dir: Optional[str] = None,
+        concepts: Dict[str, SchemaConcept] = None,
+        embed_batch_size: int = 64,
+        client=None,
     ):
         self.schema_by_id = schema_by_id
+        self.concepts = concepts if concepts is not None else build_concepts(schema_by_id)
         self.embed_model = embed_model
         self.top_k = top_k
+        self.embed_batch_size = max(1, embed_batch_size)
+        self._batch_api = True
+        # None -> the shared client; an LLMPool spreads embedding batches
+        self.client = client
 
         # Build schema texts
         self.schema_ids: List[str] = []
         self.schema_texts: List[str] = []
 
-        for cid, s in schema_by_id.items():
-            text = f"{s.get('name','')} {s.get('value_type','')} {' '.join(s.get('value_enum', []))}"
+        for cid, c in self.concepts.items():
             self.schema_ids.append(cid)
-            self.schema_texts.append(text)
+            self.schema_texts.append(c.retrieval_text)
+
+        # Schema embeddings are loaded (or built) on first retrieve and
+        # persisted under index_dir so later runs skip the embedding pass
+        self.index = EmbeddingIndex(embed_model, self._embed_texts, index_dir=index_dir)
+        self._schema_embeddings: Optional[np.ndarray] = None
+        self._schema_unit: Optional[np.ndarray] = None
+
+    @property
+    def schema_embeddings(self) -> np.ndarray:
+        if self._schema_embeddings is None:
+            self._schema_embeddings = self.index.get(self.schema_texts)
+        return self._schema_embeddings
 
-        # Precompute embeddings once
-        self.schema_embeddings = self._embed_texts(self.schema_texts)
+    @property
+    def schema_unit(self) -> np.ndarray:
+        # Row-normalized schema matrix, so cosine similarity is one matmul
+        if self._schema_unit is None:
+            self._schema_unit = self._normalize(np.asarray(self.schema_embeddings, dtype=np.float32))
+        return self._schema_unit
+
+    def _normalize(self, m: np.ndarray) -> np.ndarray:
+        return m / np.maximum(np.linalg.norm(m, axis=-1, keepdims=True), 1e-12)
 
     def _embed_texts(self, texts: List[str]) -> np.ndarray:
+        # /api/embed takes a list input: one request per embed_batch_size
+        # texts. Servers without it (404) fall back to /api/embeddings.
         embeddings = []
-        for t in texts:
-            res = ollama.embeddings(
-                model=self.embed_model,
-                prompt=t,
-            )
-            embeddings.append(res["embedding"])
-        return np.array(embeddings)
-
-    def _cosine_sim(self, a: np.ndarray, b: np.ndarray) -> np.ndarray:
-        a = a / np.linalg.norm(a)
-        b = b / np.linalg.norm(b, axis=1, keepdims=True)
-        return np.dot(b, a)
+        for i in range(0, len(texts), self.embed_batch_size):
+            batch = texts[i:i + self.embed_batch_size]
+            if self._batch_api:
+                try:
+                    res = (self.client or get_client()).embed(model=self.embed_model, input=batch)
+                    embeddings.extend(res["embeddings"])
+                    instrument.count("embed_calls")
+                    continue
+                except ollama.ResponseError as e:
+                    if e.status_code != 404:
+                        raise
+                    self._batch_api = False
 
-    def retrieve(self, transcript_chunk: str) -> List[str]:
-        res = ollama.embeddings(
-            model=self.embed_model,
-            prompt=transcript_chunk,
-        )
-        chunk_emb = np.array(res["embedding"])
+            for t in batch:
+                res = (self.client or get_client()).embeddings(
+                    model=self.embed_model,
+                    prompt=t,
+                )
+                embeddings.append(res["embedding"])
+            instrument.count("embed_calls", len(batch))
+        instrument.count("embed_texts", len(texts))
+        return np.array(embeddings, dtype=np.float32)
+
+    def _top_k(self, sims: np.ndarray) -> np.ndarray:
+        k = min(self.top_k, sims.shape[-1])
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        idx = np.argpartition(-sims, k - 1)[:k] if k < sims.shape[-1] else np.arange(sims.shape[-1])
+        return idx[np.argsort(-sims[idx], kind="stable")]
 
-        sims = self._cosine_sim(chunk_emb, self.schema_embeddings)
-        top_idx = np.argsort(sims)[::-1][: self.top_k]
+    def scores_many(self, transcript_chunks: List[str]) -> np.ndarray:
+        # (n_chunks, n_schema) cosine similarities from one embedding request
+        if not transcript_chunks:
+            return np.zeros((0, len(self.schema_ids)), dtype=np.float32)
+        chunk_unit = self._normalize(self._embed_texts(transcript_chunks))
+        return chunk_unit @ self.schema_unit.T
 
-        return [self.schema_ids[i] for i in top_idx]
+    def scores(self, transcript_chunk: str) -> np.ndarray:
+        return self.scores_many([transcript_chunk])[0]
+
+    def retrieve_scored_many(self, transcript_chunks: List[str]) -> List[List[Tuple[str, float]]]:
+        out = []
+        for sims in self.scores_many(transcript_chunks):
+            out.append([(self.schema_ids[i], float(sims[i])) for i in self._top_k(sims)])
+        return out
+
+    def retrieve_scored(self, transcript_chunk: str) -> List[Tuple[str, float]]:
+        return self.retrieve_scored_many([transcript_chunk])[0]
+
+    def retrieve_many(self, transcript_chunks: List[str]) -> List[List[str]]:
+        return [[cid for cid, _ in scored] for scored in self.retrieve_scored_many(transcript_chunks)]
+
+    def retrieve(self, transcript_chunk: str) -> List[str]:
+        return [cid for cid, _ in self.retrieve_scored(transcript_chunk)]
@@ -1,11 +1,43 @@
 # src/agents/validate.py
+import json
 import re
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from src.evidence_index import EvidenceIndex
+from src.schema import (
+    MULTI_SELECT,
+    NUMERIC,
+    SINGLE_SELECT,
+    STRING,
+    SchemaConcept,
+    build_concepts,
+    norm_text,
+)
+
+# Concepts whose evidence (or transcript) must mention one of these cues;
+# also seeds the lexical retriever's anchor table
+ID_ANCHOR_REQUIRED = {
+    "71":  [r"\bvomit", r"\bemesis\b"],
+    "116": [r"\bwork of breathing\b", r"\bwob\b"],
+    "110": [r"\bgcs\b", r"\bglasgow\b"],
+    "96":  [r"\bfollow(s)? commands?\b"],
+    "0":   [r"\bbroset\b"],
+    "167": [r"\bpain\b"],
+}
 
 
 class ValidatorAgent:
-    def __init__(self, schema: Dict[str, Dict[str, Any]]):
+    def __init__(
+        self,
+        schema: Dict[str, Dict[str, Any]],
+        fuzzy_evidence: bool = False,
+        emit_spans: bool = False,
+        concepts: Dict[str, SchemaConcept] = None,
+    ):
         self.schema = schema
+        self.concepts = concepts if concepts is not None else build_concepts(schema)
+        self.fuzzy_evidence = fuzzy_evidence
+        self.emit_spans = emit_spans
 
         self.bad_evidence_patterns = [
             r"\bno mention\b",
@@ -33,172 +65,264 @@ class ValidatorAgent:
             r"\bnone\b",
         ]
 
-        self.id_anchor_required = {
-            "71":  [r"\bvomit", r"\bemesis\b"],
-            "116": [r"\bwork of breathing\b", r"\bwob\b"],
-            "110": [r"\bgcs\b", r"\bglasgow\b"],
-            "96":  [r"\bfollow(s)? commands?\b"],
-            "0":   [r"\bbroset\b"],
-            "167": [r"\bpain\b"],
-        }
+        self.id_anchor_required = {cid: list(p) for cid, p in ID_ANCHOR_REQUIRED.items()}
 
         self.patient_id_regex = re.compile(r"\b\d{1,3}-year-old\b", re.IGNORECASE)
         self.hard_deny_if_no_anchor = {"0", "110", "96", "116", "167"}
 
+        # Each pattern family is compiled once into a single alternation
+        self.bad_evidence_re = self._compile_family(self.bad_evidence_patterns)
+        self.hedge_re = self._compile_family(self.hedge_patterns)
+        self.negation_re = self._compile_family(self.negation_cues)
+        self.placeholder_value_re = self._compile_family([r"not explicitly stated", r"not mentioned", r"no mention"])
+        self.id_anchor_re = {cid: self._compile_family(p) for cid, p in self.id_anchor_required.items()}
+
+    def _compile_family(self, patterns: List[str]) -> Pattern[str]:
+        return re.compile("|".join(f"(?:{p})" for p in patterns))
+
     def _norm(self, x):
-        return " ".join(str(x).strip().lower().split())
+        return norm_text(x)
+
+    def _has_any_pattern(self, text: str, regex: Pattern[str]) -> bool:
+        return regex.search(text.lower()) is not None
 
-    def _has_any_pattern(self, text: str, patterns: List[str]) -> bool:
-        t = text.lower()
-        return any(re.search(p, t) for p in patterns)
+    def _scan_transcript(self, transcript: str) -> "_TranscriptScan":
+        return _TranscriptScan(self, transcript)
 
-    def _evidence_in_transcript(self, evidence: str, transcript: str) -> bool:
-        return evidence.strip() in transcript
+    def _ground_evidence(self, evidence: str, index: EvidenceIndex) -> Optional[Tuple[int, int]]:
+        # Character span of the evidence in the transcript. With fuzzy_evidence,
+        # evidence that differs only in case/whitespace/quote style still
+        # grounds, and is replaced by the verbatim transcript text.
+        if self.fuzzy_evidence:
+            return index.find(evidence)
+        return index.find_exact(evidence)
+
+    def _with_span(self, span: Tuple[int, int], obs: Dict[str, Any]) -> Dict[str, Any]:
+        if self.emit_spans:
+            obs["span"] = [span[0], span[1]]
+        return obs
 
     def _allow_negative_value(self, value: Any, evidence: str) -> bool:
         if not isinstance(value, str):
             return True
         v = self._norm(value)
         if v in {"no", "none", "absent"}:
-            return self._has_any_pattern(evidence, self.negation_cues)
+            return self._has_any_pattern(evidence, self.negation_re)
         return True
 
-    def _passes_id_anchor(self, cid: str, evidence: str, transcript: str) -> bool:
+    def _passes_id_anchor(self, cid: str, evidence: str, transcript: str, scan: "_TranscriptScan" = None) -> bool:
         cid = str(cid)
+        if scan is None:
+            scan = self._scan_transcript(transcript)
+
         if cid == "162":
             if not isinstance(evidence, str) or not evidence.strip():
                 return False
-            if not self.patient_id_regex.search(transcript):
+            if not scan.patient_id:
                 return False
             if isinstance(evidence, str) and not self.patient_id_regex.search(evidence):
                 return False
             return True
 
-        patterns = self.id_anchor_required.get(cid)
-        if not patterns:
+        rx = self.id_anchor_re.get(cid)
+        if rx is None:
             return True
 
-        ev = evidence.lower()
-        if any(re.search(p, ev) for p in patterns):
+        if rx.search(evidence.lower()):
             return True
 
-        tr = transcript.lower()
-        return any(re.search(p, tr) for p in patterns)
+        return scan.has_anchor(cid)
+
+    def session(self, transcript: str) -> "ValidationSession":
+        return ValidationSession(self, transcript)
 
-    def run(self, observations: Any, transcript: str) -> List[Dict[str, Any]]:
+    def run(self, observations: Any, transcript: str, session: "ValidationSession" = None) -> List[Dict[str, Any]]:
         valid = []
         if not isinstance(observations, list):
             return valid
 
-        transcript = transcript or ""
+        if session is None:
+            session = self.session(transcript)
 
         for o in observations:
-            if not isinstance(o, dict):
-                continue
+            v = session.check(o)
+            if v is not None:
+                valid.append(v)
 
-            cid = o.get("id")
-            if cid is None:
-                continue
-            cid = str(cid).strip()
+        return valid
 
-            s = self.schema.get(cid)
-            if not s:
-                continue
+    def _check(self, o: Any, transcript: str, scan: "_TranscriptScan", index: EvidenceIndex) -> Optional[Dict[str, Any]]:
+        if not isinstance(o, dict):
+            return None
 
-            name = s.get("name", "")
-            vtype = s["value_type"]
+        cid = o.get("id")
+        if cid is None:
+            return None
+        cid = str(cid).strip()
 
-            val = o.get("value")
-            evidence = o.get("evidence", "")
-            if not isinstance(evidence, str) or not evidence.strip():
-                continue
+        c = self.concepts.get(cid)
+        if c is None:
+            return None
 
-            if not self._evidence_in_transcript(evidence, transcript):
-                continue
+        name = c.name
+        vtype = c.value_type
+        code = c.type_code
 
-            if self._has_any_pattern(evidence, self.bad_evidence_patterns):
-                continue
+        val = o.get("value")
+        evidence = o.get("evidence", "")
+        if not isinstance(evidence, str) or not evidence.strip():
+            return None
 
-            if self._has_any_pattern(evidence, self.hedge_patterns):
-                continue
+        span = self._ground_evidence(evidence, index)
+        if span is None:
+            return None
+        evidence = transcript[span[0]:span[1]]
 
-            if not self._allow_negative_value(val, evidence):
-                continue
+        ev_lower = evidence.lower()
+        if self.bad_evidence_re.search(ev_lower):
+            return None
 
-            if not self._passes_id_anchor(cid, evidence, transcript):
-                continue
+        if self.hedge_re.search(ev_lower):
+            return None
 
-            if isinstance(val, str) and self._has_any_pattern(val, [r"not explicitly stated", r"not mentioned", r"no mention"]):
-                continue
+        if not self._allow_negative_value(val, evidence):
+            return None
 
-            if vtype == "STRING":
-                if isinstance(val, str) and val.strip():
-                    valid.append({
-                        "id": cid,
-                        "name": name,
-                        "value_type": vtype,
-                        "value": val.strip(),
-                        "evidence": evidence
-                    })
-                continue
-
-            if vtype == "NUMERIC":
-                if isinstance(val, (int, float)) and not isinstance(val, bool):
-                    num = val
-                elif isinstance(val, str):
-                    try:
-                        num = float(val) if "." in val else int(val)
-                    except:
-                        continue
-                else:
-                    continue
-
-                valid.append({
+        if not self._passes_id_anchor(cid, evidence, transcript, scan):
+            return None
+
+        if isinstance(val, str) and self._has_any_pattern(val, self.placeholder_value_re):
+            return None
+
+        if code == STRING:
+            if isinstance(val, str) and val.strip():
+                return self._with_span(span, {
                     "id": cid,
                     "name": name,
                     "value_type": vtype,
-                    "value": num,
+                    "value": val.strip(),
                     "evidence": evidence
                 })
-                continue
-
-            if vtype in ["SINGLE_SELECT", "MULTI_SELECT"]:
-                enum = s.get("value_enum", [])
-                enum_norm = {self._norm(e): e for e in enum}
+            return None
+
+        if code == NUMERIC:
+            if isinstance(val, (int, float)) and not isinstance(val, bool):
+                num = val
+            elif isinstance(val, str):
+                try:
+                    num = float(val) if "." in val else int(val)
+                except:
+                    return None
+            else:
+                return None
+
+            return self._with_span(span, {
+                "id": cid,
+                "name": name,
+                "value_type": vtype,
+                "value": num,
+                "evidence": evidence
+            })
+
+        if code in (SINGLE_SELECT, MULTI_SELECT):
+            enum_norm = c.enum_norm
+
+            if code == MULTI_SELECT:
+                if isinstance(val, str):
+                    val = [val]
+                if not isinstance(val, list):
+                    return None
 
-                if vtype == "MULTI_SELECT":
-                    if isinstance(val, str):
-                        val = [val]
-                    if not isinstance(val, list):
-                        continue
+                clean = []
+                for v in val:
+                    k = self._norm(v)
+                    if k in enum_norm:
+                        clean.append(enum_norm[k])
 
-                    clean = []
-                    for v in val:
-                        k = self._norm(v)
-                        if k in enum_norm:
-                            clean.append(enum_norm[k])
+                if not clean:
+                    return None
 
-                    if not clean:
-                        continue
+                return self._with_span(span, {
+                    "id": cid,
+                    "name": name,
+                    "value_type": vtype,
+                    "value": clean,
+                    "evidence": evidence
+                })
 
-                    valid.append({
+            if isinstance(val, str):
+                k = self._norm(val)
+                if k in enum_norm:
+                    return self._with_span(span, {
                         "id": cid,
                         "name": name,
                         "value_type": vtype,
-                        "value": clean,
+                        "value": enum_norm[k],
                         "evidence": evidence
                     })
-                    continue
 
-                if isinstance(val, str):
-                    k = self._norm(val)
-                    if k in enum_norm:
-                        valid.append({
-                            "id": cid,
-                            "name": name,
-                            "value_type": vtype,
-                            "value": enum_norm[k],
-                            "evidence": evidence
-                        })
-
-        return valid
\ No newline at end of file
+        return None
+
+
+# Per-record transcript facts for the anchor checks. Each one is computed on
+# first use (most records never need them) and then shared by every
+# observation of the record, so the transcript is lower-cased once and each
+# anchor family searched at most once per record.
+class _TranscriptScan:
+    def __init__(self, agent: ValidatorAgent, transcript: str):
+        self._agent = agent
+        self._transcript = transcript
+        self._lower = None
+        self._anchor_hits: Dict[str, bool] = {}
+        self._patient_id = None
+
+    def has_anchor(self, cid: str) -> bool:
+        hit = self._anchor_hits.get(cid)
+        if hit is None:
+            if self._lower is None:
+                self._lower = self._transcript.lower()
+            hit = self._agent.id_anchor_re[cid].search(self._lower) is not None
+            self._anchor_hits[cid] = hit
+        return hit
+
+    @property
+    def patient_id(self) -> bool:
+        if self._patient_id is None:
+            self._patient_id = self._agent.patient_id_regex.search(self._transcript) is not None
+        return self._patient_id
+
+
+# Per-record validation state (transcript scan and evidence index) shared by
+# all of the record's observations. When extraction streams, observations
+# are checked one by one as they are parsed (prefetch, from any extraction
+# thread) and run() later reuses those results, so the validated record is
+# exactly what a single pass over the final observation list would give.
+# Checks run concurrently: the scan only memoizes idempotent facts and the
+# evidence index locks just its one-time build.
+class ValidationSession:
+    def __init__(self, agent: ValidatorAgent, transcript: str):
+        self.agent = agent
+        self.transcript = transcript or ""
+        self.scan = agent._scan_transcript(self.transcript)
+        self.index = EvidenceIndex(self.transcript)
+        self._results: Dict[str, Optional[Dict[str, Any]]] = {}
+
+    def _key(self, o: Any) -> str:
+        return json.dumps(o, sort_keys=True, default=str)
+
+    def _check(self, o: Any) -> Optional[Dict[str, Any]]:
+        return self.agent._check(o, self.transcript, self.scan, self.index)
+
+    def prefetch(self, o: Any):
+        k = self._key(o)
+        if k in self._results:
+            return
+        self._results[k] = self._check(o)
+
+    def check(self, o: Any) -> Optional[Dict[str, Any]]:
+        if self._results:
+            k = self._key(o)
+            if k in self._results:
+                v = self._results[k]
+                return dict(v) if v is not None else None
+        return self._check(o)
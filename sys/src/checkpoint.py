@@ -0,0 +1,91 @@
+# src/checkpoint.py
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+
+# IDs already written to out_path. A torn final line (crash mid-write) is cut off.
+def read_done_ids(out_path: Path) -> Set[str]:
+    done: Set[str] = set()
+    if not out_path.exists():
+        return done
+
+    good_bytes = 0
+    with out_path.open("rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if isinstance(rec, dict) and rec.get("id") is not None:
+                done.add(str(rec["id"]))
+            good_bytes += len(line)
+
+    if good_bytes < out_path.stat().st_size:
+        with out_path.open("r+b") as f:
+            f.truncate(good_bytes)
+
+    return done
+
+
+# Append-only, fsync'd log of per-record partial results (one line per
+# finished extraction call). After a crash the interrupted record replays
+# its finished calls from here instead of asking the LLM again.
+class ProgressJournal:
+    def __init__(self, path: Path, resume: bool = False):
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+        if resume and self.path.exists():
+            self._load()
+        elif self.path.exists():
+            self.path.unlink()
+
+        self._f = self.path.open("a", encoding="utf-8")
+
+    @staticmethod
+    def task_key(model: str, chunk: str, concept_ids: List[str]) -> str:
+        payload = json.dumps([model, chunk, list(concept_ids)], ensure_ascii=False)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    e = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn last write
+                    continue
+                self._entries.setdefault(str(e["rid"]), {})[e["key"]] = e["result"]
+
+    def get(self, rid: Any, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._entries.get(str(rid), {}).get(key)
+
+    def record(self, rid: Any, key: str, result: Any):
+        line = json.dumps({"rid": str(rid), "key": key, "result": result}, ensure_ascii=False)
+        with self._lock:
+            self._entries.setdefault(str(rid), {})[key] = result
+            self._f.write(line + "\n")
+            self._f.flush()
+        # outside the lock: other workers keep appending while this one waits
+        # on the disk (an fsync covers every write flushed before it)
+        os.fsync(self._f.fileno())
+
+    def forget(self, rid: Any):
+        # The record is in the output file now; its partial results are no
+        # longer needed in memory (the on-disk log is dropped on clean exit)
+        with self._lock:
+            self._entries.pop(str(rid), None)
+
+    def close(self, remove: bool = False):
+        with self._lock:
+            self._f.close()
+            if remove and self.path.exists():
+                self.path.unlink()
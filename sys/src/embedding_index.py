@@ -0,0 +1,106 @@
+# src/embedding_index.py
+import hashlib
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+
+def embedding_key(embed_model: str, text: str) -> str:
+    return hashlib.sha1(f"{embed_model}\n{text}".encode("utf-8")).hexdigest()
+
+
+# Persistent text -> embedding store: one .npz holding the matrix and its row
+# keys, replaced in a single rename so processes sharing index_dir never see
+# vectors paired with another writer's keys. Keys hash (embed_model, text),
+# so editing a schema entry only re-embeds that entry; a save after a build
+# keeps only the rows that build asked for.
+class EmbeddingIndex:
+    def __init__(
+        self,
+        embed_model: str,
+        embed_fn: Callable[[List[str]], np.ndarray],
+        index_dir: Optional[str] = None,
+    ):
+        self.embed_model = embed_model
+        self.embed_fn = embed_fn
+        self.index_dir = Path(index_dir) if index_dir else None
+
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._matrix: Optional[np.ndarray] = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _path(self) -> Path:
+        stem = hashlib.sha1(self.embed_model.encode("utf-8")).hexdigest()[:12]
+        return self.index_dir / f"{stem}.npz"
+
+    def _load(self):
+        self._loaded = True
+        if self.index_dir is None:
+            return
+
+        path = self._path()
+        if not path.exists():
+            return
+
+        try:
+            with np.load(path) as data:
+                keys = [str(k) for k in data["keys"]]
+                matrix = data["vectors"]
+        except Exception:
+            return
+
+        if matrix.ndim != 2 or len(keys) != matrix.shape[0]:
+            return
+
+        self._keys = keys
+        self._rows = {k: i for i, k in enumerate(self._keys)}
+        self._matrix = matrix
+
+    def _save(self):
+        if self.index_dir is None:
+            return
+
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        path = self._path()
+
+        # per-process temp name: shard processes may share index_dir
+        tmp = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, keys=np.array(self._keys), vectors=self._matrix)
+        os.replace(tmp, path)
+
+    def get(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            if not self._loaded:
+                self._load()
+
+            keys = [embedding_key(self.embed_model, t) for t in texts]
+
+            missing, seen = [], set()
+            for k, t in zip(keys, texts):
+                if k not in self._rows and k not in seen:
+                    missing.append((k, t))
+                    seen.add(k)
+
+            if missing:
+                # the saved index holds exactly the texts of this build: rows
+                # of entries since removed from (or edited in) the schema are
+                # dropped rather than carried forever
+                new_vecs = np.asarray(self.embed_fn([t for _, t in missing]), dtype=np.float32)
+                kept = [k for k in dict.fromkeys(keys) if k in self._rows]
+                parts = [new_vecs]
+                if kept:
+                    parts.insert(0, self._matrix[[self._rows[k] for k in kept]])
+                self._matrix = np.vstack(parts) if len(parts) > 1 else new_vecs
+                self._keys = kept + [k for k, _ in missing]
+                self._rows = {k: i for i, k in enumerate(self._keys)}
+                self._save()
+
+            if not keys:
+                return np.zeros((0, 0), dtype=np.float32)
+
+            return np.asarray(self._matrix[[self._rows[k] for k in keys]])
@@ -0,0 +1,224 @@
+# src/instrument.py
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Record and stage the current thread/task is working on. Pool tasks inherit
+# these via contextvars.copy_context() (see run.run_ordered).
+_current_record = contextvars.ContextVar("instrument_record", default=None)
+_current_stage = contextvars.ContextVar("instrument_stage", default=None)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    vals = sorted(values)
+    k = (len(vals) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(vals) - 1)
+    return vals[lo] + (vals[hi] - vals[lo]) * (k - lo)
+
+
+def _new_bucket() -> Dict[str, Any]:
+    return {"calls": 0, "seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+
+
+class Instrumentation:
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+
+        self.stage_times: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.llm: Dict[str, Dict[str, Any]] = {}
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self.events: List[Dict[str, Any]] = []
+
+    # ---------- per-record ----------
+
+    def _rec(self, rid: str) -> Dict[str, Any]:
+        r = self.records.get(rid)
+        if r is None:
+            r = {"id": rid, "start": None, "end": None, "stages": {}, "counters": {}, "llm": _new_bucket()}
+            self.records[rid] = r
+        return r
+
+    @contextmanager
+    def record(self, rid: Any):
+        rid = str(rid)
+        token = _current_record.set(rid)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            _current_record.reset(token)
+            with self._lock:
+                r = self._rec(rid)
+                r["start"] = t0 if r["start"] is None else min(r["start"], t0)
+                r["end"] = t1 if r["end"] is None else max(r["end"], t1)
+
+    # ---------- stages / counters ----------
+
+    @contextmanager
+    def stage(self, name: str):
+        token = _current_stage.set(name)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            t1 = time.perf_counter()
+            _current_stage.reset(token)
+            rid = _current_record.get()
+            with self._lock:
+                self.stage_times.setdefault(name, []).append(t1 - t0)
+                if rid is not None:
+                    st = self._rec(rid)["stages"]
+                    st[name] = st.get(name, 0.0) + (t1 - t0)
+                if self.trace:
+                    self._event(name, t0, t1, rid)
+
+    def count(self, name: str, n: int = 1):
+        rid = _current_record.get()
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            if rid is not None:
+                c = self._rec(rid)["counters"]
+                c[name] = c.get(name, 0) + n
+
+    def llm_call(self, model: str, seconds: float, prompt_tokens: int = 0, completion_tokens: int = 0):
+        stage = _current_stage.get() or "other"
+        rid = _current_record.get()
+        t1 = time.perf_counter()
+        with self._lock:
+            for b in [self.llm.setdefault(stage, _new_bucket())] + ([self._rec(rid)["llm"]] if rid is not None else []):
+                b["calls"] += 1
+                b["seconds"] += seconds
+                b["prompt_tokens"] += prompt_tokens or 0
+                b["completion_tokens"] += completion_tokens or 0
+            if self.trace:
+                self._event(f"llm:{model}", t1 - seconds, t1, rid, cat="llm",
+                            args={"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens})
+
+    def _event(self, name, t0, t1, rid, cat="stage", args=None):
+        a = {"record": rid}
+        if args:
+            a.update(args)
+        self.events.append({
+            "name": name,
+            "cat": cat,
+            "ph": "X",
+            "ts": round((t0 - self._t0) * 1e6, 1),
+            "dur": round((t1 - t0) * 1e6, 1),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": a,
+        })
+
+    # ---------- output ----------
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            wall = time.perf_counter() - self._t0
+            rec_times = [r["end"] - r["start"] for r in self.records.values() if r["start"] is not None]
+
+            stages = {
+                name: {
+                    "count": len(ts),
+                    "total_s": round(sum(ts), 4),
+                    "mean_s": round(sum(ts) / len(ts), 4),
+                    "p50_s": round(percentile(ts, 0.5), 4),
+                    "p95_s": round(percentile(ts, 0.95), 4),
+                }
+                for name, ts in self.stage_times.items() if ts
+            }
+
+            records = []
+            for r in self.records.values():
+                records.append({
+                    "id": r["id"],
+                    "latency_s": round(r["end"] - r["start"], 4) if r["start"] is not None else None,
+                    "stages_s": {k: round(v, 4) for k, v in r["stages"].items()},
+                    "counters": dict(r["counters"]),
+                    "llm": {k: round(v, 4) if isinstance(v, float) else v for k, v in r["llm"].items()},
+                })
+
+            llm_total = _new_bucket()
+            for b in self.llm.values():
+                for k in llm_total:
+                    llm_total[k] += b[k]
+
+            return {
+                "run": {
+                    "wall_s": round(wall, 3),
+                    "records": len(rec_times),
+                    "records_per_s": round(len(rec_times) / wall, 4) if wall else 0.0,
+                    "record_latency_p50_s": round(percentile(rec_times, 0.5), 4),
+                    "record_latency_p95_s": round(percentile(rec_times, 0.95), 4),
+                    "llm_calls_per_record": round(llm_total["calls"] / len(rec_times), 3) if rec_times else 0.0,
+                    "stages": stages,
+                    "counters": dict(self.counters),
+                    "llm_by_stage": {k: dict(v, seconds=round(v["seconds"], 4)) for k, v in self.llm.items()},
+                    "llm_total": dict(llm_total, seconds=round(llm_total["seconds"], 4)),
+                },
+                "records": records,
+            }
+
+    def write(self, path: Path, extra: Optional[Dict[str, Any]] = None):
+        data = self.summary()
+        if extra:
+            data.update(extra)
+        with Path(path).open("w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        return data
+
+    def write_trace(self, path: Path):
+        with self._lock:
+            events = list(self.events)
+        with Path(path).open("w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+# ================= GLOBAL HOOKS =================
+
+_instr: Optional[Instrumentation] = None
+
+
+def set_instrumentation(instr: Optional[Instrumentation]):
+    global _instr
+    _instr = instr
+
+
+def get_instrumentation() -> Optional[Instrumentation]:
+    return _instr
+
+
+def stage(name: str):
+    return _instr.stage(name) if _instr is not None else nullcontext()
+
+
+def record(rid: Any):
+    return _instr.record(rid) if _instr is not None else nullcontext()
+
+
+def count(name: str, n: int = 1):
+    if _instr is not None:
+        _instr.count(name, n)
+
+
+def llm_call(model: str, seconds: float, response: Any = None):
+    if _instr is None:
+        return
+    prompt_tokens = completion_tokens = 0
+    if response is not None:
+        try:
+            prompt_tokens = response.get("prompt_eval_count") or 0
+            completion_tokens = response.get("eval_count") or 0
+        except AttributeError:
+            pass
+    _instr.llm_call(model, seconds, prompt_tokens, completion_tokens)
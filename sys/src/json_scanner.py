@@ -0,0 +1,366 @@
+# src/json_scanner.py
+import json
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Next character that matters in each scanner state
+_OPEN_RE = re.compile(r"[{\[]")
+_STRUCT_RE = re.compile(r'"(?:[^"\\]|\\[\s\S])*"|["{}\[\]]')
+_STRING_RE = re.compile(r'["\\]')
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+# What can follow an opener in valid JSON: a key or "}" after "{", a value or
+# "]" after "["; anything else ("{ thinking...") is not worth a decode attempt
+_VALUE_START_RE = {
+    "{": re.compile(r'\{\s*(?:"|\}|$)'),
+    "[": re.compile(r'\[\s*(?:[-\d"{\[\]tfn]|$)'),
+}
+_CLOSERS = {"{": "}", "[": "]"}
+# Openers left unclosed at end of text that result() will skip past
+MAX_RESTARTS = 16
+# C-decoder work wasted on values that fail to decode, as a multiple of the
+# text length, before the scanner stops trying (keeps malformed text linear)
+DECODE_WASTE_FACTOR = 4
+
+_MISSING = object()
+_DECODER = json.JSONDecoder()
+
+
+def loads_lenient(text: str) -> Any:
+    # json.loads, retried once with trailing commas removed; _MISSING on failure
+    # (including nesting too deep for the decoder, e.g. a "[[[[" loop)
+    try:
+        return json.loads(text)
+    except RecursionError:
+        return _MISSING
+    except ValueError:
+        pass
+    repaired = _TRAILING_COMMA_RE.sub(r"\1", text)
+    if repaired != text:
+        try:
+            return json.loads(repaired)
+        except (ValueError, RecursionError):
+            pass
+    return _MISSING
+
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)\s*```", re.IGNORECASE)
+
+
+def legacy_candidates(text: str) -> Any:
+    # The pre-scanner extraction: code fences, then everything from the first
+    # "{" to the last "}" and from the first "[" to the last "]"; the last
+    # candidate that parses wins. Cheap (a few C-level passes), so result()
+    # tries it before rescanning after a failed first candidate.
+    candidates = _FENCE_RE.findall(text)
+    for open_ch, close_ch in (("{", "}"), ("[", "]")):
+        i, j = text.find(open_ch), text.rfind(close_ch)
+        if 0 <= i < j:
+            candidates.append(text[i:j + 1])
+    for cand in reversed(candidates):
+        value = loads_lenient(cand.strip())
+        if value is not _MISSING:
+            return value
+    return _MISSING
+
+
+# Incremental bracket-balancing scanner for JSON embedded in model output
+# (prose, code fences, several candidates, truncated tails).
+#
+# Text is fed in pieces; the scanner jumps between structural characters with
+# precompiled regexes, tracking only the open-bracket stack and whether it is
+# inside a string. Each time a top-level object/array closes it is parsed
+# once. The last valid top-level value wins, except that scanning stops at
+# the first object holding a `stop_key` list (e.g. "observations"). A span
+# that does not parse is abandoned and rescanned from just after its opening
+# bracket, so a valid value nested in junk is still found. If the text ends
+# inside a value, result() closes it after its last complete element, or
+# failing that tries the old fence/outermost-bracket candidates and then
+# rescans from after its opening bracket (a stray "{" in prose). A complete
+# stop_key object nested in a value that has not closed is taken as the
+# answer at once, so a stray opener does not hide the real document.
+#
+# on_item is called with each element of a stop_key list (at any depth) as
+# soon as it is complete, so a consumer can start on observations while the model is still
+# generating. Elements of a value that is later abandoned may have been
+# passed already; consumers should treat on_item as a prefetch.
+class JsonScanner:
+    def __init__(self, stop_key: Optional[str] = None, on_item: Callable[[Any], None] = None):
+        self.stop_key = stop_key
+        self.on_item = on_item
+        self.buf = ""
+        self.pos = 0
+        self.start = -1
+        self.stack: List[str] = []
+        self.in_string = False
+        self.value: Any = _MISSING
+        self.done = False
+
+        # end offset and open stack right after the last nested close
+        self._last_end = -1
+        self._last_stack: List[str] = []
+        self._decode_waste = 0
+
+        # offsets of the open brackets on the stack, and the end of every
+        # nested value seen to balance (reused when rescanning after a restart)
+        self._open_at: List[int] = []
+        self._spans: Dict[int, int] = {}
+
+        # last string seen (a key, when followed by a value), the stack depth
+        # of an open stop_key list (0: none) and the offset of the object
+        # holding it, and elements passed to on_item
+        self._stop_token = json.dumps(stop_key) if stop_key else None
+        self._str_at = -1
+        self._key: Optional[str] = None
+        self._items_depth = 0
+        self._items_owner = -1
+        self._emitted = 0
+
+    @property
+    def complete(self) -> bool:
+        # a top-level value has been parsed
+        return self.value is not _MISSING
+
+    def feed(self, text: str) -> bool:
+        if self.done or not text:
+            return self.done
+        self.buf += text
+        self._scan()
+        return self.done
+
+    def _abandon(self) -> int:
+        pos = self.start + 1
+        self.start = -1
+        self.stack = []
+        self._open_at = []
+        self.in_string = False
+        self._last_end = -1
+        self._key = None
+        self._items_depth = 0
+        self._items_owner = -1
+        self._emitted = 0
+        return pos
+
+    def _emit(self, item: Any):
+        self._emitted += 1
+        if self.on_item is not None:
+            self.on_item(item)
+
+    def _is_stop_doc(self, value: Any) -> bool:
+        return bool(self.stop_key) and isinstance(value, dict) and isinstance(value.get(self.stop_key), list)
+
+    def _decode(self, start: int) -> Tuple[Any, int]:
+        # (value, end) of a well-formed value at start, or (_MISSING, -1)
+        if self._decode_waste > DECODE_WASTE_FACTOR * len(self.buf):
+            return _MISSING, -1
+        if not _VALUE_START_RE[self.buf[start]].match(self.buf, start):
+            return _MISSING, -1
+        try:
+            return _DECODER.raw_decode(self.buf, start)
+        except json.JSONDecodeError as e:
+            # building the error counts lines from the start of the text
+            self._decode_waste += e.pos + 1
+            return _MISSING, -1
+        except RecursionError:
+            # nested too deep to decode: malformed as far as we are concerned
+            self._decode_waste += len(self.buf) - start
+            return _MISSING, -1
+
+    def _close_top(self, end: int) -> int:
+        value = loads_lenient(self.buf[self.start:end])
+        if value is _MISSING:
+            return self._abandon()
+        return self._accept(value, end)
+
+    def _accept(self, value: Any, end: int) -> int:
+        self.value = value
+        if self._is_stop_doc(value):
+            self.done = True
+            for item in value[self.stop_key][self._emitted:]:
+                self._emit(item)
+        self.start = -1
+        self.stack = []
+        self._open_at = []
+        self._last_end = -1
+        self._key = None
+        self._items_depth = 0
+        self._items_owner = -1
+        self._emitted = 0
+        return end
+
+    def _scan(self):
+        buf = self.buf
+        n = len(buf)
+        pos = self.pos
+
+        while not self.done:
+            if self.in_string:
+                m = _STRING_RE.search(buf, pos)
+                if m is None:
+                    pos = n
+                    break
+                if m.group() == "\\":
+                    if m.end() >= n:
+                        # escaped character not received yet
+                        pos = m.start()
+                        break
+                    pos = m.end() + 1
+                    continue
+                self.in_string = False
+                pos = m.end()
+                self._key = buf[self._str_at:pos]
+                continue
+
+            if not self.stack:
+                m = _OPEN_RE.search(buf, pos)
+                if m is None:
+                    pos = n
+                    break
+                self.start = m.start()
+                if self.start in self._spans:
+                    pos = self._close_top(self._spans[self.start])
+                    continue
+                # a well-formed value already in the buffer is decoded in one
+                # C-level pass; otherwise balance brackets from the opener
+                value, end = self._decode(self.start)
+                if end < 0:
+                    self.stack.append(m.group())
+                    self._open_at.append(self.start)
+                    pos = m.end()
+                    continue
+                pos = self._accept(value, end)
+                continue
+
+            m = _STRUCT_RE.search(buf, pos)
+            if m is None:
+                pos = n
+                break
+            ch = m.group()
+            pos = m.end()
+
+            if len(ch) > 1:
+                # whole string consumed in one match
+                self._key = ch
+                continue
+            if ch == '"':
+                # string still open at the end of the buffer
+                self.in_string = True
+                self._str_at = m.start()
+            elif ch == "{" or ch == "[":
+                # the stop_key list may open at any depth: a stray opener in
+                # prose before the real document nests it one level down
+                depth = len(self.stack)
+                items_list = (not self._items_depth and ch == "[" and self._key is not None
+                              and self._key == self._stop_token and self.stack[-1] == "{")
+                items_elem = self._items_depth == depth and self.on_item is not None
+                self._key = None
+                if items_list:
+                    self._items_owner = self._open_at[-1]
+
+                # skip a well-formed (or already balanced) nested value
+                value, end = _MISSING, self._spans.get(m.start(), -1)
+                if end < 0:
+                    value, end = self._decode(m.start())
+                elif ((items_list and self.on_item is not None) or items_elem
+                      or (ch == "{" and self._stop_token and buf.find(self._stop_token, m.start(), end) >= 0)):
+                    value = loads_lenient(buf[m.start():end])
+                if end > 0:
+                    self._spans[m.start()] = end
+                    if ch == "{" and self._is_stop_doc(value):
+                        # a complete stop_key document inside a value that
+                        # has not closed (yet): that document is the answer
+                        pos = self._accept(value, end)
+                        continue
+                    pos = self._last_end = end
+                    self._last_stack = list(self.stack)
+                    if items_elem and value is not _MISSING:
+                        self._emit(value)
+                    elif items_list and self.on_item is not None and isinstance(value, list):
+                        for item in value:
+                            self._emit(item)
+                    continue
+                self.stack.append(ch)
+                self._open_at.append(m.start())
+                if items_list:
+                    self._items_depth = depth + 1
+            elif _CLOSERS[self.stack[-1]] != ch:
+                pos = self._abandon()
+            else:
+                self.stack.pop()
+                opened = self._open_at.pop()
+                self._spans[opened] = pos
+                self._key = None
+                if self.stack:
+                    if opened == self._items_owner:
+                        value = loads_lenient(buf[opened:pos])
+                        if self._is_stop_doc(value):
+                            pos = self._accept(value, pos)
+                            continue
+                        self._items_owner = -1
+                    self._last_end = pos
+                    self._last_stack = list(self.stack)
+                    if self._items_depth:
+                        if len(self.stack) < self._items_depth:
+                            self._items_depth = 0
+                        elif len(self.stack) == self._items_depth and self.on_item is not None:
+                            item = loads_lenient(buf[opened:pos])
+                            if item is not _MISSING:
+                                self._emit(item)
+                else:
+                    pos = self._close_top(pos)
+
+        self.pos = pos
+
+    def _salvage(self) -> Any:
+        # truncated output: keep everything up to the last complete element
+        if self.stack and self._last_end > self.start >= 0:
+            tail = "".join(_CLOSERS[b] for b in reversed(self._last_stack))
+            return loads_lenient(self.buf[self.start:self._last_end] + tail)
+        return _MISSING
+
+    def result(self, default: Any = None) -> Any:
+        if self.value is not _MISSING:
+            return self.value
+
+        value = self._salvage()
+        if value is _MISSING and self.stack:
+            value = legacy_candidates(self.buf)
+        if value is _MISSING and self.stack:
+            # the open value may be a stray bracket in prose: rescan the rest
+            # of the text on a copy so the scanner can still be fed
+            rest = JsonScanner(self.stop_key)
+            rest.buf = self.buf
+            rest.pos = self.start + 1
+            rest._decode_waste = self._decode_waste
+            rest._spans = self._spans
+            for _ in range(MAX_RESTARTS):
+                rest._scan()
+                if rest.value is not _MISSING or not rest.stack:
+                    break
+                value = rest._salvage()
+                if value is not _MISSING:
+                    break
+                rest.pos = rest._abandon()
+            if rest.value is not _MISSING:
+                value = rest.value
+
+        if value is not _MISSING:
+            return value
+        return {} if default is None else default
+
+
+def scan_json(text: str, stop_key: Optional[str] = "observations") -> Any:
+    # Fast path: the whole output (or its only code fence) is one JSON value
+    text = (text or "").strip()
+    body = text
+    if len(body) >= 6 and body.startswith("```") and body.endswith("```"):
+        body = body[3:-3].strip()
+        if body[:4].lower() == "json":
+            body = body[4:].lstrip()
+    if body[:1] in ("{", "[") and body[-1:] in ("}", "]"):
+        value = loads_lenient(body)
+        if value is not _MISSING:
+            return value
+
+    scanner = JsonScanner(stop_key=stop_key)
+    scanner.feed(text)
+    return scanner.result()
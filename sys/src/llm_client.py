@@ -0,0 +1,371 @@
+# src/llm_client.py
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import httpx
+import ollama
+
+
+# ================= RATE LIMIT =================
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = float(rate)
+        self.capacity = float(burst or max(1, int(rate)))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        # Take one token (possibly going negative) and return how long the
+        # caller must wait for it to be paid back
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            return max(0.0, -self._tokens / self.rate)
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+# ================= RETRY =================
+
+def is_transient(err: Exception) -> bool:
+    if isinstance(err, (ConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(err, ollama.ResponseError):
+        return err.status_code in {-1, 408, 429} or err.status_code >= 500
+    return False
+
+
+def is_busy(err: Exception) -> bool:
+    # the server answered but is overloaded: it is up, just retry later
+    return isinstance(err, ollama.ResponseError) and err.status_code in {429, 503}
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+# ================= CLIENTS =================
+
+# Synchronous only: records, fan-out calls and pipeline stages run on thread
+# pools, so concurrency comes from max_inflight slots shared across threads.
+# An asyncio client would need an event loop none of the callers have, and
+# the SQLite response cache would block it.
+
+class LLMClient:
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        timeout: float = 300.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        rate_limit: Optional[float] = None,
+        max_inflight: Optional[int] = None,
+    ):
+        self.host = host
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # ollama.Client keeps one pooled httpx.Client (keep-alive connections)
+        self._client = ollama.Client(host=host, timeout=timeout)
+        self.limiter = TokenBucket(rate_limit) if rate_limit else None
+        self.set_max_inflight(max_inflight)
+        # short-timeout client for ping(), created on first use
+        self._health: Optional[Tuple[float, ollama.Client]] = None
+
+    def set_max_inflight(self, n: Optional[int]):
+        self._inflight = threading.BoundedSemaphore(n) if n and n > 0 else None
+
+    @contextmanager
+    def _slot(self):
+        sem = self._inflight
+        if sem is None:
+            yield
+            return
+        with sem:
+            yield
+
+    def _call(self, fn, **kwargs):
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                with self._slot():
+                    return fn(**kwargs)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                attempt += 1
+
+    def chat(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        return self._call(self._client.chat, model=model, messages=messages, **kwargs)
+
+    def chat_stream(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        # Streamed chat parts. The inflight slot is held until the stream is
+        # exhausted or closed (closing drops the connection, which cancels
+        # generation server-side); retried only before the first part
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            started = False
+            try:
+                with self._slot():
+                    parts = self._client.chat(model=model, messages=messages, stream=True, **kwargs)
+                    try:
+                        for part in parts:
+                            started = True
+                            yield part
+                    finally:
+                        parts.close()
+                return
+            except Exception as e:
+                if started or attempt >= self.max_retries or not is_transient(e):
+                    raise
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+                attempt += 1
+
+    def embeddings(self, model: str, prompt: str, **kwargs):
+        return self._call(self._client.embeddings, model=model, prompt=prompt, **kwargs)
+
+    def embed(self, model: str, input: Any, **kwargs):
+        return self._call(self._client.embed, model=model, input=input, **kwargs)
+
+    def ping(self, timeout: float = 2.0) -> bool:
+        # Cheap liveness probe (list models, GET /api/tags) that bypasses
+        # retries and slots
+        if self._health is None or self._health[0] != timeout:
+            self._health = (timeout, ollama.Client(host=self.host, timeout=timeout))
+        try:
+            self._health[1].list()
+            return True
+        except Exception:
+            return False
+
+
+# ================= POOL =================
+
+def split_hosts(host: Union[str, Sequence[str], None]) -> List[Optional[str]]:
+    # "http://a:11434,http://b:11434" or a list -> hosts; None -> [None]
+    if host is None:
+        return [None]
+    if isinstance(host, str):
+        hosts = [h.strip() for h in host.split(",") if h.strip()]
+    else:
+        hosts = [h for h in host if h]
+    return hosts or [None]
+
+
+# Several Ollama servers serving the same models behind the LLMClient
+# interface. Each call goes to the healthy endpoint with the fewest
+# outstanding requests (ties rotate). A transient failure fails the call over
+# to the next endpoint; once every endpoint has failed the pool backs off and
+# starts a new round, up to max_retries times. Connection errors and 5xx mark
+# the endpoint down: it is pinged before taking traffic again, after
+# `cooldown` seconds or at the next backoff round, whichever comes first.
+# A busy answer (429/503) only moves that call on; the endpoint stays up.
+class LLMPool:
+    def __init__(
+        self,
+        hosts: Sequence[str],
+        timeout: float = 300.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        rate_limit: Optional[float] = None,
+        max_inflight: Optional[int] = None,
+        cooldown: float = 5.0,
+        health_timeout: float = 2.0,
+    ):
+        self.hosts = list(hosts)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cooldown = cooldown
+        self.health_timeout = health_timeout
+
+        # retries are the pool's job (failover first), not the endpoint's;
+        # rate limit and max_inflight apply per endpoint
+        self.endpoints = [
+            LLMClient(host=h, timeout=timeout, max_retries=0, rate_limit=rate_limit, max_inflight=max_inflight)
+            for h in self.hosts
+        ]
+        n = len(self.endpoints)
+        self._lock = threading.Lock()
+        self._outstanding = [0] * n
+        self._down_until = [0.0] * n
+        self._healthy = [True] * n
+        self._requests = [0] * n
+        self._failures = [0] * n
+        self._next = 0
+
+    def set_max_inflight(self, n: Optional[int]):
+        for ep in self.endpoints:
+            ep.set_max_inflight(n)
+
+    def check_health(self) -> List[bool]:
+        # Ping every endpoint now; returns the health of each
+        for i, ep in enumerate(self.endpoints):
+            ok = ep.ping(self.health_timeout)
+            with self._lock:
+                self._set_health(i, ok)
+        return list(self._healthy)
+
+    def _set_health(self, i: int, ok: bool):
+        self._healthy[i] = ok
+        self._down_until[i] = 0.0 if ok else time.monotonic() + self.cooldown
+
+    def _acquire(self, tried: set, recheck_all: bool = False) -> Optional[int]:
+        now = time.monotonic()
+        with self._lock:
+            recheck = [i for i in range(len(self.endpoints))
+                       if not self._healthy[i] and i not in tried and (recheck_all or self._down_until[i] <= now)]
+            # back off the endpoints being pinged so concurrent callers do not
+            # all ping the same one
+            for i in recheck:
+                self._down_until[i] = now + self.cooldown
+        for i in recheck:
+            ok = self.endpoints[i].ping(self.health_timeout)
+            with self._lock:
+                self._set_health(i, ok)
+
+        with self._lock:
+            n = len(self.endpoints)
+            best = None
+            for k in range(n):
+                i = (self._next + k) % n
+                if i in tried or not self._healthy[i]:
+                    continue
+                if best is None or self._outstanding[i] < self._outstanding[best]:
+                    best = i
+            if best is None:
+                return None
+            self._next = (best + 1) % n
+            self._outstanding[best] += 1
+            self._requests[best] += 1
+            return best
+
+    def _release(self, i: int, err: Optional[Exception] = None):
+        with self._lock:
+            self._outstanding[i] -= 1
+            if err is not None:
+                self._failures[i] += 1
+                if not is_busy(err):
+                    self._set_health(i, False)
+
+    def _next_endpoint(self, tried: set, attempt: int, last: Optional[Exception]):
+        # (endpoint, tried, attempt) for the next try, backing off once every
+        # endpoint has failed this round; a new round re-pings down endpoints
+        # instead of waiting out their cooldown
+        recheck_all = False
+        while True:
+            i = self._acquire(tried, recheck_all)
+            if i is not None:
+                return i, tried, attempt
+            if attempt >= self.max_retries:
+                raise last or ConnectionError(f"no healthy Ollama endpoint among {self.hosts}")
+            time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+            tried, attempt, recheck_all = set(), attempt + 1, True
+
+    def _call(self, method: str, **kwargs):
+        tried, attempt, last = set(), 0, None
+        while True:
+            i, tried, attempt = self._next_endpoint(tried, attempt, last)
+            err = None
+            try:
+                return getattr(self.endpoints[i], method)(**kwargs)
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                err = last = e
+                tried.add(i)
+            finally:
+                self._release(i, err)
+
+    def chat(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        return self._call("chat", model=model, messages=messages, **kwargs)
+
+    def chat_stream(self, model: str, messages: List[Dict[str, Any]], **kwargs):
+        # Fails over only before the first part
+        tried, attempt, last = set(), 0, None
+        while True:
+            i, tried, attempt = self._next_endpoint(tried, attempt, last)
+            started, err = False, None
+            try:
+                for part in self.endpoints[i].chat_stream(model=model, messages=messages, **kwargs):
+                    started = True
+                    yield part
+                return
+            except Exception as e:
+                if started or not is_transient(e):
+                    raise
+                err = last = e
+                tried.add(i)
+            finally:
+                self._release(i, err)
+
+    def embeddings(self, model: str, prompt: str, **kwargs):
+        return self._call("embeddings", model=model, prompt=prompt, **kwargs)
+
+    def embed(self, model: str, input: Any, **kwargs):
+        return self._call("embed", model=model, input=input, **kwargs)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "host": h,
+                    "requests": self._requests[i],
+                    "failures": self._failures[i],
+                    "healthy": self._healthy[i],
+                }
+                for i, h in enumerate(self.hosts)
+            ]
+
+
+def make_client(host: Union[str, Sequence[str], None] = None, **kwargs) -> Union[LLMClient, LLMPool]:
+    # One host -> LLMClient; several (comma-separated or a list) -> LLMPool
+    hosts = split_hosts(host)
+    if len(hosts) == 1:
+        return LLMClient(host=hosts[0], **kwargs)
+    return LLMPool(hosts, **kwargs)
+
+
+# ================= DEFAULTS =================
+
+_client_kwargs: Dict[str, Any] = {}
+_default_client: Optional[Union[LLMClient, LLMPool]] = None
+_default_lock = threading.Lock()
+
+
+# Options (host, timeout, retries, rate limit, max_inflight) for the shared
+# client; several comma-separated hosts make it an LLMPool
+def configure_client(**kwargs):
+    global _client_kwargs, _default_client
+    with _default_lock:
+        _client_kwargs = dict(kwargs)
+        _default_client = make_client(**_client_kwargs)
+
+
+def get_client() -> Union[LLMClient, LLMPool]:
+    global _default_client
+    if _default_client is None:
+        with _default_lock:
+            if _default_client is None:
+                _default_client = make_client(**_client_kwargs)
+    return _default_client
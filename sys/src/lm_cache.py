@@ -0,0 +1,143 @@
+# src/lm_cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+def cache_key(model: str, prompt: str, temperature: float, max_tokens: int, format: Any = None,
+              stopped: Any = None) -> str:
+    # format (constrained decoding) and stopped (where a cancelled stream was
+    # cut off) only enter the key when set, so keys of unconstrained, complete
+    # generations are unchanged
+    req = {"model": model, "prompt": prompt, "temperature": temperature, "max_tokens": max_tokens}
+    if format is not None:
+        req["format"] = format
+    if stopped is not None:
+        req["stopped"] = stopped
+    payload = json.dumps(req, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# Content-addressed store for LLM completions (SQLite). Entries are evicted
+# least-recently-used first once the total payload exceeds max_bytes.
+class ResponseCache:
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024):
+        self.path = Path(cache_dir) / "responses.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        # long busy timeout: shard processes sharing cache_dir queue on writes
+        self._conn = sqlite3.connect(str(self.path), timeout=60.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " response TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses(last_access)")
+            # running payload total, kept in step with responses by put() and
+            # _evict() in their transactions; seeded once for older caches
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta ("
+                " id INTEGER PRIMARY KEY CHECK (id = 0),"
+                " total_bytes INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO meta (id, total_bytes) SELECT 0, COALESCE(SUM(size), 0) FROM responses"
+            )
+            self._total_bytes = self._read_total()
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def _read_total(self) -> int:
+        return int(self._conn.execute("SELECT total_bytes FROM meta WHERE id = 0").fetchone()[0])
+
+    def _add_total(self, delta: int):
+        self._conn.execute("UPDATE meta SET total_bytes = total_bytes + ? WHERE id = 0", (delta,))
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, response: str):
+        # The running total lives in the database and is updated in the same
+        # write transaction: processes sharing cache_dir (--shards) all write
+        # to the same table, so max_bytes caps the cache as a whole rather
+        # than each process's own writes
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, response, size, last_access) VALUES (?, ?, ?, ?)",
+                    (key, response, size, time.time()),
+                )
+                self._add_total(size - (int(row[0]) if row else 0))
+                self._total_bytes = self._read_total()
+                if self._total_bytes > self.max_bytes:
+                    self._evict()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _evict(self):
+        freed = 0
+        while self._total_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY last_access ASC LIMIT 64"
+            ).fetchall()
+            if not rows:
+                # nothing left to evict: the stored total had drifted
+                freed += self._total_bytes
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._total_bytes -= int(size)
+                freed += int(size)
+                self.evictions += 1
+        self._add_total(-freed)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._total_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
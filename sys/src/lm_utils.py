@@ -1,39 +1,137 @@
 # src/lm_utils.py
-import json
-import re
-import ollama
+import time
 
+from src import instrument
+from src.json_scanner import JsonScanner, scan_json
+from src.lm_cache import ResponseCache, cache_key
+from src.llm_client import get_client
+from src.segmenter import approx_tokens
 
-def generate_response(model, prompt, temperature=0.0, max_tokens=512):
-    response = ollama.chat(
+# Optional persistent response cache (see set_response_cache)
+_response_cache = None
+
+
+def set_response_cache(cache: ResponseCache):
+    global _response_cache
+    _response_cache = cache
+
+
+def get_response_cache():
+    return _response_cache
+
+
+def generate_response(model, prompt, temperature=0.0, max_tokens=512, client=None, keep_alive=None, format=None):
+    # format: "json" or a JSON schema dict for Ollama's constrained decoding
+    cache = _response_cache
+    key = None
+    if cache is not None:
+        key = cache_key(model, prompt, temperature, max_tokens, format)
+        hit = cache.get(key)
+        if hit is not None:
+            instrument.count("llm_cache_hits")
+            return hit
+
+    t0 = time.perf_counter()
+    response = (client or get_client()).chat(
         model=model,
         messages=[{"role": "user", "content": prompt}],
         options={"temperature": temperature, "num_predict": max_tokens},
+        keep_alive=keep_alive,
+        format=format,
     )
-    return response["message"]["content"]
+    instrument.llm_call(model, time.perf_counter() - t0, response)
+    content = response["message"]["content"]
 
+    if cache is not None:
+        cache.put(key, content)
+    return content
 
-def extract_json_from_response(text):
-    if not text:
-        return {}
 
-    candidates = []
+def stream_json_response(model, prompt, temperature=0.0, max_tokens=512, client=None, keep_alive=None,
+                         format=None, stop_key="observations", on_item=None, stop_on=None):
+    # Streaming variant of generate_response for JSON answers. The completion
+    # is fed to a JsonScanner as it arrives until the document is complete:
+    # an object holding a stop_key list, or (with stop_on) a top-level object
+    # holding the stop_on key. If the model then ends, the call finished
+    # normally and is cached like generate_response; if it goes on writing,
+    # the request is closed and the commentary is never generated. on_item
+    # gets each stop_key element as soon as it is parsed. Returns the text
+    # received.
+    #
+    # A cancelled stream is cached under its own key: the truncated text is
+    # not what generate_response would have returned for the prompt.
+    cache = _response_cache
+    keys = None
+    scanner = JsonScanner(stop_key=stop_key, on_item=on_item)
+    if cache is not None:
+        keys = (
+            cache_key(model, prompt, temperature, max_tokens, format),
+            cache_key(model, prompt, temperature, max_tokens, format, stopped=[stop_key, stop_on]),
+        )
+        for key in keys:
+            hit = cache.get(key)
+            if hit is not None:
+                instrument.count("llm_cache_hits")
+                if on_item is not None:
+                    scanner.feed(hit)
+                return hit
 
-    fenced = re.findall(r"```(?:json)?\s*([\s\S]*?)\s*```", text, re.IGNORECASE)
-    candidates.extend(fenced)
+    t0 = time.perf_counter()
+    parts = (client or get_client()).chat_stream(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        options={"temperature": temperature, "num_predict": max_tokens},
+        keep_alive=keep_alive,
+        format=format,
+    )
+    pieces = []
+    last = None
+    complete = False
+    try:
+        for part in parts:
+            last = part
+            piece = part["message"]["content"]
+            if complete:
+                # the document is complete: read on only while the model is
+                # finishing (blank parts up to the final `done` one, which
+                # carries the token counts); more text means commentary
+                if piece.strip() and not part.get("done"):
+                    break
+                if piece:
+                    pieces.append(piece)
+                continue
+            if not piece:
+                continue
+            pieces.append(piece)
+            if scanner.feed(piece):
+                complete = True
+            elif stop_on is not None and isinstance(scanner.value, dict) and stop_on in scanner.value:
+                complete = True
+    finally:
+        parts.close()
 
-    raw_obj = re.findall(r"\{[\s\S]*\}", text)
-    candidates.extend(raw_obj)
+    finished = last is not None and last.get("done")
+    content = "".join(pieces)
+    if finished:
+        instrument.llm_call(model, time.perf_counter() - t0, last)
+    else:
+        # cancelled: the final part with token counts never arrives, so both
+        # sides are estimated (~4 chars/token); llm_stream_cancelled counts
+        # how many calls were estimated
+        instrument.llm_call(model, time.perf_counter() - t0, {
+            "prompt_eval_count": approx_tokens(prompt),
+            "eval_count": approx_tokens(content),
+        })
+        instrument.count("llm_stream_cancelled")
 
-    raw_arr = re.findall(r"\[[\s\S]*\]", text)
-    candidates.extend(raw_arr)
+    if cache is not None:
+        cache.put(keys[0] if finished else keys[1], content)
+    return content
 
-    for cand in reversed(candidates):
-        cand = cand.strip()
-        cand = re.sub(r",\s*([}\]])", r"\1", cand)
-        try:
-            return json.loads(cand)
-        except:
-            continue
 
-    return {}
+def extract_json_from_response(text):
+    # Outermost valid JSON object/array in the response (see JsonScanner);
+    # stops at the first complete {"observations": [...]}
+    if not text:
+        return {}
+    return scan_json(text, stop_key="observations")
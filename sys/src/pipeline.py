@@ -0,0 +1,174 @@
+# src/pipeline.py
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List
+
+_STOP = object()
+_POLL_S = 0.1
+
+
+class Stage:
+    def __init__(self, name: str, fn: Callable[[Any], Any], workers: int = 1):
+        self.name = name
+        self.fn = fn
+        self.workers = max(1, workers)
+
+
+class StageStats:
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.busy_s = 0.0
+        self.starved_s = 0.0      # waiting on an empty input queue
+        self.blocked_s = 0.0      # waiting on a full output queue (backpressure)
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def add(self, busy: float, starved: float, blocked: float, depth: int):
+        with self._lock:
+            self.processed += 1
+            self.busy_s += busy
+            self.starved_s += starved
+            self.blocked_s += blocked
+            self.max_queue_depth = max(self.max_queue_depth, depth)
+
+    def as_dict(self, wall_s: float) -> Dict[str, Any]:
+        capacity = wall_s * self.workers
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "busy_s": round(self.busy_s, 3),
+            "starved_s": round(self.starved_s, 3),
+            "blocked_s": round(self.blocked_s, 3),
+            "utilization": round(self.busy_s / capacity, 4) if capacity else 0.0,
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+
+# Runs items through a chain of stages connected by bounded queues, so a slow
+# stage (e.g. LLM filtering of record N) overlaps the others (extraction of
+# record N+1). Each stage has its own worker threads; results are yielded in
+# input order through a reorder buffer. An error in the input iterator is
+# raised in order like a stage error; if the consumer stops early (error or
+# close()), the threads are told to stop and joined once their current item
+# is done.
+class StagedPipeline:
+    def __init__(self, stages: List[Stage], queue_size: int = 4):
+        self.stages = stages
+        self.queue_size = max(1, queue_size)
+        self.stats = [StageStats(s.name, s.workers) for s in stages]
+        self.source_blocked_s = 0.0
+        self.wall_s = 0.0
+        self._cancel = threading.Event()
+
+    def _put(self, q: queue.Queue, msg: Any) -> bool:
+        # False once the pipeline is cancelled (nobody will read the queue)
+        while not self._cancel.is_set():
+            try:
+                q.put(msg, timeout=_POLL_S)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, q: queue.Queue) -> Any:
+        while not self._cancel.is_set():
+            try:
+                return q.get(timeout=_POLL_S)
+            except queue.Empty:
+                pass
+        return _STOP
+
+    def _feed(self, items: Iterable[Any], q: queue.Queue):
+        seq = 0
+        try:
+            for item in items:
+                t0 = time.perf_counter()
+                if not self._put(q, (seq, item, None)):
+                    return
+                self.source_blocked_s += time.perf_counter() - t0
+                seq += 1
+        except Exception as e:
+            self._put(q, (seq, None, e))
+        self._put(q, _STOP)
+
+    def _work(self, idx: int, q_in: queue.Queue, q_out: queue.Queue, alive: List[int], lock: threading.Lock):
+        stage, stats = self.stages[idx], self.stats[idx]
+        while True:
+            t0 = time.perf_counter()
+            msg = self._get(q_in)
+            depth = q_in.qsize()
+            t1 = time.perf_counter()
+
+            if msg is _STOP:
+                # let sibling workers see it too; the last one out passes it on
+                self._put(q_in, _STOP)
+                with lock:
+                    alive[0] -= 1
+                    last = alive[0] == 0
+                if last:
+                    self._put(q_out, _STOP)
+                return
+
+            seq, item, err = msg
+            if err is None:
+                try:
+                    item = stage.fn(item)
+                except Exception as e:
+                    err = e
+            t2 = time.perf_counter()
+
+            if not self._put(q_out, (seq, item, err)):
+                return
+            t3 = time.perf_counter()
+            stats.add(busy=t2 - t1, starved=t1 - t0, blocked=t3 - t2, depth=depth)
+
+    def run(self, items: Iterable[Any]) -> Iterator[Any]:
+        start = time.perf_counter()
+        self._cancel.clear()
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._feed, args=(items, queues[0]), daemon=True)]
+        for i, stage in enumerate(self.stages):
+            alive, lock = [stage.workers], threading.Lock()
+            for _ in range(stage.workers):
+                threads.append(threading.Thread(
+                    target=self._work,
+                    args=(i, queues[i], queues[i + 1], alive, lock),
+                    daemon=True,
+                ))
+        for t in threads:
+            t.start()
+
+        buffer: Dict[int, Any] = {}
+        next_seq = 0
+        out_q = queues[-1]
+        try:
+            while True:
+                msg = out_q.get()
+                if msg is _STOP:
+                    break
+                seq, item, err = msg
+                buffer[seq] = (item, err)
+                while next_seq in buffer:
+                    item, err = buffer.pop(next_seq)
+                    if err is not None:
+                        raise err
+                    yield item
+                    next_seq += 1
+        finally:
+            self._cancel.set()
+            for t in threads:
+                t.join()
+            self.wall_s = time.perf_counter() - start
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "wall_s": round(self.wall_s, 3),
+            "queue_size": self.queue_size,
+            "source_blocked_s": round(self.source_blocked_s, 3),
+            "stages": [s.as_dict(self.wall_s) for s in self.stats],
+        }
@@ -1,14 +1,29 @@
 # src/run.py
 import json
+import os
+import sys
 import argparse
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-
-from src.schema import SynurSchema
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Tuple, Union
+
+from src import instrument
+from src.instrument import Instrumentation, set_instrumentation
+from src.schema import SchemaConcept, SynurSchema
+from src.checkpoint import ProgressJournal, read_done_ids
+from src.lm_cache import ResponseCache
+from src.lm_utils import set_response_cache
+from src.llm_client import LLMClient, LLMPool, configure_client, get_client, make_client
+from src.pipeline import Stage, StagedPipeline
+from src.shard import parse_shard, run_shards, shard_lines, shard_path
+from src.segmenter import Segmenter, check_tokenizer_spec, dedup_observations, load_token_counter
 from src.agents.extract import ExtractorAgent
-from src.agents.validate import ValidatorAgent
+from src.agents.validate import ValidationSession, ValidatorAgent
 from src.agents.precision_filter import PrecisionFilterAgent
+from src.agents.prefilter import RulePreFilter
 from src.agents.schema_retriever import SchemaRetriever
+from src.agents.lexical_retriever import HybridRetriever, LexicalRetriever
 
 
 def split_transcript(text: str, max_chars: int = 1400) -> List[str]:
@@ -28,6 +43,43 @@ def chunk_schema_ids(ids: List[str], size: int) -> List[List[str]]:
     return [ids[i:i + size] for i in range(0, len(ids), size)]
 
 
+def cut_by_score(scored: List[Tuple[str, float]], cutoff: float) -> List[str]:
+    # Keep concepts scoring at least `cutoff` x the chunk's best score; a
+    # relative cutoff works for cosine, BM25 and fused scores alike
+    if not scored:
+        return []
+    best = scored[0][1]
+    if best <= 0:
+        return [cid for cid, _ in scored]
+    return [cid for cid, s in scored if s >= cutoff * best]
+
+
+def batch_major(tasks: List[Tuple[str, List[str]]]) -> List[int]:
+    # Indices of (chunk, schema batch) tasks grouped by schema batch, in order
+    # of first appearance; chunk order within a batch
+    first: Dict[Tuple[str, ...], int] = {}
+    for i, (_, sb) in enumerate(tasks):
+        first.setdefault(tuple(sb), i)
+    return sorted(range(len(tasks)), key=lambda i: (first[tuple(tasks[i][1])], i))
+
+
+def pack_schema_ids(ids: List[str], concepts: Dict[str, SchemaConcept], token_budget: int) -> List[List[str]]:
+    # Greedy packing in retrieval order: a new batch starts when the next
+    # concept's SCHEMA entry (~4 chars/token) would overflow token_budget
+    batches, cur, cur_tokens = [], [], 0
+    for cid in ids:
+        c = concepts.get(cid)
+        tokens = len(c.prompt_json) // 4 + 1 if c is not None else 1
+        if cur and cur_tokens + tokens > token_budget:
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(cid)
+        cur_tokens += tokens
+    if cur:
+        batches.append(cur)
+    return batches
+
+
 # ================= SUPPRESSION =================
 
 SUPPRESS_ALWAYS_BY_NAME = {
@@ -77,64 +129,270 @@ def apply_suppression_table(obs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     return cleaned
 
 
+# ================= RUNNER =================
+
+# Apply fn over items with a thread pool and yield results in input order.
+# At most 2 * workers items are in flight; finished results wait in a
+# reorder buffer until every earlier item has been yielded.
+def run_ordered(items: Iterable[Any], fn: Callable[[Any], Any], workers: int) -> Iterator[Any]:
+    if workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    max_pending = workers * 2
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        pending = {}
+        next_idx = 0
+        source = enumerate(items)
+        exhausted = False
+
+        while True:
+            while not exhausted and len(pending) < max_pending:
+                try:
+                    i, item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                # each task runs in a copy of the caller's context so
+                # instrumentation attributes it to the right record/stage
+                pending[i] = ex.submit(contextvars.copy_context().run, fn, item)
+
+            if next_idx not in pending:
+                break
+
+            yield pending.pop(next_idx).result()
+            next_idx += 1
+
+
 # ================= CORE =================
+# A record flows through three stages that can run back to back
+# (process_record) or as separate pipeline stages (--pipeline). Each stage
+# takes and returns {"id", "text", "observations"}.
 
-def process_record(
+def extract_record(
     record: Dict[str, Any],
     model: str,
     schema: SynurSchema,
     batch_size: int,
     segment: bool,
-    use_suppress_table: bool,
-    use_precision_filter: bool,
     use_schema_retrieval: bool,
     top_k_schema: int,
-    filter_model: str,
-):
+    retriever: SchemaRetriever = None,
+    record_parallelism: int = 1,
+    journal: ProgressJournal = None,
+    extractor: ExtractorAgent = None,
+    schema_token_budget: int = 0,
+    schema_score_cutoff: float = 0.0,
+    segmenter: Segmenter = None,
+    on_observation: Callable[[Dict[str, Any]], None] = None,
+) -> Dict[str, Any]:
     rid = record.get("id")
     text = record.get("transcript") or record.get("text") or ""
 
     if not isinstance(text, str) or not text.strip():
-        return {"id": rid, "observations": []}
+        return {"id": rid, "text": "", "observations": []}
 
-    extractor = ExtractorAgent(model, schema.by_id)
-    validator = ValidatorAgent(schema.by_id)
+    if extractor is None:
+        extractor = ExtractorAgent(model, schema.by_id, concepts=schema.concepts)
 
-    retriever = None
-    if use_schema_retrieval:
-        retriever = SchemaRetriever(schema.by_id, top_k=top_k_schema)
+    if use_schema_retrieval and retriever is None:
+        retriever = SchemaRetriever(schema.by_id, top_k=top_k_schema, concepts=schema.concepts)
 
-    text_chunks = split_transcript(text) if segment else [text]
+    if not segment:
+        text_chunks = [text]
+    elif segmenter is not None:
+        text_chunks = segmenter.split(text)
+    else:
+        text_chunks = split_transcript(text)
 
-    raw = []
-
-    for chunk in text_chunks:
-        if use_schema_retrieval:
-            schema_ids = retriever.retrieve(chunk)
-            schema_batches = chunk_schema_ids(schema_ids, batch_size)
+    # All chunks of the record are retrieved in one call (one embedding
+    # round-trip for the embedding retrievers)
+    if use_schema_retrieval:
+        with instrument.stage("retrieve"):
+            if schema_score_cutoff > 0:
+                chunk_ids = [cut_by_score(sc, schema_score_cutoff) for sc in retriever.retrieve_scored_many(text_chunks)]
+            else:
+                chunk_ids = retriever.retrieve_many(text_chunks)
+    else:
+        chunk_ids = [list(schema.by_id.keys())] * len(text_chunks)
+
+    # Every (chunk, schema batch) extraction is independent. They are issued
+    # batch-major, so calls sharing a schema prefix run back to back and the
+    # server can reuse its prompt cache, and merged in chunk-then-batch order
+    # so the result matches a serial run
+    tasks = []
+    for chunk, schema_ids in zip(text_chunks, chunk_ids):
+        if schema_token_budget > 0:
+            schema_batches = pack_schema_ids(schema_ids, schema.concepts, schema_token_budget)
         else:
-            schema_ids = list(schema.by_id.keys())
             schema_batches = chunk_schema_ids(schema_ids, batch_size)
 
         for sb in schema_batches:
-            extracted = extractor.run(chunk, sb)
-            if isinstance(extracted, list):
-                raw.extend(extracted)
+            tasks.append((chunk, sb))
+
+    def _extract(task):
+        chunk, sb = task
+        if journal is None:
+            with instrument.stage("extract"):
+                return extractor.run(chunk, sb, on_observation)
+
+        key = journal.task_key(model, chunk, sb)
+        done = journal.get(rid, key)
+        if done is not None:
+            instrument.count("journal_replays")
+            return done
+        with instrument.stage("extract"):
+            extracted = extractor.run(chunk, sb, on_observation)
+        journal.record(rid, key, extracted)
+        return extracted
+
+    order = batch_major(tasks)
+    results: List[Any] = [None] * len(tasks)
+    for i, extracted in zip(order, run_ordered([tasks[i] for i in order], _extract, record_parallelism)):
+        results[i] = extracted
 
-    validated = validator.run(raw, text)
+    raw = []
+    for extracted in results:
+        if isinstance(extracted, list):
+            raw.extend(extracted)
+
+    if segment and segmenter is not None and segmenter.overlap_tokens:
+        raw = dedup_observations(raw)
+
+    return {"id": rid, "text": text, "observations": raw}
+
+
+def validation_session(
+    schema: SynurSchema,
+    text: str,
+    fuzzy_evidence: bool = False,
+    emit_spans: bool = False,
+) -> ValidationSession:
+    validator = ValidatorAgent(
+        schema.by_id,
+        fuzzy_evidence=fuzzy_evidence,
+        emit_spans=emit_spans,
+        concepts=schema.concepts,
+    )
+    return validator.session(text)
+
+
+def streaming_session(
+    record: Dict[str, Any],
+    schema: SynurSchema,
+    extractor: Optional[ExtractorAgent],
+    fuzzy_evidence: bool = False,
+    emit_spans: bool = False,
+) -> Optional[ValidationSession]:
+    # A streaming extractor hands each observation to validation as soon as
+    # it is parsed, overlapping validation with generation; None otherwise
+    if extractor is None or not extractor.stream:
+        return None
+    text = record.get("transcript") or record.get("text") or ""
+    return validation_session(schema, text, fuzzy_evidence, emit_spans)
+
+
+def validate_record(
+    item: Dict[str, Any],
+    schema: SynurSchema,
+    use_suppress_table: bool,
+    fuzzy_evidence: bool = False,
+    emit_spans: bool = False,
+    session: ValidationSession = None,
+) -> Dict[str, Any]:
+    if not item["text"]:
+        return item
+
+    # session: observations already checked while extraction streamed
+    if session is None:
+        session = validation_session(schema, item["text"], fuzzy_evidence, emit_spans)
+    with instrument.stage("validate"):
+        validated = session.agent.run(item["observations"], item["text"], session)
 
     if use_suppress_table:
-        validated = apply_suppression_table(validated)
+        with instrument.stage("suppress"):
+            validated = apply_suppression_table(validated)
+
+    return {**item, "observations": validated}
+
 
-    if use_precision_filter:
+def filter_record(
+    item: Dict[str, Any],
+    schema: SynurSchema,
+    filter_model: str,
+    filter_batch_size: int = 1,
+    filter_client: Union[LLMClient, LLMPool] = None,
+    filter_agent: PrecisionFilterAgent = None,
+) -> Dict[str, Any]:
+    if not item["text"]:
+        return item
+
+    pf = filter_agent
+    if pf is None:
         pf = PrecisionFilterAgent(
             model=filter_model,
             schema_by_id=schema.by_id,
             temperature=0.0,
+            batch_size=filter_batch_size,
+            client=filter_client,
+            concepts=schema.concepts,
+        )
+    with instrument.stage("filter"):
+        kept = pf.filter_observations(item["observations"], item["text"])
+    return {**item, "observations": kept}
+
+
+def process_record(
+    record: Dict[str, Any],
+    model: str,
+    schema: SynurSchema,
+    batch_size: int,
+    segment: bool,
+    use_suppress_table: bool,
+    use_precision_filter: bool,
+    use_schema_retrieval: bool,
+    top_k_schema: int,
+    filter_model: str,
+    retriever: SchemaRetriever = None,
+    record_parallelism: int = 1,
+    filter_batch_size: int = 1,
+    journal: ProgressJournal = None,
+    filter_client: Union[LLMClient, LLMPool] = None,
+    fuzzy_evidence: bool = False,
+    emit_spans: bool = False,
+    extractor: ExtractorAgent = None,
+    filter_agent: PrecisionFilterAgent = None,
+    schema_token_budget: int = 0,
+    schema_score_cutoff: float = 0.0,
+    segmenter: Segmenter = None,
+):
+    with instrument.record(record.get("id")):
+        session = streaming_session(record, schema, extractor, fuzzy_evidence, emit_spans)
+
+        item = extract_record(
+            record,
+            model=model,
+            schema=schema,
+            batch_size=batch_size,
+            segment=segment,
+            use_schema_retrieval=use_schema_retrieval,
+            top_k_schema=top_k_schema,
+            retriever=retriever,
+            record_parallelism=record_parallelism,
+            journal=journal,
+            extractor=extractor,
+            schema_token_budget=schema_token_budget,
+            schema_score_cutoff=schema_score_cutoff,
+            segmenter=segmenter,
+            on_observation=session.prefetch if session is not None else None,
         )
-        validated = pf.filter_observations(validated, text)
+        item = validate_record(item, schema, use_suppress_table, fuzzy_evidence, emit_spans, session)
+
+        if use_precision_filter:
+            item = filter_record(item, schema, filter_model, filter_batch_size, filter_client, filter_agent)
 
-    return {"id": rid, "observations": validated}
+    return {"id": item["id"], "observations": item["observations"]}
 
 
 def main():
@@ -147,43 +405,411 @@ def main():
     ap.add_argument("--schema_path", required=True)
     ap.add_argument("--batch_size", type=int, default=25)
     ap.add_argument("--segment", action="store_true")
+    ap.add_argument("--segment_tokens", type=int, default=0)
+    ap.add_argument("--segment_overlap", type=int, default=0)
+    ap.add_argument("--tokenizer", default=None)
     ap.add_argument("--suppress_table", action="store_true")
     ap.add_argument("--precision_filter", action="store_true")
 
     # NEW FLAGS
     ap.add_argument("--schema_retrieval", action="store_true")
     ap.add_argument("--top_k_schema", type=int, default=40)
+    ap.add_argument("--embed_model", default="nomic-embed-text")
+    ap.add_argument("--index_dir", default="outputs/schema_index")
+    ap.add_argument("--retriever", choices=["embed", "bm25", "hybrid"], default=None)
+    ap.add_argument("--hybrid_alpha", type=float, default=0.5)
+    ap.add_argument("--schema_score_cutoff", type=float, default=0.0)
+    ap.add_argument("--schema_token_budget", type=int, default=0)
 
     ap.add_argument("--filter_model", default=None)
 
+    ap.add_argument("--fuzzy_evidence", action="store_true")
+    ap.add_argument("--evidence_spans", action="store_true")
+    ap.add_argument("--filter_batch_size", type=int, default=1)
+    ap.add_argument("--filter_prefix", action="store_true")
+    ap.add_argument("--keep_alive", default=None)
+    ap.add_argument("--prefilter_threshold", type=float, default=None)
+    ap.add_argument("--stream", action="store_true")
+    ap.add_argument("--structured_output", action="store_true")
+
+    ap.add_argument("--cache_dir", default=None)
+    ap.add_argument("--cache_max_mb", type=int, default=512)
+
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--record_parallelism", type=int, default=1)
+    ap.add_argument("--max_inflight", type=int, default=None)
+
+    ap.add_argument("--resume", action="store_true")
+    ap.add_argument("--journal", action="store_true")
+
+    ap.add_argument("--shard", default=None)
+    ap.add_argument("--shards", type=int, default=0)
+    ap.add_argument("--merge_only", action="store_true")
+
+    ap.add_argument("--pipeline", action="store_true")
+    ap.add_argument("--filter_workers", type=int, default=None)
+    ap.add_argument("--queue_size", type=int, default=4)
+    ap.add_argument("--filter_host", default=None)
+
+    ap.add_argument("--trace", action="store_true")
+
+    ap.add_argument("--ollama_host", default=None)
+    ap.add_argument("--embed_host", default=None)
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--max_retries", type=int, default=3)
+    ap.add_argument("--rate_limit", type=float, default=None)
+
     args = ap.parse_args()
 
-    schema = SynurSchema(args.schema_path)
+    # at t <= 0.5 an ambiguous score would meet both the KEEP and DROP tests
+    if args.prefilter_threshold is not None and not 0.5 < args.prefilter_threshold <= 1.0:
+        ap.error("--prefilter_threshold must be in (0.5, 1]")
+    # a fraction of the best score: above 1 even the best concept is cut
+    if not 0.0 <= args.schema_score_cutoff <= 1.0:
+        ap.error("--schema_score_cutoff must be in [0, 1]")
+    # weight of the BM25 score in the hybrid fusion
+    if not 0.0 <= args.hybrid_alpha <= 1.0:
+        ap.error("--hybrid_alpha must be in [0, 1]")
+    if args.retriever is not None and not args.schema_retrieval:
+        ap.error("--retriever needs --schema_retrieval")
+    args.retriever = args.retriever or "embed"
+    # --segment_tokens implies --segment; overlap and tokenizer only apply to
+    # the token-budgeted segmenter
+    if args.segment_tokens > 0:
+        args.segment = True
+    elif args.segment_overlap or args.tokenizer is not None:
+        ap.error("--segment_overlap and --tokenizer need --segment_tokens N")
+    try:
+        check_tokenizer_spec(args.tokenizer)
+    except ValueError as e:
+        ap.error(str(e))
+
     inp = Path(args.data_dir) / f"{args.split}.jsonl"
     out = Path(args.out)
 
+    # --shard i/N processes every N-th record (starting at i) into its own
+    # part file; --shards N runs N such processes here and merges the parts
+    # into --out, checking for missing and duplicate IDs (--merge_only: parts
+    # already produced, e.g. on other machines)
+    if args.shard and args.shards:
+        ap.error("--shard and --shards are mutually exclusive")
+    if args.shards < 0:
+        ap.error("--shards must be a positive number of processes")
+    if args.merge_only and not args.shards:
+        ap.error("--merge_only needs --shards N")
+    if args.shards:
+        # build the schema embedding index once here; the shard processes
+        # then only load it instead of each embedding the whole schema
+        if args.schema_retrieval and args.retriever in ("embed", "hybrid") and not args.merge_only:
+            schema = SynurSchema(args.schema_path)
+            SchemaRetriever(
+                schema.by_id,
+                embed_model=args.embed_model,
+                index_dir=args.index_dir,
+                concepts=schema.concepts,
+                client=make_client(
+                    host=args.embed_host or args.ollama_host,
+                    timeout=args.timeout,
+                    max_retries=args.max_retries,
+                    rate_limit=args.rate_limit,
+                ),
+            ).schema_embeddings
+        try:
+            report = run_shards(sys.argv[1:], inp, out, args.shards, merge_only=args.merge_only)
+        except (ValueError, RuntimeError) as e:
+            sys.exit(f"❌ {e}")
+        print(f"✅ Merged {report['records']} records from {report['shards']} shards {report['per_shard']} into {out}")
+        return
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            ap.error(str(e))
+        out = shard_path(out, *shard)
+
+    instr = Instrumentation(trace=args.trace)
+    set_instrumentation(instr)
+
+    schema = SynurSchema(args.schema_path)
+
     filter_model = args.filter_model or args.model
+
+    cache = None
+    if args.cache_dir:
+        cache = ResponseCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+        set_response_cache(cache)
+
+    # Shared Ollama client: pooled connections, timeouts, retry with jittered
+    # backoff, optional requests/sec limit and a cap on concurrent requests.
+    # Comma-separated hosts (--ollama_host, --filter_host, --embed_host) make
+    # an endpoint pool: least-outstanding routing with failover
+    configure_client(
+        host=args.ollama_host,
+        timeout=args.timeout,
+        max_retries=args.max_retries,
+        rate_limit=args.rate_limit,
+        max_inflight=args.max_inflight or args.workers * args.record_parallelism,
+    )
+
+    # Precision filtering may run against its own server
+    filter_workers = args.filter_workers or args.workers
+    filter_client = None
+    if args.filter_host:
+        filter_client = make_client(
+            host=args.filter_host,
+            timeout=args.timeout,
+            max_retries=args.max_retries,
+            rate_limit=args.rate_limit,
+            max_inflight=filter_workers,
+        )
+
+    embed_client = None
+    if args.embed_host:
+        embed_client = make_client(
+            host=args.embed_host,
+            timeout=args.timeout,
+            max_retries=args.max_retries,
+            rate_limit=args.rate_limit,
+        )
+
+    # Ping pooled endpoints before traffic so dead hosts start marked down
+    for name, c in [("extract", get_client()), ("filter", filter_client), ("embed", embed_client)]:
+        if isinstance(c, LLMPool):
+            down = [h for h, ok in zip(c.hosts, c.check_health()) if not ok]
+            if down:
+                print(f"⚠️ {name} endpoints not responding (skipped until they recover): {', '.join(down)}")
+
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    with inp.open("r", encoding="utf-8") as fin, out.open("w", encoding="utf-8") as fout:
-        for line in fin:
-            rec = json.loads(line)
-            res = process_record(
-                record=rec,
+    # One retriever for the whole split; schema embeddings come from the
+    # on-disk index and are only computed for new/changed schema entries.
+    # bm25 needs no embedding server; hybrid fuses BM25 and cosine scores.
+    retriever = None
+    if args.schema_retrieval:
+        if args.retriever in ("embed", "hybrid"):
+            retriever = SchemaRetriever(
+                schema.by_id,
+                embed_model=args.embed_model,
+                top_k=args.top_k_schema,
+                index_dir=args.index_dir,
+                concepts=schema.concepts,
+                client=embed_client,
+            )
+        if args.retriever in ("bm25", "hybrid"):
+            lexical = LexicalRetriever(schema.by_id, top_k=args.top_k_schema, concepts=schema.concepts)
+            if retriever is None:
+                retriever = lexical
+            else:
+                retriever = HybridRetriever(lexical, retriever, top_k=args.top_k_schema, alpha=args.hybrid_alpha)
+
+    # --segment_tokens replaces the blank-line/character splitter of
+    # --segment with token-budgeted chunks, optionally overlapping
+    segmenter = None
+    if args.segment_tokens > 0:
+        segmenter = Segmenter(
+            max_tokens=args.segment_tokens,
+            overlap_tokens=args.segment_overlap,
+            count_tokens=load_token_counter(args.tokenizer),
+        )
+
+    # Shared across records so prompt prefixes are built once per schema batch.
+    # --stream streams extraction and filter calls and closes each one as
+    # soon as its JSON answer is complete; --structured_output constrains
+    # extraction to a JSON schema of the batch's concept ids and values
+    extractor = ExtractorAgent(
+        args.model,
+        schema.by_id,
+        concepts=schema.concepts,
+        stream=args.stream,
+        structured=args.structured_output,
+    )
+
+    # --prefilter_threshold t settles filter candidates whose rule score is
+    # >= t (KEEP) or <= 1-t (DROP) without an LLM call.
+    # --filter_prefix puts instructions + transcript first so every check of a
+    # record after the first reuses the server's prompt cache; --keep_alive
+    # keeps the filter model (and that cache) loaded between calls
+    filter_agent = PrecisionFilterAgent(
+        model=filter_model,
+        schema_by_id=schema.by_id,
+        temperature=0.0,
+        batch_size=args.filter_batch_size,
+        client=filter_client,
+        concepts=schema.concepts,
+        prefix_mode=args.filter_prefix,
+        keep_alive=args.keep_alive,
+        prefilter=RulePreFilter(schema.concepts, args.prefilter_threshold) if args.prefilter_threshold is not None else None,
+        stream=args.stream,
+    )
+
+    # --resume keeps records already in the output file and replays finished
+    # extraction calls of an interrupted record from the progress journal.
+    # The journal (one fsync per extraction call) is only kept with --resume
+    # or --journal, i.e. for runs that expect to be resumed
+    done_ids = read_done_ids(out) if args.resume else set()
+    journal = None
+    if args.resume or args.journal:
+        journal = ProgressJournal(out.with_name(out.name + ".journal"), resume=args.resume)
+
+    def _run(line: str) -> Dict[str, Any]:
+        rec = json.loads(line)
+        return process_record(
+            record=rec,
+            model=args.model,
+            schema=schema,
+            batch_size=args.batch_size,
+            segment=args.segment,
+            use_suppress_table=args.suppress_table,
+            use_precision_filter=args.precision_filter,
+            use_schema_retrieval=args.schema_retrieval,
+            top_k_schema=args.top_k_schema,
+            filter_model=filter_model,
+            retriever=retriever,
+            record_parallelism=args.record_parallelism,
+            filter_batch_size=args.filter_batch_size,
+            journal=journal,
+            filter_client=filter_client,
+            fuzzy_evidence=args.fuzzy_evidence,
+            emit_spans=args.evidence_spans,
+            extractor=extractor,
+            filter_agent=filter_agent,
+            schema_token_budget=args.schema_token_budget,
+            schema_score_cutoff=args.schema_score_cutoff,
+            segmenter=segmenter,
+        )
+
+    def _extract_stage(line: str) -> Dict[str, Any]:
+        rec = json.loads(line)
+        with instrument.record(rec.get("id")):
+            session = streaming_session(rec, schema, extractor, args.fuzzy_evidence, args.evidence_spans)
+            item = extract_record(
+                rec,
                 model=args.model,
                 schema=schema,
                 batch_size=args.batch_size,
                 segment=args.segment,
-                use_suppress_table=args.suppress_table,
-                use_precision_filter=args.precision_filter,
                 use_schema_retrieval=args.schema_retrieval,
                 top_k_schema=args.top_k_schema,
-                filter_model=filter_model,
+                retriever=retriever,
+                record_parallelism=args.record_parallelism,
+                journal=journal,
+                extractor=extractor,
+                schema_token_budget=args.schema_token_budget,
+                schema_score_cutoff=args.schema_score_cutoff,
+                segmenter=segmenter,
+                on_observation=session.prefetch if session is not None else None,
+            )
+            return {**item, "validation": session}
+
+    def _validate_stage(item: Dict[str, Any]) -> Dict[str, Any]:
+        with instrument.record(item["id"]):
+            session = item.pop("validation", None)
+            return validate_record(item, schema, args.suppress_table, args.fuzzy_evidence, args.evidence_spans, session)
+
+    def _filter_stage(item: Dict[str, Any]) -> Dict[str, Any]:
+        with instrument.record(item["id"]):
+            return filter_record(item, schema, filter_model, args.filter_batch_size, filter_client, filter_agent)
+
+    pipeline = None
+    if args.pipeline:
+        stages = [
+            Stage("extract", _extract_stage, workers=args.workers),
+            Stage("validate", _validate_stage),
+        ]
+        if args.precision_filter:
+            stages.append(Stage("filter", _filter_stage, workers=filter_workers))
+        pipeline = StagedPipeline(stages, queue_size=args.queue_size)
+
+    def _pending(fin):
+        if shard is not None:
+            fin = shard_lines(fin, *shard)
+        for line in fin:
+            if not line.strip():
+                continue
+            if done_ids and str(json.loads(line).get("id")) in done_ids:
+                continue
+            yield line
+
+    mode = "a" if args.resume else "w"
+    with inp.open("r", encoding="utf-8") as fin, out.open(mode, encoding="utf-8") as fout:
+        if pipeline is not None:
+            results = pipeline.run(_pending(fin))
+        else:
+            results = run_ordered(_pending(fin), _run, args.workers)
+
+        try:
+            for res in results:
+                if pipeline is not None:
+                    res = {"id": res["id"], "observations": res["observations"]}
+                fout.write(json.dumps(res, ensure_ascii=False) + "\n")
+                fout.flush()
+                os.fsync(fout.fileno())
+                if journal is not None:
+                    journal.forget(res.get("id"))
+        finally:
+            # stops and joins the pipeline / worker threads if we bail out early
+            results.close()
+
+    if journal is not None:
+        journal.close(remove=True)
+
+    # Per-stage timers, LLM call/token counts and per-record latencies
+    extra: Dict[str, Any] = {}
+    if pipeline is not None:
+        extra["pipeline"] = pipeline.metrics()
+    if cache is not None:
+        extra["llm_cache"] = cache.stats()
+    pools = {
+        name: c.stats()
+        for name, c in [("extract", get_client()), ("filter", filter_client), ("embed", embed_client)]
+        if isinstance(c, LLMPool)
+    }
+    if pools:
+        extra["endpoints"] = pools
+    summary = instr.write(out.with_name(out.name + ".metrics.json"), extra)
+    if args.trace:
+        instr.write_trace(out.with_name(out.name + ".trace.json"))
+
+    run_stats = summary["run"]
+    print(
+        f"{run_stats['records']} records in {run_stats['wall_s']}s "
+        f"({run_stats['records_per_s']} rec/s), "
+        f"{run_stats['llm_total']['calls']} LLM calls, "
+        f"{run_stats['llm_total']['prompt_tokens']} prompt / "
+        f"{run_stats['llm_total']['completion_tokens']} completion tokens"
+    )
+    counters = run_stats["counters"]
+    if args.precision_filter and "prefilter_to_llm" in counters:
+        print(
+            f"Pre-filter: {counters.get('prefilter_keep', 0)} kept / {counters.get('prefilter_drop', 0)} dropped "
+            f"without an LLM check, {counters['prefilter_to_llm']} sent to the filter model"
+        )
+    if "extract_parse_failures" in counters:
+        print(f"Extraction: {counters['extract_parse_failures']} calls returned no parseable observations")
+    if args.stream:
+        print(f"Streaming: {counters.get('llm_stream_cancelled', 0)} LLM calls closed once their JSON was complete (their tokens are estimated)")
+    for name, endpoints in pools.items():
+        for ep in endpoints:
+            print(
+                f"[{name} endpoint {ep['host']}] requests={ep['requests']} failures={ep['failures']}"
+                f"{'' if ep['healthy'] else ' (down)'}"
+            )
+    if pipeline is not None:
+        for st in extra["pipeline"]["stages"]:
+            print(
+                f"[{st['stage']}] processed={st['processed']} util={st['utilization']:.0%} "
+                f"starved={st['starved_s']}s blocked={st['blocked_s']}s max_q={st['max_queue_depth']}"
             )
-            fout.write(json.dumps(res, ensure_ascii=False) + "\n")
 
+    if done_ids:
+        print(f"Resumed: skipped {len(done_ids)} records already in {out}")
     print(f"✅ Saved to {out}")
 
+    if cache is not None:
+        print(f"LLM cache: {cache.stats()}")
+        cache.close()
+
 
 if __name__ == "__main__":
     main()
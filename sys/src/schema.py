@@ -1,7 +1,113 @@
 # src/schema.py
 import json
+from types import MappingProxyType
 from typing import Dict, Any, List
 
+STRING, NUMERIC, SINGLE_SELECT, MULTI_SELECT = range(4)
+VALUE_TYPE_CODES = {
+    "STRING": STRING,
+    "NUMERIC": NUMERIC,
+    "SINGLE_SELECT": SINGLE_SELECT,
+    "MULTI_SELECT": MULTI_SELECT,
+}
+
+
+def norm_text(x) -> str:
+    return " ".join(str(x).strip().lower().split())
+
+
+# Read-only view of one schema concept with everything the agents derive from
+# it computed once at load time instead of per observation / per prompt.
+# Mappings are MappingProxyType views and sequences tuples, so a consumer
+# cannot change what the cached prompts and formats were built from.
+class SchemaConcept:
+    __slots__ = (
+        "id",
+        "name",
+        "value_type",
+        "type_code",
+        "value_enum",
+        "enum_norm",
+        "enum_json",
+        "prompt_entry",
+        "prompt_json",
+        "retrieval_text",
+    )
+
+    def __init__(self, item: Dict[str, Any]):
+        self.id = str(item["id"]).strip()
+        self.name = item.get("name", "") or ""
+        self.value_type = item.get("value_type", "") or ""
+        self.type_code = VALUE_TYPE_CODES.get(self.value_type, -1)
+        self.value_enum = tuple(item.get("value_enum", []) or [])
+        self.enum_norm = MappingProxyType({norm_text(e): e for e in self.value_enum})
+        self.enum_json = json.dumps(list(self.value_enum), ensure_ascii=False)
+
+        # Entry as it appears in the extractor's SCHEMA block; prompt_json is
+        # already indented as a member of a json.dumps(..., indent=2) list
+        entry = {
+            "id": self.id,
+            "name": self.name,
+            "value_type": self.value_type,
+            "value_enum": self.value_enum,
+        }
+        self.prompt_entry = MappingProxyType(entry)
+        self.prompt_json = "\n".join("  " + line for line in json.dumps(entry, indent=2).split("\n"))
+
+        self.retrieval_text = f"{item.get('name','')} {item.get('value_type','')} {' '.join(item.get('value_enum', []))}"
+
+    def __setattr__(self, key, value):
+        if hasattr(self, key):
+            raise AttributeError(f"SchemaConcept is read-only ({key})")
+        object.__setattr__(self, key, value)
+
+
+def build_concepts(schema_by_id: Dict[str, Dict[str, Any]]) -> Dict[str, SchemaConcept]:
+    return {cid: SchemaConcept({**s, "id": cid}) for cid, s in schema_by_id.items()}
+
+
+def schema_block_json(concepts: List[SchemaConcept]) -> str:
+    # Same text as json.dumps([c.prompt_entry ...], indent=2), from the
+    # pre-serialized fragments
+    if not concepts:
+        return "[]"
+    return "[\n" + ",\n".join(c.prompt_json for c in concepts) + "\n]"
+
+
+def value_json_schema(concept: SchemaConcept) -> Dict[str, Any]:
+    if concept.type_code == NUMERIC:
+        return {"type": "number"}
+    if concept.type_code == SINGLE_SELECT and concept.value_enum:
+        return {"type": "string", "enum": list(concept.value_enum)}
+    if concept.type_code == MULTI_SELECT and concept.value_enum:
+        return {"type": "array", "items": {"type": "string", "enum": list(concept.value_enum)}, "minItems": 1}
+    return {"type": "string", "minLength": 1}
+
+
+def observation_format(concepts: List[SchemaConcept]) -> Dict[str, Any]:
+    # JSON schema for Ollama's `format` (constrained decoding) of an
+    # extraction answer over this batch: one alternative per concept, pinning
+    # the id to the batch and the value to the concept's type / value_enum
+    alternatives = [
+        {
+            "type": "object",
+            "properties": {
+                "id": {"type": "string", "enum": [c.id]},
+                "value": value_json_schema(c),
+                "evidence": {"type": "string", "minLength": 1},
+            },
+            "required": ["id", "value", "evidence"],
+        }
+        for c in concepts
+    ]
+    return {
+        "type": "object",
+        "properties": {
+            "observations": {"type": "array", "items": {"anyOf": alternatives}},
+        },
+        "required": ["observations"],
+    }
+
 
 class SynurSchema:
     def __init__(self, path: str):
@@ -12,10 +118,14 @@ class SynurSchema:
             item["id"] = str(item["id"]).strip()
 
         self.by_id: Dict[str, Dict[str, Any]] = {item["id"]: item for item in self.schema}
+        self.concepts: Dict[str, SchemaConcept] = build_concepts(self.by_id)
 
     def get(self, obs_id: str):
         return self.by_id.get(str(obs_id).strip())
 
+    def concept(self, obs_id: str):
+        return self.concepts.get(str(obs_id).strip())
+
     def value_type(self, obs_id: str):
         item = self.get(obs_id)
         return item.get("value_type") if item else None
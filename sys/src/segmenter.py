@@ -0,0 +1,157 @@
+# src/segmenter.py
+import os
+import re
+from typing import Any, Callable, Dict, List, Tuple
+
+PARAGRAPH_BREAK_RE = re.compile(r"\n[ \t]*\n\s*")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s+")
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def approx_tokens(text: str) -> int:
+    # ~4 characters per token for English BPE vocabularies
+    return max(1, (len(text) + 3) // 4)
+
+
+TOKENIZER_KINDS = ("approx", "tiktoken", "hf")
+
+
+def check_tokenizer_spec(spec: str = "approx"):
+    # ValueError for a spec load_token_counter cannot handle
+    kind = (spec or "approx").partition(":")[0]
+    if kind not in TOKENIZER_KINDS:
+        raise ValueError(f"unknown tokenizer spec: {spec!r} (expected approx, tiktoken:<encoding> or hf:<name>)")
+
+
+def load_token_counter(spec: str = "approx") -> Callable[[str], int]:
+    # "approx", "tiktoken:<encoding>" or "hf:<name or tokenizer.json path>";
+    # falls back to approx_tokens when the library is not installed
+    check_tokenizer_spec(spec)
+    if not spec or spec == "approx":
+        return approx_tokens
+
+    kind, _, name = spec.partition(":")
+    try:
+        if kind == "tiktoken":
+            import tiktoken
+            enc = tiktoken.get_encoding(name or "cl100k_base")
+            return lambda text: len(enc.encode(text, disallowed_special=()))
+        if kind == "hf":
+            from tokenizers import Tokenizer
+            tok = Tokenizer.from_file(name) if os.path.exists(name) else Tokenizer.from_pretrained(name)
+            return lambda text: len(tok.encode(text, add_special_tokens=False).ids)
+    except ImportError as e:
+        print(f"⚠️ tokenizer {spec!r} unavailable ({e}); using approximate token counts")
+    return approx_tokens
+
+
+def _spans(text: str, start: int, end: int, sep_re) -> List[Tuple[int, int]]:
+    # Non-empty pieces of text[start:end] between separator matches
+    out, pos = [], start
+    for m in sep_re.finditer(text, start, end):
+        if m.start() > pos:
+            out.append((pos, m.start()))
+        pos = m.end()
+    if pos < end:
+        out.append((pos, end))
+    return out
+
+
+# Token-budgeted segmenter. The transcript is cut into units - paragraphs,
+# or the sentences of a paragraph over budget, or word windows of a sentence
+# over budget - which are packed greedily into chunks of at most max_tokens.
+# With overlap_tokens, each chunk repeats the trailing units of the previous
+# one (up to that many tokens) so observations at a boundary are seen whole.
+# Chunks are verbatim slices of the transcript.
+class Segmenter:
+    def __init__(
+        self,
+        max_tokens: int = 350,
+        overlap_tokens: int = 0,
+        count_tokens: Callable[[str], int] = None,
+    ):
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.count_tokens = count_tokens or approx_tokens
+
+    def _word_windows(self, text: str, start: int, end: int) -> List[Tuple[int, int]]:
+        out, cur, cur_tok = [], None, 0
+        for w0, w1 in _spans(text, start, end, WHITESPACE_RE):
+            n = self.count_tokens(text[w0:w1])
+            if cur is not None:
+                sep = self.count_tokens(text[cur[1]:w0])
+                if cur_tok + sep + n <= self.max_tokens:
+                    cur, cur_tok = (cur[0], w1), cur_tok + sep + n
+                    continue
+                out.append(cur)
+            cur, cur_tok = (w0, w1), n
+        if cur is not None:
+            out.append(cur)
+        return out
+
+    def units(self, text: str) -> List[Tuple[int, int, int]]:
+        # (start, end, tokens) of every unit in transcript order
+        # With an overlap window paragraphs are always cut into sentences, so
+        # the window can carry the last few sentences rather than nothing
+        out = []
+        for p0, p1 in _spans(text, 0, len(text), PARAGRAPH_BREAK_RE):
+            n = self.count_tokens(text[p0:p1])
+            if n <= self.max_tokens and not self.overlap_tokens:
+                out.append((p0, p1, n))
+                continue
+            for s0, s1 in _spans(text, p0, p1, SENTENCE_END_RE):
+                n = self.count_tokens(text[s0:s1])
+                if n <= self.max_tokens:
+                    out.append((s0, s1, n))
+                    continue
+                for w0, w1 in self._word_windows(text, s0, s1):
+                    out.append((w0, w1, self.count_tokens(text[w0:w1])))
+        return out
+
+    def split(self, text: str) -> List[str]:
+        units = self.units(text)
+        if not units:
+            return [text] if text.strip() else []
+
+        # seps[k]: tokens of the separator re-joined between units k-1 and k
+        seps = [0] + [self.count_tokens(text[units[k - 1][1]:units[k][0]]) for k in range(1, len(units))]
+
+        chunks = []
+        i = 0
+        while i < len(units):
+            j, total = i + 1, units[i][2]
+            while j < len(units) and total + seps[j] + units[j][2] <= self.max_tokens:
+                total += seps[j] + units[j][2]
+                j += 1
+            chunks.append(text[units[i][0]:units[j - 1][1]])
+            if j >= len(units):
+                break
+
+            # next chunk starts with the trailing units that fit the overlap
+            # window, but always advances by at least one unit
+            k, carried = j, 0
+            while self.overlap_tokens and k - 1 > i:
+                add = units[k - 1][2] + (seps[k] if k < j else 0)
+                if carried + add > self.overlap_tokens:
+                    break
+                k -= 1
+                carried += add
+            i = k
+        return chunks
+
+
+def dedup_observations(observations: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # The same observation extracted from two overlapping chunks: same id and
+    # value, possibly with differently cut evidence. First occurrence (and its
+    # evidence) wins.
+    seen = set()
+    out = []
+    for o in observations:
+        if not isinstance(o, dict):
+            continue
+        key = (str(o.get("id")), repr(o.get("value")))
+        if key in seen:
+            continue
+        seen.add(key)
+        out.append(o)
+    return out
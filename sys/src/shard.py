@@ -0,0 +1,140 @@
+# src/shard.py
+import json
+import os
+import subprocess
+import sys
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Tuple
+
+
+# "i/N" (0 <= i < N) -> (i, N)
+def parse_shard(spec: str) -> Tuple[int, int]:
+    try:
+        i, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"shard index out of range: {spec!r} (need 0 <= i < N)")
+    return i, n
+
+
+def shard_path(out: Path, index: int, count: int) -> Path:
+    return out.with_name(f"{out.name}.shard-{index}-of-{count}")
+
+
+# Round-robin over the non-empty input lines: record k belongs to shard
+# k % count. Depends only on the input file, so every machine agrees on the
+# split, and long and short records spread evenly.
+def shard_lines(lines: Iterable[str], index: int, count: int) -> Iterator[str]:
+    k = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        if k % count == index:
+            yield line
+        k += 1
+
+
+def _input_ids(inp: Path) -> List[str]:
+    with inp.open("r", encoding="utf-8") as f:
+        return [str(json.loads(line).get("id")) for line in f if line.strip()]
+
+
+def _sample(ids: Iterable[str], n: int = 10) -> str:
+    ids = list(ids)
+    more = f" (+{len(ids) - n} more)" if len(ids) > n else ""
+    return ", ".join(ids[:n]) + more
+
+
+# Check the part files of a sharded run against the input and write the
+# records to `out` in input order. Missing, duplicate or unknown IDs and
+# unreadable lines (a shard that died mid-write) fail the merge and leave
+# `out` untouched.
+def merge_shards(inp: Path, out: Path, count: int) -> Dict[str, Any]:
+    expected = _input_ids(inp)
+    want = Counter(expected)
+
+    by_id: Dict[str, Deque[str]] = defaultdict(deque)
+    problems: List[str] = []
+    per_shard: List[int] = []
+    for i in range(count):
+        part = shard_path(out, i, count)
+        if not part.exists():
+            problems.append(f"missing part file {part}")
+            per_shard.append(0)
+            continue
+        n = 0
+        with part.open("r", encoding="utf-8") as f:
+            for lineno, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    rid = str(json.loads(line).get("id"))
+                except (json.JSONDecodeError, AttributeError):
+                    problems.append(f"unreadable line {lineno} in {part}")
+                    continue
+                by_id[rid].append(line if line.endswith("\n") else line + "\n")
+                n += 1
+        per_shard.append(n)
+
+    got = Counter({rid: len(lines) for rid, lines in by_id.items()})
+    missing = want - got
+    duplicate = Counter({rid: c for rid, c in (got - want).items() if rid in want})
+    unknown = [rid for rid in got if rid not in want]
+    if missing:
+        problems.append(f"{sum(missing.values())} records missing: {_sample(missing)}")
+    if duplicate:
+        problems.append(f"{sum(duplicate.values())} duplicate records: {_sample(duplicate)}")
+    if unknown:
+        problems.append(f"{len(unknown)} records not in {inp}: {_sample(unknown)}")
+    if problems:
+        raise ValueError("cannot merge shards:\n  " + "\n  ".join(problems))
+
+    tmp = out.with_name(out.name + ".merging")
+    with tmp.open("w", encoding="utf-8") as f:
+        for rid in expected:
+            f.write(by_id[rid].popleft())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, out)
+    return {"records": len(expected), "shards": count, "per_shard": per_shard}
+
+
+# argv without the coordinator's own flags (--shards N, --merge_only)
+def _child_argv(argv: List[str]) -> List[str]:
+    child, skip = [], False
+    for a in argv:
+        if skip:
+            skip = False
+        elif a == "--shards":
+            skip = True
+        elif not (a.startswith("--shards=") or a == "--merge_only"):
+            child.append(a)
+    return child
+
+
+# Process-pool coordinator: one `python -m src.run ... --shard i/N` child per
+# shard, then the merge. Child output goes to <part>.log. With merge_only the
+# parts (e.g. copied back from other machines) are only merged.
+def run_shards(argv: List[str], inp: Path, out: Path, count: int, merge_only: bool = False) -> Dict[str, Any]:
+    if not merge_only:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        child = _child_argv(argv)
+
+        def _launch(i: int) -> int:
+            part = shard_path(out, i, count)
+            log = part.with_name(part.name + ".log")
+            with log.open("w", encoding="utf-8") as f:
+                cmd = [sys.executable, "-m", "src.run", *child, "--shard", f"{i}/{count}"]
+                return subprocess.run(cmd, stdout=f, stderr=subprocess.STDOUT).returncode
+
+        with ThreadPoolExecutor(max_workers=count) as ex:
+            codes = list(ex.map(_launch, range(count)))
+        failed = [i for i, c in enumerate(codes) if c != 0]
+        if failed:
+            logs = ", ".join(f"{shard_path(out, i, count)}.log" for i in failed)
+            raise RuntimeError(f"{len(failed)}/{count} shards failed; see {logs}")
+
+    return merge_shards(inp, out, count)
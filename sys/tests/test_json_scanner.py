@@ -0,0 +1,109 @@
+# tests/test_json_scanner.py
+import pytest
+
+from src.json_scanner import JsonScanner, scan_json
+from src.lm_utils import extract_json_from_response
+
+OBS = {"observations": [{"id": "1", "value": "yes", "evidence": "a {b} [c]"}, {"id": "2", "value": 72, "evidence": "pulse 72"}]}
+OBS_TEXT = '{"observations": [{"id": "1", "value": "yes", "evidence": "a {b} [c]"}, {"id": "2", "value": 72, "evidence": "pulse 72"}]}'
+
+
+def feed_pieces(text, size, **kwargs):
+    scanner = JsonScanner(**kwargs)
+    for i in range(0, len(text), size):
+        if scanner.feed(text[i:i + size]):
+            break
+    return scanner
+
+
+def test_plain_and_fenced():
+    assert scan_json(OBS_TEXT) == OBS
+    assert scan_json(f"```json\n{OBS_TEXT}\n```") == OBS
+
+
+def test_prose_wrapped():
+    text = f"Sure! Here is the JSON {{as requested}}:\n{OBS_TEXT}\nLet me know if [anything] is missing."
+    assert scan_json(text) == OBS
+
+
+def test_stray_open_brace_before_json():
+    assert scan_json("Values { like this are unclosed. " + OBS_TEXT) == OBS
+
+
+def test_trailing_commas():
+    text = 'Result: {"observations": [{"id": "1", "value": "yes", "evidence": "e",},],}'
+    assert scan_json(text) == {"observations": [{"id": "1", "value": "yes", "evidence": "e"}]}
+
+
+def test_truncated_keeps_complete_elements():
+    text = OBS_TEXT[:OBS_TEXT.index('{"id": "2"') + 15]
+    assert scan_json(text) == {"observations": [OBS["observations"][0]]}
+
+
+def test_empty_and_garbage():
+    assert extract_json_from_response("") == {}
+    assert extract_json_from_response("no json here") == {}
+    assert scan_json("{not json at all}") == {}
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 64])
+def test_streamed_in_pieces_matches_whole(size):
+    text = f"Here you go:\n```json\n{OBS_TEXT}\n```\nSome commentary {{with braces}} after."
+    items = []
+    scanner = feed_pieces(text, size, stop_key="observations", on_item=items.append)
+    assert scanner.done
+    assert scanner.result() == OBS == scan_json(text)
+    assert items == OBS["observations"]
+
+
+def test_stops_after_stop_key_document():
+    scanner = JsonScanner(stop_key="observations")
+    assert scanner.feed(OBS_TEXT)
+    # later text is ignored once the stop_key document is complete
+    assert scanner.feed(' {"observations": []}')
+    assert scanner.result() == OBS
+
+
+@pytest.mark.parametrize("text", [
+    "[" * 3000,
+    "[" * 3000 + "]" * 3000,
+    '{"a": ' * 2000 + "1" + "}" * 2000,
+], ids=["unclosed", "balanced", "objects"])
+def test_deeply_nested_does_not_raise(text):
+    # too deep for the decoder: treated as malformed (a shallower inner value
+    # may still be returned), never a RecursionError
+    assert isinstance(scan_json(text), (dict, list))
+    assert isinstance(feed_pieces(text, 50, stop_key="observations").result(), (dict, list))
+
+
+def test_deeply_nested_junk_before_json():
+    text = "loop: " + "[" * 1500 + "]" * 1500 + " then " + OBS_TEXT
+    assert extract_json_from_response(text) == OBS
+    assert feed_pieces(text, 11, stop_key="observations").result() == OBS
+
+
+@pytest.mark.parametrize("prefix", ["{ thinking... ", "[[ draft: ", "{{{ "])
+def test_stray_opener_before_payload_streams_and_stops(prefix):
+    text = prefix + OBS_TEXT + "\nMore commentary that should never be read."
+    items = []
+    scanner = JsonScanner(stop_key="observations", on_item=items.append)
+    stopped_at = None
+    for i in range(0, len(text), 5):
+        if scanner.feed(text[i:i + 5]):
+            stopped_at = i + 5
+            break
+    assert stopped_at is not None and stopped_at <= len(prefix) + len(OBS_TEXT) + 5
+    assert items == OBS["observations"]
+    assert scanner.result() == OBS
+    assert scan_json(text) == OBS
+
+
+def test_stray_opener_before_truncated_payload():
+    text = "{ note " + OBS_TEXT[:OBS_TEXT.index('{"id": "2"')]
+    assert extract_json_from_response(text) == {"observations": [OBS["observations"][0]]}
+
+
+@pytest.mark.parametrize("size", [1, 4, 100])
+def test_stray_opener_before_empty_payload(size):
+    text = '{ thinking... {"observations": []} trailing'
+    assert feed_pieces(text, size, stop_key="observations").result() == {"observations": []}
@@ -0,0 +1,35 @@
+# tests/test_prefilter.py
+import pytest
+
+from src.agents.prefilter import RulePreFilter
+from src.schema import SchemaConcept
+
+CONCEPTS = {
+    "1": SchemaConcept({"id": "1", "name": "temperature", "value_type": "NUMERIC"}),
+    "2": SchemaConcept({"id": "2", "name": "pulse", "value_type": "NUMERIC"}),
+}
+
+
+def obs(cid, value, evidence):
+    return {"id": cid, "value": value, "evidence": evidence}
+
+
+@pytest.mark.parametrize("value", [37, 37.0, "37", "37.0"])
+def test_number_matches_across_int_and_float_forms(value):
+    assert RulePreFilter(CONCEPTS).decide(obs("1", value, "temperature 37.0 C")) == "KEEP"
+
+
+@pytest.mark.parametrize("evidence", ["pulse 1,200 today", "pulse of 1200"])
+def test_thousands_separator(evidence):
+    assert RulePreFilter(CONCEPTS).decide(obs("2", 1200, evidence)) == "KEEP"
+
+
+def test_number_inside_another_is_not_a_match():
+    f = RulePreFilter(CONCEPTS)
+    assert f.decide(obs("2", 7, "pulse 72")) == "DROP"
+    assert f.decide(obs("1", 37, "temperature 137.5")) == "DROP"
+    assert f.decide(obs("1", 37, "temperature 37.5")) == "DROP"
+
+
+def test_number_words_go_to_the_llm():
+    assert RulePreFilter(CONCEPTS).decide(obs("2", 72, "pulse seventy-two")) is None
@@ -0,0 +1,31 @@
+# tests/test_segmenter.py
+import pytest
+
+from src.segmenter import Segmenter, approx_tokens, check_tokenizer_spec, dedup_observations
+
+TEXT = "\n\n".join(
+    " ".join(f"Sentence {p}.{s} has a few words about vitals." for s in range(6)) for p in range(8)
+)
+
+
+@pytest.mark.parametrize("max_tokens,overlap", [(12, 0), (40, 0), (40, 15), (200, 50)])
+def test_chunks_stay_within_budget_including_separators(max_tokens, overlap):
+    chunks = Segmenter(max_tokens, overlap).split(TEXT)
+    assert chunks and all(approx_tokens(c) <= max_tokens for c in chunks)
+    assert all(c in TEXT for c in chunks)
+
+
+def test_unknown_tokenizer_spec():
+    check_tokenizer_spec("tiktoken:cl100k_base")
+    check_tokenizer_spec(None)
+    with pytest.raises(ValueError):
+        check_tokenizer_spec("sentencepiece:foo")
+
+
+def test_dedup_keys_on_id_and_value():
+    obs = [
+        {"id": "1", "value": 72, "evidence": "pulse 72"},
+        {"id": "1", "value": 72, "evidence": "pulse 72 regular"},
+        {"id": "1", "value": 80, "evidence": "pulse 80"},
+    ]
+    assert dedup_observations(obs) == [obs[0], obs[2]]